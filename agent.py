@@ -1,46 +1,21 @@
 from dotenv import load_dotenv
 
 from livekit import agents
-from livekit.agents import AgentSession, Agent, RoomInputOptions, ChatContext
-from livekit.plugins import noise_cancellation, cartesia, openai
+from livekit.agents import AgentSession, Agent, RoomInputOptions, ChatContext, ChatMessage, StopResponse
+from livekit.plugins import noise_cancellation, openai, silero
 from livekit.plugins.openai import realtime
-from openai.types.beta.realtime.session import TurnDetection
 
 from prompts import AGENT_INSTRUCTION
-from commands.calendar import create_calendar_event, set_reminder, delete_reminder, delete_calendar_event
-from commands.communication import send_text_message, send_email, call_contact
-from commands.media import play_music, can_you_open_the_app, search_web, close_app
-from commands.system import (
-    unmute_microphone,
-    mute_microphone,
-    restart_system,
-    power_down,
-)
-from commands.utilities import (
-    get_time,
-    get_date,
-    get_weather,
-    get_directions,
-    turn_off_lamp,
-    turn_on_lamp,
-)
-from core.context_watcher import start_scheduler
-from coding.mangeprojects import (manage_python_project, create_or_open_python, generate_python_code,
-                                initialize_git_repo,
-                                git_stage_file,
-                                git_unstage_file,
-                                git_commit,
-                                git_push,
-                                git_undo_last_commit,
-                                git_status)
-from coding.javaprojects import (
-    manage_spring_boot_project,
-    create_or_open_spring_file,
-    generate_spring_java_code,
-)
+from core import tool_registry, memory, metrics, intent_router, tts, wake_word, contacts, outbox, smtp_pool, location, http_client, music_library
+from core.journal import ConversationJournal
+from core.memory_snapshot import MemorySnapshot
+from core.startup import StartupTimer
+from core.tts import get_shared_tts
+from core.compaction import ContextCompactor
 
 from mem0 import AsyncMemoryClient
-import json
+import asyncio
+import importlib
 import logging
 
 load_dotenv()
@@ -54,119 +29,190 @@ class Assistant(Agent):
                 model="gpt-4o-realtime-preview-2024-12-17",
                 # voice="sage",
                 modalities=["text"],
-                turn_detection=TurnDetection(
-                    type="semantic_vad",
-                    eagerness="auto",
-                    create_response=True,
-                    interrupt_response=True,
-                )
+                # Turns are detected locally (VAD + STT in the AgentSession) so that
+                # on_user_turn_completed runs, with the transcript, before the model
+                # is asked to reply.
+                turn_detection=None,
             ),
-            tts=cartesia.TTS(
-                model="sonic-2",
-                voice="5891f60a-e5e5-4f99-836e-c2387feb4342",
-            ),
-            tools=[
-                can_you_open_the_app, get_time, get_date,
-                get_weather, search_web, initialize_git_repo,
-                git_stage_file, git_unstage_file, git_commit,
-                git_push, git_undo_last_commit, git_status,
-                play_music, send_email, call_contact, power_down,
-                send_text_message, manage_python_project, close_app,
-                create_or_open_python, generate_python_code, manage_spring_boot_project,
-                create_or_open_spring_file, generate_spring_java_code, 
-                create_calendar_event, set_reminder, delete_calendar_event,
-                mute_microphone, unmute_microphone, get_directions,
-                turn_on_lamp, turn_off_lamp, delete_reminder,
-                restart_system,
-            ],
+            tts=get_shared_tts(),
+            tools=tool_registry.get_tools(),
             chat_ctx=chat_ctx
         )
 
+    async def tts_node(self, text, model_settings):
+        # Short replies that repeat word for word ("System audio muted, sir.") play from the phrase cache
+        async for frame in tts.phrase_tts_node(text, lambda t: Agent.default.tts_node(self, t, model_settings)):
+            yield frame
+
+    async def on_user_turn_completed(self, turn_ctx: ChatContext, new_message: ChatMessage) -> None:
+        text = new_message.text_content or ""
+        if not text.strip():
+            # No transcript to judge (STT missed it): leave the turn to the model
+            return
+
+        # Overheard speech that doesn't address Jarvis never reaches the model
+        if not wake_word.gate(text):
+            raise StopResponse()
+
+        # Trivial commands (time, date, lamps, music controls) skip the LLM round trip
+        reply = await intent_router.route(text)
+        if reply is not None:
+            asyncio.create_task(tts.say(self.session, reply))
+            raise StopResponse()
+
+def prewarm(proc: agents.JobProcess):
+    # Load the VAD model once per worker process instead of once per job
+    proc.userdata["vad"] = silero.VAD.load()
+
+
 # ==============================
 # ENTRYPOINT
 # ==============================
 async def entrypoint(ctx: agents.JobContext):
     
-    async def shutdown_hook(chat_ctx: ChatContext, mem0: AsyncMemoryClient, memory_str: str):
-        logging.info("Shutting down, saving chat context to memory...")
-        messages_formatted = [
-            
-        ]
-
-        logging.info(f"Chat context messages: {chat_ctx.items}")
-
-        for item in chat_ctx.items:
-            content_str = ''.join(item.content) if isinstance(item.content, list) else str(item.content)
-            
-            if memory_str and memory_str in content_str:
-                continue
-            
-            if item.role in ['user', 'assistant']:
-                messages_formatted.append({
-                    "role": item.role,
-                    "content": content_str.strip()
-                })
-
-        logging.info(f"Formatted messages to add to memory: {messages_formatted}")
-        if messages_formatted:
-            try:
-                await mem0.add(messages_formatted, user_id="Daniel")
-                logging.info("Chat context saved to memory.")
-            except Exception as e:
-                logging.error(f"Failed to save chat context to Mem0: {e}")
-        else:
-            logging.info("No messages to save, skipping Mem0 add.")
+    async def shutdown_hook(journal: ConversationJournal):
+        logging.info("Shutting down, flushing conversation journal to memory...")
+        await journal.close()
+        await smtp_pool.close_pool()
+        await http_client.close()
+
+    timer = StartupTimer(job_id=ctx.job.id)
+    await metrics.start_exporters()
 
     # Initialize session and assistant
-    session = AgentSession(tts=cartesia.TTS(
-                model="sonic-2",
-                voice="5891f60a-e5e5-4f99-836e-c2387feb4342",
-            ))
+    # The realtime model only reports its own input transcription after the turn,
+    # so a separate STT provides the text the wake-word gate and fast path need
+    session = AgentSession(
+        tts=get_shared_tts(),
+        stt=openai.STT(model="gpt-4o-mini-transcribe"),
+        vad=ctx.proc.userdata["vad"],
+        turn_detection="vad",
+    )
 
-    # Initialize memory
     mem0 = AsyncMemoryClient()
     user_name = "Daniel"
-    results = await mem0.get_all(user_id=user_name)
-    initial_ctx = ChatContext()
-    memory_str = ''
-
-    if results:
-        memories = [
-            {
-                "memory": result["memory"],
-                "updated_at": result["updated_at"]
-            }
-            for result in results
-        ]
-        memory_str = json.dumps(memories)
-        logging.info(f"Memories: {memory_str}")
-        initial_ctx.add_message(
-            role="assistant",
-            content=f"The user's name is {user_name}, and this is relvant context about him: {memory_str}."
-        )
+    snapshot = MemorySnapshot(user_id=user_name)
+    journal = ConversationJournal(mem0, user_id=user_name)
+    needs_revalidate = True
+    memory_item_id = None
+    compactor = None
+
+    @session.on("conversation_item_added")
+    def _on_conversation_item_added(ev):
+        if isinstance(ev.item, ChatMessage):
+            journal.append(ev.item.role, ev.item.text_content)
+        if compactor:
+            compactor.schedule()
+
+    @session.on("metrics_collected")
+    def _on_metrics_collected(ev):
+        if getattr(ev.metrics, "type", None) == "realtime_model_metrics":
+            metrics.observe("llm_turn_ms", ev.metrics.duration * 1000)
+
+    @session.on("agent_state_changed")
+    def _on_agent_state_changed(ev):
+        if ev.new_state == "speaking":
+            timer.mark("first_audio")
+
+    def memory_message(memory_str: str) -> str:
+        return f"The user's name is {user_name}, and this is relvant context about him: {memory_str}."
+
+    async def load_memories() -> list:
+        # Start from the local snapshot, only block on Mem0 when there is none
+        nonlocal needs_revalidate
+        results = snapshot.load()
+        if results is None:
+            needs_revalidate = False
+            results = await snapshot.fetch(mem0)
+        return results
+
+    async def start_agent() -> Assistant:
+        nonlocal memory_item_id
+        results = await timer.run("memory", load_memories())
+
+        initial_ctx = ChatContext()
+        if results:
+            memory_str, _ = memory.select_for_context(results)
+            logging.info(f"Memories: {memory_str}")
+            memory_item_id = initial_ctx.add_message(
+                role="assistant",
+                content=memory_message(memory_str)
+            ).id
+
+        # Create assistant with correct ChatContent
+        assistant = Assistant(chat_ctx=initial_ctx)
+        get_shared_tts().prewarm()
+
+        # Opens the realtime model connection; runs while the room is still connecting
+        await timer.run("session_start", session.start(
+            room=ctx.room,
+            agent=assistant,
+            room_input_options=RoomInputOptions(
+                video_enabled=True,
+                noise_cancellation=noise_cancellation.BVC(),
+            ),
+        ))
+        return assistant
+
+    async def load_scheduler():
+        # Imported off the event loop so apscheduler and the calendar/utilities
+        # modules are not loaded before the worker takes a job.
+        module = await asyncio.to_thread(importlib.import_module, "core.context_watcher")
+        return module.start_scheduler
+
+    # Independent startup steps run concurrently; the journal replays leftovers from a crash/restart
+    started = await timer.gather(
+        connect=ctx.connect(),
+        agent=start_agent(),
+        journal=journal.start(),
+        scheduler_import=load_scheduler(),
+    )
+    assistant = started["agent"]
 
-    # Create assistant with correct ChatContent
-    assistant = Assistant(chat_ctx=initial_ctx)
+    # Keep the context size flat over long sessions; the memory message is never compacted
+    compactor = ContextCompactor(assistant, pinned_ids=lambda: {memory_item_id})
 
     # Start scheduler (reminders, etc.)
-    start_scheduler(session)
-
-    # Connect to the LiveKit room
-    await ctx.connect()
-
-    # Start session with assistant
-    await session.start(
-        room=ctx.room,
-        agent=assistant,
-        room_input_options=RoomInputOptions(
-            video_enabled=True,
-            noise_cancellation=noise_cancellation.BVC(),
-        ),
-    )
+    started["scheduler_import"](session)
+    timer.mark("ready")
+
+    async def merge_fresh_memories(fresh_results: list):
+        nonlocal memory_item_id
+        memory_str, _ = memory.select_for_context(fresh_results)
+        fresh_item = ChatMessage(role="assistant", content=[memory_message(memory_str)])
+
+        chat_ctx = assistant.chat_ctx.copy()
+        index = next((i for i, item in enumerate(chat_ctx.items) if item.id == memory_item_id), None)
+        if index is None:
+            chat_ctx.items.insert(0, fresh_item)
+        else:
+            chat_ctx.items[index] = fresh_item
+        memory_item_id = fresh_item.id
+        await assistant.update_chat_ctx(chat_ctx)
+
+    # Deliver queued emails/texts (including ones left by a previous run) and announce the outcome
+    outbox.get_outbox().start(notify=lambda text: tts.say(session, text))
+
+    # Load the contact index in the background so the first text/call/email doesn't wait on Contacts
+    asyncio.create_task(contacts.get_index().ensure_loaded())
+    # Same for the music library (built in the background; play_music searches by name until then)
+    asyncio.create_task(music_library.get_library().ensure_loaded())
+    # Import the fast-path tools (kasa etc.) in a thread before the first turn needs them
+    intent_router.preload()
+    # Resolve the location now so weather/directions never wait on the IP lookup
+    asyncio.create_task(location.get_location())
+
+    # Refresh the snapshot from Mem0 now that the session is live
+    if needs_revalidate:
+        asyncio.create_task(snapshot.revalidate(mem0, merge_fresh_memories))
 
     # Register shutdown callback
-    ctx.add_shutdown_callback(lambda: shutdown_hook(session._agent.chat_ctx, mem0, memory_str))
+    ctx.add_shutdown_callback(lambda: shutdown_hook(journal))
+
+
+def main():
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
 
 
 if __name__ == "__main__":
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
+    main()
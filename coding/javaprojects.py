@@ -11,6 +11,8 @@ import difflib
 import threading
 import time
 from dotenv import load_dotenv
+from core import process
+from core.applescript import run_applescript
 
 # File-watching
 from watchdog.observers import Observer
@@ -409,11 +411,12 @@ async def manage_spring_boot_project(project_name: str, package_name: str = "com
         if not project_exists:
             # Download starter project using start.spring.io (gradle + java 17)
             zip_path = os.path.join(SPRING_PROJECTS_ROOT, f"{project_name}.zip")
-            subprocess.run([
+            await process.run(
                 "curl", "-s",
                 f"https://start.spring.io/starter.zip?type=gradle-project&language=java&bootVersion=3.4.5&baseDir={project_name}&groupId={package_name}&artifactId={project_name}&name={project_name}&packageName={package_name}&javaVersion=17",
-                "-o", zip_path
-            ], check=True)
+                "-o", zip_path,
+                timeout=120, check=True
+            )
 
             # Unzip
             with zipfile.ZipFile(zip_path, "r") as zip_ref:
@@ -435,7 +438,7 @@ async def manage_spring_boot_project(project_name: str, package_name: str = "com
             activate
         end tell
         '''
-        subprocess.run(["osascript", "-e", applescript])
+        await run_applescript(applescript)
 
         # Start file watcher in background
         start_file_watcher_for_project(project_path, _on_file_change)
@@ -467,7 +470,7 @@ async def create_or_open_spring_file(file_name: str) -> str:
             activate
         end tell
         '''
-        subprocess.run(["osascript", "-e", applescript])
+        await run_applescript(applescript)
 
         return f"✅ File '{file_name}' opened at {file_path}"
 
@@ -525,7 +528,7 @@ async def generate_spring_java_code(file_name: str, prompt: str, model: str = "g
             activate
         end tell
         '''
-        subprocess.run(["osascript", "-e", applescript])
+        await run_applescript(applescript)
 
         return f"✅ Java code generated and written to '{file_name}' (safer-patched)."
 
@@ -1,6 +1,5 @@
 from livekit.agents import function_tool
 import os
-import subprocess
 import json
 import openai
 from dotenv import load_dotenv
@@ -9,6 +8,8 @@ import ast
 import os
 import git  # GitPython
 from git import Repo
+from core import process
+from core.applescript import run_applescript
 from livekit.agents import function_tool
 
 load_dotenv()
@@ -80,9 +81,7 @@ async def manage_python_project(project_name: str, language: str = "python") ->
 
             # Create a virtual environment for Python projects
             if language.lower() == "python":
-                subprocess.run(
-                    ["python3", "-m", "venv", os.path.join(project_path, "venv")]
-                )
+                await process.run("python3", "-m", "venv", os.path.join(project_path, "venv"), timeout=120)
 
             # Add a default README.md
             readme_path = os.path.join(project_path, "README.md")
@@ -101,7 +100,7 @@ async def manage_python_project(project_name: str, language: str = "python") ->
             activate
         end tell
         '''
-        subprocess.run(["osascript", "-e", applescript])
+        await run_applescript(applescript)
 
         if project_exists:
             return f"📂 Opened existing project: {project_name}"
@@ -139,7 +138,7 @@ async def create_or_open_python(file_name: str) -> str:
         open(file_path, "a").close()
 
         # Open the file inside VS Code in the SAME window
-        subprocess.run(["code", "--reuse-window", file_path])
+        await process.run("code", "--reuse-window", file_path, timeout=15)
 
         return f"✅ File '{file_name}' opened at {file_path}"
 
@@ -200,7 +199,7 @@ async def generate_python_code(file_name: str, prompt: str, model: str = "gpt-5-
             f.write(code)
 
         # Open file in VS Code
-        subprocess.run(["code", "--reuse-window", file_path])
+        await process.run("code", "--reuse-window", file_path, timeout=15)
 
         return f"✅ Code generated with explanations as comments in '{file_name}'"
 
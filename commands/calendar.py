@@ -1,15 +1,15 @@
-import subprocess
 from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from livekit.agents import function_tool 
 from livekit.agents import function_tool
-import asyncio
 from livekit.agents import function_tool
-import subprocess
 import dateparser
 from datetime import datetime
 from dateutil import parser
 import os
+from datetime import timedelta
+from core import routes
+from core.applescript import run_applescript
 
 
 @function_tool
@@ -36,13 +36,12 @@ async def get_next_calendar_event() -> dict:
     end tell
     '''
 
-    try:
-        result = await asyncio.to_thread(
-            subprocess.check_output,
-            ['osascript', '-e', applescript]
-        )
+    result = await run_applescript(applescript)
+    if not result.ok:
+        return {}
 
-        decoded = result.decode().strip()
+    try:
+        decoded = result.stdout
         if decoded == "NO_EVENTS":
             return {}
 
@@ -54,9 +53,59 @@ async def get_next_calendar_event() -> dict:
             "start_time": dateparser.parse(start_time.strip()),
             "location": location.strip() if location.strip() else None
         }
-    except subprocess.CalledProcessError:
+    except ValueError:
         return {}
     
+# ASCII separators that can't appear in event fields
+_RS, _US = "\x1e", "\x1f"
+
+
+async def get_upcoming_events(hours: int = 24) -> list[dict]:
+    """
+    Every event of the 'Work' calendar starting within `hours`, in one AppleScript
+    call, sorted by start. Same fields as get_next_calendar_event(); start times
+    come back as an offset from now so they don't depend on the date locale.
+    """
+    applescript = f'''
+    tell application "Calendar"
+        set nowDate to current date
+        set theEvents to every event of calendar "Work" whose start date ≥ nowDate and start date ≤ (nowDate + ({hours} * hours))
+        set out to ""
+        repeat with anEvent in theEvents
+            set eventLocation to ""
+            try
+                set eventLocation to location of anEvent
+                if eventLocation is missing value then set eventLocation to ""
+            end try
+            set out to out & (summary of anEvent) & "{_US}" & ((start date of anEvent) - nowDate) & "{_US}" & eventLocation & "{_RS}"
+        end repeat
+        return out
+    end tell
+    '''
+
+    result = await run_applescript(applescript)
+    if not result.ok:
+        return []
+
+    now = datetime.now()
+    events = []
+    for record in result.stdout.split(_RS):
+        fields = record.split(_US)
+        if len(fields) != 3:
+            continue
+        title, offset, location = fields
+        try:
+            start_time = now + timedelta(seconds=int(float(offset)))
+        except ValueError:
+            continue
+        events.append({
+            "title": title.strip(),
+            "start_time": start_time,
+            "location": location.strip() or None,
+        })
+    return sorted(events, key=lambda e: e["start_time"])
+
+
 @function_tool
 async def create_calendar_event(
     summary: str,
@@ -122,23 +171,15 @@ async def create_calendar_event(
     '''
 
     try:
-        proc = await asyncio.create_subprocess_exec(
-            'osascript', '-e', applescript,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await proc.communicate()
-
-        if proc.returncode == 0:
+        result = await run_applescript(applescript)
+
+        if result.ok:
             return f"Event '{summary}' created successfully, sir."
         else:
-            return f"Error creating event: {stderr.decode().strip()}"
+            return f"Error creating event: {result.stderr}"
     except Exception as e:
         return f"Exception occurred: {e}"
 
-import aiohttp
-from urllib.parse import urlencode
-
 @function_tool
 async def get_eta_to_event(destination: str, origin: str = "Panorama City, CA") -> dict:
     """
@@ -156,33 +197,20 @@ async def get_eta_to_event(destination: str, origin: str = "Panorama City, CA")
         return {"error": "Google Maps API key not found."}
 
     try:
-        # Build URL for Google Distance Matrix API
-        params = urlencode({
-            "origins": origin,
-            "destinations": destination,
-            "mode": "driving",
-            "units": "imperial",
-            "key": api_key
-        })
-        url = f"https://maps.googleapis.com/maps/api/distancematrix/json?{params}"
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                data = await resp.json()
-
-        # Check response validity
-        if data.get("status") != "OK":
-            return {"error": f"Google API error: {data.get('status')}"}
+        # Cached per origin/destination and 15-minute departure slot (see core.routes)
+        data = await routes.distance_matrix(origin, destination)
 
         element = data["rows"][0]["elements"][0]
         if element.get("status") != "OK":
             return {"error": f"Could not fetch ETA for {destination}."}
 
         return {
-            "duration": element["duration"]["text"],
+            "duration": element.get("duration_in_traffic", element["duration"])["text"],
             "distance": element["distance"]["text"]
         }
 
+    except routes.RouteError as e:
+        return {"error": f"Google API error: {e}"}
     except Exception as e:
         return {"error": str(e)}    
 
@@ -242,15 +270,10 @@ async def set_reminder(
     '''
 
     try:
-        proc = await asyncio.create_subprocess_exec(
-            'osascript', '-e', applescript,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await proc.communicate()
-
-        if proc.returncode != 0:
-            return f"❌ Failed to create reminder: {stderr.decode().strip()}"
+        result = await run_applescript(applescript)
+
+        if not result.ok:
+            return f"❌ Failed to create reminder: {result.stderr}"
     except Exception as e:
         return f"❌ Exception occurred: {e}"
 
@@ -278,13 +301,12 @@ async def get_reminders(list_name: str = "Reminders") -> list:
     return output
     '''
 
-    try:
-        result = await asyncio.to_thread(
-            subprocess.check_output,
-            ['osascript', '-e', applescript]
-        )
+    result = await run_applescript(applescript)
+    if not result.ok:
+        return []
 
-        reminders_raw = result.decode().strip()
+    try:
+        reminders_raw = result.stdout
         reminders = []
 
         if reminders_raw:
@@ -302,7 +324,7 @@ async def get_reminders(list_name: str = "Reminders") -> list:
 
         return reminders
 
-    except subprocess.CalledProcessError as e:
+    except (IndexError, ValueError):
         return []
     
 @function_tool
@@ -328,16 +350,11 @@ async def delete_calendar_event(title: str, calendar_name: str = "Work") -> str:
     '''
 
     try:
-        proc = await asyncio.create_subprocess_exec(
-            "osascript", "-e", applescript,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await proc.communicate()
-        if proc.returncode == 0:
+        result = await run_applescript(applescript)
+        if result.ok:
             return f"✅ Calendar event '{title}' deleted from '{calendar_name}'"
         else:
-            return f"❌ Failed to delete event '{title}': {stderr.decode().strip()}"
+            return f"❌ Failed to delete event '{title}': {result.stderr}"
     except Exception as e:
         return f"❌ Exception occurred: {e}"
     
@@ -365,15 +382,10 @@ async def delete_reminder(title: str, list_name: str = "Reminders") -> str:
     '''
 
     try:
-        proc = await asyncio.create_subprocess_exec(
-            "osascript", "-e", applescript,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await proc.communicate()
-        if proc.returncode == 0:
+        result = await run_applescript(applescript)
+        if result.ok:
             return f"✅ Reminder '{title}' deleted from list '{list_name}'"
         else:
-            return f"❌ Failed to delete reminder '{title}': {stderr.decode().strip()}"
+            return f"❌ Failed to delete reminder '{title}': {result.stderr}"
     except Exception as e:
         return f"❌ Exception occurred: {e}"
\ No newline at end of file
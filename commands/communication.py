@@ -10,183 +10,299 @@ from email.mime.text import MIMEText
 from typing import Optional
 from livekit.agents import function_tool, RunContext
 import subprocess
+import uuid
 from typing import Optional
+from core import contacts, outbox, process
+from core.applescript import escape, run_applescript
+from core.smtp_pool import get_smtp_pool
 
 
 load_dotenv()
 
 
-def get_contact_number(name: str) -> str | None:
+async def resolve_number(name: str) -> tuple[str, Optional[str], Optional[str]]:
     """
-    Look up a contact's phone number from the macOS Contacts app.
-    Prefers 'mobile' number if available.
+    Look a recipient up in the contact index; prefers the 'mobile' number.
+    Returns (who it resolved to, phone number, error to speak instead).
+    Something that isn't in Contacts but has digits is taken as a raw number.
     """
+    contact = await contacts.find_contact(name)
+    if contact and contact.phone:
+        return contact.name, contact.phone, None
+    if any(c.isdigit() for c in name):
+        return name, name, None
+    if contact:
+        return contact.name, None, f"{contact.name} doesn't have a phone number in your contacts, sir."
+    return name, None, f"I couldn't find '{name}' in your contacts, sir. Who did you mean?"
+
+
+async def deliver_text(payload: dict):
+    """Outbox handler: send one text through the Messages app."""
+    number, message = escape(payload["number"]), escape(payload["message"])
     applescript = f'''
-    tell application "Contacts"
-        set thePeople to every person whose name contains "{name}"
-        if (count of thePeople) > 0 then
-            set thePerson to item 1 of thePeople
-            if (count of phones of thePerson) > 0 then
-                repeat with ph in phones of thePerson
-                    if label of ph contains "mobile" then
-                        return value of ph
-                    end if
-                end repeat
-                -- fallback: just return first phone
-                return value of first phone of thePerson
-            end if
-        end if
-        return ""
+    tell application "Messages"
+        set targetBuddy to "{number}"
+        set iMessageService to 1st service whose service type = iMessage
+        try
+            send "{message}" to buddy targetBuddy of iMessageService
+        on error
+            set smsService to 1st service whose service type = SMS
+            send "{message}" to buddy targetBuddy of smsService
+        end try
     end tell
     '''
-    result = subprocess.run(
-        ["osascript", "-e", applescript],
-        capture_output=True,
-        text=True
-    )
-    number = result.stdout.strip()
-    return number if number else None
+
+    result = await run_applescript(applescript)
+    if not result.ok:
+        raise RuntimeError(result.stderr or result.stdout or "Messages rejected the message")
+
+
+async def _expand_recipients(
+    recipient: Optional[str], recipients: Optional[list[str]], group: Optional[str]
+) -> tuple[list[str | contacts.Contact], Optional[str]]:
+    """
+    All requested recipients in order without duplicates, or an error to speak.
+    Spoken names/numbers/addresses stay strings; group members come back as the
+    Contact objects themselves, so people sharing a name aren't re-resolved onto one.
+    """
+    names = ([recipient] if recipient else []) + list(recipients or [])
+    members = []
+    if group:
+        members = await contacts.find_group(group)
+        if members is None:
+            return [], f"I couldn't find a contact group called '{group}', sir."
+
+    unique, seen = [], set()
+    for item in [n.strip() for n in names if n and n.strip()] + members:
+        key = ("id", item.id) if isinstance(item, contacts.Contact) else ("name", item.lower())
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique, None
+
+
+async def _resolve_recipients(
+    items: list[str | contacts.Contact], skip_lookup=lambda name: False
+) -> list[tuple[str, Optional[contacts.Contact]]]:
+    """(name to report, contact or None) per recipient; one index pass, each contact once."""
+    found = await contacts.find_contacts([i for i in items if isinstance(i, str) and not skip_lookup(i)])
+    resolved, seen = [], set()
+    for item in items:
+        contact = item if isinstance(item, contacts.Contact) else found.get(item)
+        if contact is not None:
+            if contact.id in seen:
+                continue
+            seen.add(contact.id)
+        resolved.append((contact.name if contact else item, contact))
+    return resolved
+
+
+def _fan_out_summary(what: str, queued: list[str], unresolved: list[str], missing: str) -> str:
+    parts = []
+    if queued:
+        parts.append(f"{what} queued for {', '.join(queued)}.")
+    if unresolved:
+        parts.append(f"I couldn't find {missing} for {', '.join(unresolved)}.")
+    if queued:
+        parts.append("I'll confirm when they're delivered.")
+    return " ".join(parts)
 
 
 @function_tool()
-async def send_text_message(recipient: str, message: str):
+async def send_text_message(
+    message: str,
+    recipient: Optional[str] = None,
+    recipients: Optional[list[str]] = None,
+    group: Optional[str] = None
+):
     """
-    Sends a message through the macOS Messages app.
-    recipient: either a name in contacts or a phone number string
+    Sends a message through the macOS Messages app, to one person or many at once.
+    The message is queued and delivered in the background; delivery is announced when done.
     message: message text
+    recipient: either a name in contacts or a phone number string
+    recipients: several names/numbers to send the same message to, in one call
+    group: a Contacts group name (e.g. "Family") to send the message to every member
     """
     try:
-        recipient = recipient.strip()
-
-        # Try to resolve via Contacts app
-        recipient_number = get_contact_number(recipient)
-
-        # If not found in Contacts, assume raw phone number
-        if not recipient_number:
-            recipient_number = recipient
-
-        applescript = f'''
-        tell application "Messages"
-            set targetBuddy to "{recipient_number}"
-            set iMessageService to 1st service whose service type = iMessage
-            try
-                send "{message}" to buddy targetBuddy of iMessageService
-            on error
-                set smsService to 1st service whose service type = SMS
-                send "{message}" to buddy targetBuddy of smsService
-            end try
-        end tell
-        '''
-
-        result = subprocess.run(
-            ["osascript", "-e", applescript],
-            capture_output=True,
-            text=True
-        )
-
-        if result.returncode == 0:
-            return f"Message sent to {recipient} ({recipient_number})."
-        else:
-            return f"Failed to send message to {recipient}: {result.stderr or result.stdout}"
+        names, error = await _expand_recipients(recipient, recipients, group)
+        if error:
+            return error
+        if not names:
+            return "Who should I send the message to, sir?"
+
+        if len(names) == 1 and isinstance(names[0], str):
+            # Resolve via the contact index; say who it resolved to so a wrong match is caught
+            to_name, recipient_number, error = await resolve_number(names[0])
+            if error:
+                return error
+
+            message_id = outbox.get_outbox().enqueue(
+                "text", to_name, {"number": recipient_number, "message": message}
+            )
+            return f"Message to {to_name} ({recipient_number}) queued as #{message_id}; I'll confirm when it's delivered."
+
+        # Fan-out: one index pass for every name, one outbox batch (delivered in parallel, announced once)
+        batch = uuid.uuid4().hex[:8]
+        queued, unresolved = [], []
+        for to_name, contact in await _resolve_recipients(names):
+            number = contact.phone if contact else (to_name if any(c.isdigit() for c in to_name) else None)
+            if not number:
+                unresolved.append(to_name)
+                continue
+            message_id = outbox.get_outbox().enqueue(
+                "text", to_name, {"number": number, "message": message}, batch=batch
+            )
+            queued.append(f"{to_name} (#{message_id})")
+        return _fan_out_summary("Message", queued, unresolved, "a phone number")
 
     except Exception as e:
         return f"Error: {str(e)}"
     
-def get_contact_email(name: str) -> str | None:
+async def resolve_email(name: str) -> tuple[str, Optional[str], Optional[str]]:
     """
-    Look up a contact's email address from the macOS Contacts app.
-    Prefers the first email, or None if not found.
+    Look a recipient up in the contact index (an address is used as-is).
+    Returns (who it resolved to, email address, error to speak instead).
     """
-    applescript = f'''
-    tell application "Contacts"
-        set thePeople to every person whose name contains "{name}"
-        if (count of thePeople) > 0 then
-            set thePerson to item 1 of thePeople
-            if (count of emails of thePerson) > 0 then
-                return value of first email of thePerson
-            end if
-        end if
-        return ""
-    end tell
-    '''
-    result = subprocess.run(
-        ["osascript", "-e", applescript],
-        capture_output=True,
-        text=True
-    )
-    email = result.stdout.strip()
-    return email if email else None
+    if "@" in name:
+        return name, name, None
+    contact = await contacts.find_contact(name)
+    if contact and contact.email:
+        return contact.name, contact.email, None
+    if contact:
+        return contact.name, None, f"I'm sorry sir but unfortunately {contact.name} doesn’t have an email provided."
+    return name, None, f"I couldn't find '{name}' in your contacts, sir. Who did you mean?"
     
+async def deliver_email(payload: dict):
+    """Outbox handler: send one email over the pooled Gmail SMTP connection."""
+    gmail_user = os.getenv("GMAIL_USER")
+
+    # Create message
+    msg = MIMEMultipart()
+    msg['From'] = gmail_user
+    msg['To'] = payload["to"]
+    msg['Subject'] = payload["subject"]
+
+    recipients = [payload["to"]]
+    if payload.get("cc"):
+        msg['Cc'] = payload["cc"]
+        recipients.append(payload["cc"])
+
+    msg.attach(MIMEText(payload["message"], 'plain'))
+
+    try:
+        await get_smtp_pool().sendmail(gmail_user, recipients, msg.as_string())
+    except smtplib.SMTPAuthenticationError:
+        raise outbox.PermanentError("authentication error, please check the Gmail credentials")
+    except smtplib.SMTPRecipientsRefused as e:
+        raise outbox.PermanentError(f"recipient refused ({', '.join(e.recipients)})")
+
+
+def _addressee(name: str, address: str) -> str:
+    return address if name == address else f"{name} <{address}>"
+
+
 @function_tool()
 async def send_email(
     context: RunContext,  # type: ignore
-    to_email: str,
     subject: str,
     message: str,
-    cc_email: Optional[str] = None
+    to_email: Optional[str] = None,
+    cc_email: Optional[str] = None,
+    recipients: Optional[list[str]] = None,
+    group: Optional[str] = None
 ) -> str:
     """
-    Send an email through Gmail.
+    Send an email through Gmail, to one person or as separate emails to many at once.
+    The email is queued and delivered in the background; delivery is announced when done.
     
     Args:
-        to_email: Recipient email address or contact name
         subject: Email subject line
         message: Email body content
-        cc_email: Optional CC email address or contact name
+        to_email: Recipient email address or contact name
+        cc_email: Optional CC email address or contact name (single-recipient emails only)
+        recipients: Several addresses/contact names, each gets their own copy
+        group: A Contacts group name (e.g. "Family"); every member gets their own copy
     """
     try:
-        # Resolve contact names to actual emails
-        resolved_to = get_contact_email(to_email) or to_email
-        if "@" not in resolved_to:
-            return f"I'm sorry sir but unfortunately '{to_email}' doesn’t have an email provided."
-        
-        resolved_cc = None
-        if cc_email:
-            resolved_cc = get_contact_email(cc_email) or cc_email
-            if "@" not in resolved_cc:
-                return f"I'm sorry sir but unfortunately '{cc_email}' doesn’t have an email provided."
-
-        # Gmail SMTP configuration
-        smtp_server = "smtp.gmail.com"
-        smtp_port = 587
-        
         gmail_user = os.getenv("GMAIL_USER")
         gmail_password = os.getenv("GMAIL_APP_PASSWORD")
         
         if not gmail_user or not gmail_password:
             logging.error("Gmail credentials not found in environment variables")
             return "Email sending failed: Gmail credentials not configured."
+
+        names, error = await _expand_recipients(to_email, recipients, group)
+        if error:
+            return error
+        if not names:
+            return "Who should I send the email to, sir?"
+
+        if len(names) == 1 and isinstance(names[0], str):
+            # Resolve contact names to actual emails; the reply names who they resolved to
+            to_name, resolved_to, error = await resolve_email(names[0])
+            if error:
+                return error
+
+            cc_name, resolved_cc = None, None
+            if cc_email:
+                cc_name, resolved_cc, error = await resolve_email(cc_email)
+                if error:
+                    return error
+
+            message_id = outbox.get_outbox().enqueue(
+                "email", resolved_to,
+                {"to": resolved_to, "cc": resolved_cc, "subject": subject, "message": message}
+            )
+            return (
+                f"📧 Email to {_addressee(to_name, resolved_to)}"
+                + (f" (cc: {_addressee(cc_name, resolved_cc)})" if resolved_cc else "")
+                + f" queued as #{message_id}; I'll confirm when it's delivered."
+            )
+
+        # Fan-out: a CC on a group email just becomes one more recipient
+        if cc_email and cc_email.strip().lower() not in {n.lower() for n in names if isinstance(n, str)}:
+            names.append(cc_email.strip())
+        batch = uuid.uuid4().hex[:8]
+        queued, unresolved = [], []
+        for to_name, contact in await _resolve_recipients(names, skip_lookup=lambda name: "@" in name):
+            address = contact.email if contact else (to_name if "@" in to_name else None)
+            if not address:
+                unresolved.append(to_name)
+                continue
+            message_id = outbox.get_outbox().enqueue(
+                "email", address,
+                {"to": address, "cc": None, "subject": subject, "message": message}, batch=batch
+            )
+            queued.append(f"{to_name} (#{message_id})")
+        return "📧 " + _fan_out_summary("Email", queued, unresolved, "an email address")
         
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = gmail_user
-        msg['To'] = resolved_to
-        msg['Subject'] = subject
-        
-        recipients = [resolved_to]
-        if resolved_cc:
-            msg['Cc'] = resolved_cc
-            recipients.append(resolved_cc)
-        
-        msg.attach(MIMEText(message, 'plain'))
-        
-        # Connect to Gmail SMTP
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(gmail_user, gmail_password)
-        server.sendmail(gmail_user, recipients, msg.as_string())
-        server.quit()
-        
-        return f"📧 Email sent successfully to {resolved_to}" + (f" (cc: {resolved_cc})" if resolved_cc else "")
-        
-    except smtplib.SMTPAuthenticationError:
-        return "❌ Email sending failed: Authentication error. Please check your Gmail credentials."
-    except smtplib.SMTPException as e:
-        return f"❌ Email sending failed: SMTP error - {str(e)}"
     except Exception as e:
         return f"❌ An error occurred while sending email: {str(e)}"
 
 
+@function_tool()
+async def message_status(message_id: Optional[int] = None) -> str:
+    """
+    Reports the delivery status of queued emails and text messages.
+
+    Args:
+        message_id: The number given when the message was queued; omit it for the most recent messages.
+    """
+    box = outbox.get_outbox()
+    if message_id is not None:
+        row = box.get(message_id)
+        return outbox.describe(row) if row else f"I have no message #{message_id}, sir."
+
+    rows = box.recent()
+    if not rows:
+        return "No messages have been sent yet."
+    return "\n".join(outbox.describe(row) for row in rows)
+
+
+outbox.register_handler("text", deliver_text)
+outbox.register_handler("email", deliver_email)
+
+
 @function_tool()
 async def call_contact(contact: str) -> str:
     """
@@ -201,17 +317,15 @@ async def call_contact(contact: str) -> str:
     try:
         contact = contact.strip()
 
-        # Try resolving via Contacts
-        number = get_contact_number(contact)
-
-        # If not found in Contacts, assume raw phone number
-        if not number:
-            number = contact
+        # Resolve via the contact index (raw numbers pass through)
+        name, number, error = await resolve_number(contact)
+        if error:
+            return error
 
         # Use FaceTime (macOS doesn't have a standalone Phone app)
-        subprocess.run(["open", f"tel://{number}"], check=True)
+        await process.run("open", f"tel://{number}", timeout=15, check=True)
 
-        return f"📞 Calling {contact} ({number}) now..."
+        return f"📞 Calling {name} ({number}) now..."
     except subprocess.CalledProcessError as e:
         return f"❌ Failed to call {contact}: {e}"
     except Exception as e:
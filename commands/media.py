@@ -1,23 +1,63 @@
 from livekit.agents import function_tool
 import asyncio
+import logging
 from livekit.agents import function_tool
-import subprocess
 import os
-import httpx
 from dotenv import load_dotenv
 from newspaper import Article
+from core import http_client, music_library, process
+from core.applescript import escape, run_applescript
+from core.metrics import span
 
 
 load_dotenv()
 SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
 
+async def _library_play_script(action, playlist, song, artist, album, shuffle_script):
+    """
+    Script that plays the library item matching the spoken names by persistent ID,
+    plus the resolved (playlist, song, artist) names; None when nothing matched.
+    """
+    if action not in ("playlist", "song", "artist") or not (playlist or song or artist):
+        return None, playlist, song, artist
+
+    library = music_library.get_library()
+    if not await library.ensure_loaded():  # still building: let Music.app search by name
+        return None, playlist, song, artist
+    if action == "playlist":
+        found = library.find_playlist(playlist) if playlist else None
+        if not found:
+            return None, playlist, song, artist
+        target = f'first user playlist whose persistent ID is "{found.id}"'
+        playlist = found.name
+    else:
+        if action == "song":
+            found = library.find_track(song, artist=artist, album=album) if song else None
+        else:
+            found = library.find_artist_track(artist) if artist else None
+        if not found:
+            return None, playlist, song, artist
+        target = f'first track of library playlist 1 whose persistent ID is "{found.id}"'
+        song = found.name if action == "song" else song
+        artist = found.artist or artist
+
+    applescript = f'''
+    tell application "Music"
+        {shuffle_script}
+        play ({target})
+    end tell
+    '''
+    return applescript, playlist, song, artist
+
+
 @function_tool()
 async def play_music(
     action: str, 
     playlist: str = None, 
     song: str = None, 
     artist: str = None, 
-    shuffle: bool = False
+    shuffle: bool = False,
+    album: str = None
 ):
     """
     Controls Apple Music on macOS.
@@ -26,64 +66,79 @@ async def play_music(
         action: 'play', 'pause', 'next', 'previous', 'playlist', 'song', or 'artist'
         playlist: optional, name of playlist to play
         song: optional, name of song to play
-        artist: optional, name of artist/band to play
+        artist: optional, name of artist/band to play (also narrows down a song)
         shuffle: whether to enable shuffle when playing a playlist, song, or artist
+        album: optional, album the song is on (narrows down a song)
     """
     try:
         applescript = None
         shuffle_script = 'set shuffle enabled to true' if shuffle else 'set shuffle enabled to false'
 
-        if action.lower() == "playlist" and playlist:
-            applescript = f'''
-            tell application "Music"
-                {shuffle_script}
-                play playlist "{playlist}"
-            end tell
-            '''
-
-        elif action.lower() == "song" and song:
-            applescript = f'''
-            tell application "Music"
-                {shuffle_script}
-                play track "{song}"
-            end tell
-            '''
-
-        elif action.lower() == "artist" and artist:
-            # plays the first track found by that artist in your library
-            applescript = f'''
-            tell application "Music"
-                {shuffle_script}
-                play (some track of library playlist 1 whose artist is "{artist}")
-            end tell
-            '''
-
-        elif action.lower() == "play":
-            applescript = 'tell application "Music" to play'
-
-        elif action.lower() == "pause":
-            applescript = 'tell application "Music" to pause'
-
-        elif action.lower() == "next":
-            applescript = 'tell application "Music" to next track'
-
-        elif action.lower() == "previous":
-            applescript = 'tell application "Music" to previous track'
+        # Resolve spoken names against the local library index and play by persistent ID
+        library_script, *resolved = await _library_play_script(
+            action.lower(), playlist, song, artist, album, shuffle_script
+        )
+
+        result = None
+        if library_script:
+            result = await run_applescript(library_script)
+            if result.ok:
+                playlist, song, artist = resolved
+            else:
+                # The item was deleted or replaced since the last sync
+                logging.warning(f"Playing from the music library index failed, searching by name: {result.stderr}")
+                result = None
+
+        if result is None:
+            # Not in the index, no library or a stale entry: let Music.app search by name
+            if action.lower() == "playlist" and playlist:
+                applescript = f'''
+                tell application "Music"
+                    {shuffle_script}
+                    play playlist "{escape(playlist)}"
+                end tell
+                '''
+
+            elif action.lower() == "song" and song:
+                applescript = f'''
+                tell application "Music"
+                    {shuffle_script}
+                    play track "{escape(song)}"
+                end tell
+                '''
+
+            elif action.lower() == "artist" and artist:
+                # plays the first track found by that artist in your library
+                applescript = f'''
+                tell application "Music"
+                    {shuffle_script}
+                    play (some track of library playlist 1 whose artist is "{escape(artist)}")
+                end tell
+                '''
+
+            elif action.lower() == "play":
+                applescript = 'tell application "Music" to play'
+
+            elif action.lower() == "pause":
+                applescript = 'tell application "Music" to pause'
+
+            elif action.lower() == "next":
+                applescript = 'tell application "Music" to next track'
+
+            elif action.lower() == "previous":
+                applescript = 'tell application "Music" to previous track'
 
-        else:
-            return "Invalid action. Use play, pause, next, previous, playlist, song, or artist."
+            else:
+                return "Invalid action. Use play, pause, next, previous, playlist, song, or artist."
 
-        result = subprocess.run(
-            ["osascript", "-e", applescript],
-            capture_output=True,
-            text=True
-        )
+            result = await run_applescript(applescript)
 
-        if result.returncode == 0:
+        if result.ok:
             if playlist:
                 return f"Playing playlist '{playlist}' {'with shuffle' if shuffle else ''}."
             elif song:
-                return f"Playing song '{song}' {'with shuffle' if shuffle else ''}."
+                by = f" by {artist}" if artist else ""
+                return f"Playing song '{song}'{by} {'with shuffle' if shuffle else ''}."
             elif artist:
                 return f"Playing songs by '{artist}' {'with shuffle' if shuffle else ''}."
             else:
@@ -98,21 +153,46 @@ async def play_music(
 async def can_you_open_the_app(app_name: str):
     """Opens a macOS app by name."""
     try:
-        # Use asyncio for non-blocking subprocess execution
-        process = await asyncio.create_subprocess_exec(
-            "open", "-a", app_name,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
+        result = await process.run("open", "-a", app_name, timeout=30)
 
-        if process.returncode == 0:
+        if result.ok:
             return f"{app_name} opened successfully."
         else:
-            return f"Failed to open {app_name}: {stderr.decode().strip()}"
+            return f"Failed to open {app_name}: {result.stderr}"
     except Exception as e:
         return f"Error: {str(e)}"
     
+QUIT_TIMEOUT = 5  # seconds each app gets to quit before we move on
+
+
+def quit_apps_script(apps: list[str], per_app_timeout: int = QUIT_TIMEOUT, command: str = "quit") -> str:
+    """
+    One AppleScript that quits every app in turn and reports a line per app.
+    `with timeout` keeps a hung app (e.g. a save dialog) from stalling the rest.
+    """
+    app_list = ", ".join(f'"{escape(app)}"' for app in apps)
+    return f'''
+    set report to {{}}
+    repeat with appName in {{{app_list}}}
+        set appName to appName as text
+        try
+            with timeout of {per_app_timeout} seconds
+                tell application appName to {command}
+            end timeout
+            set end of report to "Closed " & appName
+        on error errMsg number errNum
+            if errNum is -1712 then
+                set end of report to "Timed out closing " & appName
+            else
+                set end of report to "Failed to close " & appName
+            end if
+        end try
+    end repeat
+    set AppleScript's text item delimiters to linefeed
+    return report as text
+    '''
+
+
 @function_tool()
 async def close_app(app_name: str = "all", except_apps: list[str] = None):
     """
@@ -125,47 +205,33 @@ async def close_app(app_name: str = "all", except_apps: list[str] = None):
 
         if app_name.lower() != "all":
             # Quit a single app
-            process = await asyncio.create_subprocess_exec(
-                "osascript", "-e", f'tell application "{app_name}" to quit',
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            if process.returncode == 0:
+            result = await run_applescript(f'tell application "{escape(app_name)}" to quit')
+            if result.ok:
                 return f"{app_name} closed successfully."
             else:
-                return f"Failed to close {app_name}: {stderr.decode().strip()}"
+                return f"Failed to close {app_name}: {result.stderr}"
         else:
             # Quit all apps except exclusions
-            list_process = await asyncio.create_subprocess_exec(
-                "osascript", "-e",
-                'tell application "System Events" to get name of (processes where background only is false)',
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+            listed = await run_applescript(
+                'tell application "System Events" to get name of (processes where background only is false)'
             )
-            stdout, stderr = await list_process.communicate()
-            if list_process.returncode != 0:
-                return f"Error listing applications: {stderr.decode().strip()}"
+            if not listed.ok:
+                return f"Error listing applications: {listed.stderr}"
 
-            apps = [app.strip() for app in stdout.decode().split(",")]
+            apps = [app.strip() for app in listed.stdout.split(",")]
             apps_to_quit = [app for app in apps if app not in except_apps]
 
-            results = []
-            for app in apps_to_quit:
-                proc = await asyncio.create_subprocess_exec(
-                    "osascript", "-e", f'tell application "{app}" to quit',
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                await proc.communicate()
-                if proc.returncode == 0:
-                    results.append(f"Closed {app}")
-                else:
-                    results.append(f"Failed to close {app}")
-
-            if not results:
+            if not apps_to_quit:
                 return "No apps to close."
-            return "; ".join(results)
+
+            # Quit everything in a single script run instead of one osascript per app
+            result = await run_applescript(
+                quit_apps_script(apps_to_quit),
+                timeout=QUIT_TIMEOUT * len(apps_to_quit) + 5
+            )
+            if not result.ok:
+                return f"Error closing applications: {result.stderr}"
+            return "; ".join(line for line in result.stdout.splitlines() if line.strip())
 
     except Exception as e:
         return f"Error: {str(e)}"
@@ -186,9 +252,7 @@ async def search_web(query: str, num_results: int = 1, summarize: bool = True):
             "num": num_results
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            data = response.json()
+        data = await http_client.get_json(url, params=params)
 
         results = []
         for result in data.get("organic_results", []):
@@ -199,9 +263,12 @@ async def search_web(query: str, num_results: int = 1, summarize: bool = True):
             summary = snippet
             if summarize and link:
                 try:
-                    article = Article(link)
-                    article.download()
-                    article.parse()
+                    # Fetch on the shared client; newspaper only parses the HTML (off the loop)
+                    page = await http_client.get(link)
+                    with span("article"):
+                        article = Article(link)
+                        article.download(input_html=page.text)
+                        await asyncio.to_thread(article.parse)
                     text = article.text[:3000]  # keep it short for processing
 
                     # Ask Jarvis to generate a paragraph summary
@@ -222,9 +289,7 @@ async def search_web(query: str, num_results: int = 1, summarize: bool = True):
         for result in results:
             if result["link"]:
                 asyncio.create_task(
-                    asyncio.create_subprocess_exec(
-                        "open", "-a", "Google Chrome", result["link"]
-                    )
+                    process.run("open", "-a", "Google Chrome", result["link"], timeout=30)
                 )
 
         return [{"title": r["title"], "summary": r["summary"]} for r in results]
@@ -1,8 +1,9 @@
 from livekit.agents import function_tool
 import os
 import asyncio
-import subprocess
 import signal
+from core.applescript import run_applescript
+from core.journal import get_active_journal
 
 @function_tool
 async def mute_microphone() -> str:
@@ -10,21 +11,13 @@ async def mute_microphone() -> str:
     global previous_volume
     try:
         # Get current volume
-        proc_get = await asyncio.create_subprocess_exec(
-            'osascript', '-e', 'output volume of (get volume settings)',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, _ = await proc_get.communicate()
-        previous_volume = int(stdout.decode().strip())
+        result = await run_applescript('output volume of (get volume settings)')
+        if not result.ok:
+            return f"Could not mute system audio: {result.stderr or 'volume settings unavailable'}"
+        previous_volume = int(result.stdout)
 
         # Mute audio
-        proc_mute = await asyncio.create_subprocess_exec(
-            'osascript', '-e', 'set volume output volume 0',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        await proc_mute.communicate()
+        await run_applescript('set volume output volume 0')
         return "System audio muted, sir."
     except Exception as e:
         return f"Could not mute system audio: {e}"
@@ -40,12 +33,7 @@ async def unmute_microphone() -> str:
         if previous_volume is None:
             previous_volume = 50  # default if unknown
 
-        proc = await asyncio.create_subprocess_exec(
-            'osascript', '-e', f'set volume output volume {previous_volume}',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        await proc.communicate()
+        await run_applescript(f'set volume output volume {previous_volume}')
         return f"System audio restored to {previous_volume}%, sir."
     except Exception as e:
         return f"Could not restore system audio: {e}"
@@ -58,9 +46,15 @@ async def restart_system():
     """
     Triggers a restart of the AI process.
     """
-    # Optional: save any memory or state here
     print("Restarting ARTIS now...")
-    # Save memory or state if needed
+    # Push the conversation journal to memory; anything that doesn't make it in
+    # time stays on disk and is replayed on the next start.
+    journal = get_active_journal()
+    if journal:
+        try:
+            await asyncio.wait_for(journal.flush(), timeout=3)
+        except Exception as e:
+            print(f"Journal flush before restart failed: {e}")
     os._exit(42)
 
 
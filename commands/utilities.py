@@ -1,9 +1,12 @@
+import asyncio
 import os
 from dotenv import load_dotenv
 from livekit.agents import function_tool, RunContext
-import requests
 from datetime import datetime, timedelta
 from kasa import SmartPlug
+from core import http_client, routes
+from core.cache import PersistentCache, TTLCache
+from core.location import get_current_city, get_location
 
 load_dotenv()
 
@@ -32,38 +35,89 @@ async def get_date(context: RunContext) -> str:
 # ---------------------------------------------------------------------------------------------
 # Get weather for current city
 # ---------------------------------------------------------------------------------------------
-def get_current_city():
-    try:
-        response = requests.get("http://ip-api.com/json/")
-        data = response.json()
-        if data["status"] == "success":
-            return data["city"]
-        else:
-            return None
-    except Exception as e:
-        print(f"Error getting location: {e}")
+OPENWEATHERMAP_URL = "http://api.openweathermap.org"
+
+# Current conditions and the 3-hourly forecast change slowly; serve them from memory and
+# refresh in the background. Geocoding a city never changes, so it is kept on disk.
+current_weather_cache = TTLCache("weather_current", ttl=600, stale_ttl=3600)
+forecast_cache = TTLCache("weather_forecast", ttl=1800, stale_ttl=3 * 3600)
+air_quality_cache = TTLCache("air_quality", ttl=1800, stale_ttl=3 * 3600)
+geocode_cache = PersistentCache("geocode")
+
+
+class WeatherAPIError(Exception):
+    """OpenWeatherMap answered with an error (message is theirs)."""
+
+
+async def _owm_get(path: str, **params) -> dict:
+    params["appid"] = os.getenv("OPENWEATHERMAP_API_KEY")
+    response = await http_client.get(f"{OPENWEATHERMAP_URL}{path}", params=params)
+    data = response.json()
+    if response.status_code != 200:
+        raise WeatherAPIError(data.get("message", "Unknown error") if isinstance(data, dict) else "Unknown error")
+    return data
+
+
+async def _coordinates(city: str) -> tuple[float, float] | None:
+    """Coordinates for weather lookups: the location service's own, else a (cached) geocode of the city."""
+    location = await get_location()
+    if location and location.city == city and location.coordinates:
+        return location.coordinates
+
+    cached = geocode_cache.get(city.lower())
+    if cached:
+        return tuple(cached)
+    geo_data = await _owm_get("/geo/1.0/direct", q=city, limit=1)
+    if not geo_data:
         return None
+    coordinates = (geo_data[0]["lat"], geo_data[0]["lon"])
+    geocode_cache.set(city.lower(), coordinates)
+    return coordinates
+
+
+def _weather_key(coordinates: tuple[float, float]) -> tuple[float, float]:
+    # ~1 km grid so small location jitter still hits the cache
+    return round(coordinates[0], 2), round(coordinates[1], 2)
+
+
+async def _current_weather(coordinates: tuple[float, float]) -> dict:
+    lat, lon = _weather_key(coordinates)
+    return await current_weather_cache.get(
+        (lat, lon), lambda: _owm_get("/data/2.5/weather", lat=lat, lon=lon, units="imperial")
+    )
+
+
+async def _forecast(coordinates: tuple[float, float]) -> dict:
+    lat, lon = _weather_key(coordinates)
+    return await forecast_cache.get(
+        (lat, lon), lambda: _owm_get("/data/2.5/forecast", lat=lat, lon=lon, units="imperial")
+    )
+
+
+async def _air_quality(coordinates: tuple[float, float]) -> dict:
+    lat, lon = _weather_key(coordinates)
+    return await air_quality_cache.get(
+        (lat, lon), lambda: _owm_get("/data/2.5/air_pollution", lat=lat, lon=lon)
+    )
+
 
 @function_tool()
 async def get_weather(context: RunContext) -> str:
     """
     Get the current weather for the user’s current city using OpenWeatherMap with Jarvis-style commentary.
     """
-    city = get_current_city()
+    city = await get_current_city()
     if not city:
         return "Could not determine your location, sir."
 
     try:
-        api_key = os.getenv("OPENWEATHERMAP_API_KEY")
-        if not api_key:
+        if not os.getenv("OPENWEATHERMAP_API_KEY"):
             return "Weather service unavailable, sir: API key not configured."
-        
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=imperial"
-        response = requests.get(url)
-        data = response.json()
 
-        if response.status_code != 200:
-            return f"Could not retrieve weather for {city}, sir. Error: {data.get('message', 'Unknown error')}"
+        coordinates = await _coordinates(city)
+        if not coordinates:
+            return f"Could not retrieve coordinates for {city}, sir."
+        data = await _current_weather(coordinates)
 
         temp = data["main"]["temp"]
         description = data["weather"][0]["description"].capitalize()
@@ -81,7 +135,9 @@ async def get_weather(context: RunContext) -> str:
             commentary = "Weather seems quite agreeable, sir."
 
         return f"The current weather in {city} is {description} with a temperature of {temp}°F and humidity at {humidity}%. {commentary}"
-    
+
+    except WeatherAPIError as e:
+        return f"Could not retrieve weather for {city}, sir. Error: {e}"
     except Exception as e:
         return f"An error occurred while retrieving weather for {city}, sir: {str(e)}"
     
@@ -93,27 +149,31 @@ async def get_daily_forecast(context: RunContext) -> str:
     Get today's weather forecast including high, low, visibility, and air quality,
     with Jarvis-style commentary. Uses the free OpenWeatherMap APIs.
     """
-    city = get_current_city()
+    city = await get_current_city()
     if not city:
         return "Could not determine your location, sir."
 
     try:
-        api_key = os.getenv("OPENWEATHERMAP_API_KEY")
-        if not api_key:
+        if not os.getenv("OPENWEATHERMAP_API_KEY"):
             return "Weather service unavailable, sir: API key not configured."
 
-        # Step 1: Get today's forecast using the free forecast API
-        forecast_url = f"http://api.openweathermap.org/data/2.5/forecast?q={city}&appid={api_key}&units=imperial"
-        response = requests.get(forecast_url)
-        data = response.json()
+        coordinates = await _coordinates(city)
+        if not coordinates:
+            return f"Could not retrieve coordinates for {city}, sir."
 
-        if response.status_code != 200 or "list" not in data:
-            return f"Could not retrieve forecast for {city}, sir. Error: {data.get('message', 'Unknown error')}"
+        # Step 1: Forecast and air quality are independent; fetch (or read from cache) together
+        forecast, aqi_data = await asyncio.gather(
+            _forecast(coordinates), _air_quality(coordinates), return_exceptions=True
+        )
+        if isinstance(forecast, Exception):
+            raise forecast
+        if "list" not in forecast:
+            return f"Could not retrieve forecast for {city}, sir. Error: {forecast.get('message', 'Unknown error')}"
 
         # Step 2: Filter forecasts for today only
         today = datetime.now().date()
         today_forecasts = [
-            entry for entry in data["list"]
+            entry for entry in forecast["list"]
             if datetime.fromtimestamp(entry["dt"]).date() == today
         ]
 
@@ -143,21 +203,8 @@ async def get_daily_forecast(context: RunContext) -> str:
         else:
             visibility_status = "very poor"
 
-        # Step 4: Get Air Quality Index (AQI)
-        geocode_url = f"http://api.openweathermap.org/geo/1.0/direct?q={city}&limit=1&appid={api_key}"
-        geo_response = requests.get(geocode_url)
-        geo_data = geo_response.json()
-        if not geo_data:
-            return f"Could not retrieve coordinates for {city}, sir."
-
-        lat = geo_data[0]["lat"]
-        lon = geo_data[0]["lon"]
-
-        aqi_url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={api_key}"
-        aqi_response = requests.get(aqi_url)
-        aqi_data = aqi_response.json()
-
-        if aqi_response.status_code != 200 or "list" not in aqi_data:
+        # Step 4: Air Quality Index (AQI); the forecast is still worth giving without it
+        if isinstance(aqi_data, Exception) or "list" not in aqi_data:
             aqi_text = "unavailable"
         else:
             aqi = aqi_data["list"][0]["main"]["aqi"]
@@ -193,6 +240,8 @@ async def get_daily_forecast(context: RunContext) -> str:
             f"{remark} "
         )
 
+    except WeatherAPIError as e:
+        return f"Could not retrieve forecast for {city}, sir. Error: {e}"
     except Exception as e:
         return f"An error occurred while retrieving today's forecast for {city}, sir: {str(e)}"
 
@@ -210,7 +259,7 @@ def format_duration(minutes: int) -> str:
 async def get_directions(destination: str, origin: str = None, mode: str = "driving"):
     """
     Returns the fastest route directions using Google Maps API.
-    If origin is None, automatically uses the current city from get_current_city().
+    If origin is None, automatically uses the current (cached) city from core.location.
     Includes ETA, arrival time, and main route summary.
     """
     API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
@@ -218,26 +267,22 @@ async def get_directions(destination: str, origin: str = None, mode: str = "driv
         return {"success": False, "commentary": "Google Maps API key not set."}
 
     if not origin:
-        origin = get_current_city()
+        origin = await get_current_city()
         if not origin:
             return {
                 "success": False,
                 "commentary": "Unable to determine your current location. Please provide an origin address."
             }
 
-    url = "https://maps.googleapis.com/maps/api/directions/json"
-    params = {"origin": origin, "destination": destination, "mode": mode, "key": API_KEY}
-
     try:
-        res = requests.get(url, params=params).json()
-        if res.get("status") != "OK" or not res.get("routes"):
-            return {"success": False, "commentary": f"Failed to get directions: {res.get('status')}"}
+        # Cached per origin/destination/mode and 15-minute departure slot (see core.routes)
+        res = await routes.directions(origin, destination, mode)
 
         # Fastest route is always first in response
         route = res["routes"][0]
         leg = route["legs"][0]
 
-        duration_sec = leg["duration"]["value"]
+        duration_sec = leg.get("duration_in_traffic", leg["duration"])["value"]
         eta_minutes = round(duration_sec / 60)
 
         arrival_time = datetime.now() + timedelta(minutes=eta_minutes)
@@ -262,6 +307,8 @@ async def get_directions(destination: str, origin: str = None, mode: str = "driv
             "full_directions": [step["html_instructions"] for step in leg["steps"]]
         }
 
+    except routes.RouteError as e:
+        return {"success": False, "commentary": f"Failed to get directions: {e}"}
     except Exception as e:
         return {"success": False, "commentary": f"Error retrieving directions: {str(e)}"}
 
@@ -0,0 +1,270 @@
+"""
+AppleScript execution service.
+
+Every tool used to spawn a fresh `osascript` process per script (some two or
+more per call). All AppleScript now goes through run_applescript(), backed by:
+
+- DaemonBackend (default on macOS): a small pool of resident `osascript -l
+  JavaScript` interpreters that read JSON requests ({id, script}) on stdin and
+  run them with NSAppleScript. Requests carry IDs, time out individually (a
+  timed-out interpreter is killed and replaced) and at most
+  JARVIS_APPLESCRIPT_WORKERS scripts run at once.
+- SpawnBackend: the old one-process-per-script behavior.
+- FakeBackend: canned responses, so everything can run on Linux/CI.
+
+Pick one with JARVIS_APPLESCRIPT_BACKEND=daemon|spawn|fake or set_backend().
+Compare spawn vs daemon latency with `python -m core.bench applescript`.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Union
+
+from core import metrics, process
+
+APPLESCRIPT_TIMEOUT = float(os.getenv("JARVIS_APPLESCRIPT_TIMEOUT", "15"))
+APPLESCRIPT_WORKERS = int(os.getenv("JARVIS_APPLESCRIPT_WORKERS", "2"))
+# Longest daemon response line; bulk dumps (contacts, music library) run to several MB
+DAEMON_LINE_LIMIT = 64 * 1024 * 1024
+
+
+@dataclass
+class ScriptResult:
+    returncode: int
+    stdout: str = ""
+    stderr: str = ""
+    truncated: bool = False  # output went past max_output and was cut
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+def escape(value: str) -> str:
+    """Escape a value for use inside an AppleScript string literal."""
+    return (value or "").replace("\\", "\\\\").replace('"', '\\"')
+
+
+# ---------------------------------------------------------------------------------------------
+# Spawn backend
+# ---------------------------------------------------------------------------------------------
+class SpawnBackend:
+    async def run(self, script: str, timeout: float, max_output: Optional[int] = None) -> ScriptResult:
+        result = await process.run(
+            "osascript", "-e", script, timeout=timeout, max_output=max_output or process.PROCESS_MAX_OUTPUT
+        )
+        if result.timed_out:
+            return ScriptResult(-1, "", f"AppleScript timed out after {timeout:g}s")
+        return ScriptResult(result.returncode, result.stdout, result.stderr, truncated=result.truncated)
+
+    async def close(self):
+        pass
+
+
+# ---------------------------------------------------------------------------------------------
+# Daemon backend
+# ---------------------------------------------------------------------------------------------
+# JXA read-eval loop: one JSON request per line in, one JSON response per line out.
+# Lists are flattened to "a, b, c" like osascript prints them.
+_DAEMON_JXA = r"""
+ObjC.import('Foundation');
+const LIST = 0x6c697374;  // typeAEList
+const stdin = $.NSFileHandle.fileHandleWithStandardInput;
+const stdout = $.NSFileHandle.fileHandleWithStandardOutput;
+
+function fmt(d) {
+    if (d.descriptorType === LIST) {
+        const parts = [];
+        for (let i = 1; i <= d.numberOfItems; i++) parts.push(fmt(d.descriptorAtIndex(i)));
+        return parts.join(', ');
+    }
+    const s = d.stringValue;
+    return s.isNil() ? '' : s.js;
+}
+
+function send(obj) {
+    const s = $.NSString.alloc.initWithUTF8String(JSON.stringify(obj) + '\n');
+    stdout.writeData(s.dataUsingEncoding($.NSUTF8StringEncoding));
+}
+
+let buffer = '';
+while (true) {
+    const data = stdin.availableData;
+    if (data.length == 0) break;
+    buffer += $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js;
+    let nl;
+    while ((nl = buffer.indexOf('\n')) >= 0) {
+        const line = buffer.slice(0, nl);
+        buffer = buffer.slice(nl + 1);
+        if (!line) continue;
+        const req = JSON.parse(line);
+        const err = Ref();
+        const desc = $.NSAppleScript.alloc.initWithSource(req.script).executeAndReturnError(err);
+        if (desc.isNil()) {
+            const info = err[0];
+            const msg = info.isNil() ? 'unknown error' : ObjC.unwrap(info.objectForKey('NSAppleScriptErrorMessage'));
+            send({id: req.id, ok: false, err: String(msg)});
+        } else {
+            send({id: req.id, ok: true, out: fmt(desc)});
+        }
+    }
+}
+"""
+
+_request_ids = itertools.count(1)
+
+
+class _DaemonWorker:
+    def __init__(self):
+        self.proc: Optional[asyncio.subprocess.Process] = None
+
+    async def start(self):
+        self.proc = await asyncio.create_subprocess_exec(
+            "osascript", "-l", "JavaScript", "-e", _DAEMON_JXA,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=DAEMON_LINE_LIMIT,  # asyncio's default 64 KiB would fail on any large result
+        )
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None
+
+    async def run(self, script: str, timeout: float) -> ScriptResult:
+        request_id = next(_request_ids)
+        self.proc.stdin.write((json.dumps({"id": request_id, "script": script}) + "\n").encode())
+        await self.proc.stdin.drain()
+
+        line = await asyncio.wait_for(self.proc.stdout.readline(), timeout)
+        if not line:
+            raise ConnectionError("AppleScript daemon exited")
+        response = json.loads(line)
+        if response.get("id") != request_id:
+            raise ConnectionError(f"AppleScript daemon answered request {response.get('id')} instead of {request_id}")
+        if response["ok"]:
+            return ScriptResult(0, response.get("out", "").strip())
+        return ScriptResult(1, "", response.get("err", ""))
+
+    def kill(self):
+        if self.alive:
+            self.proc.kill()
+
+
+class DaemonBackend:
+    def __init__(self, workers: int = APPLESCRIPT_WORKERS):
+        self.size = workers
+        self._idle: list[_DaemonWorker] = []
+        self._slots = asyncio.Semaphore(workers)
+        self._fallback = SpawnBackend()
+
+    async def _acquire(self) -> _DaemonWorker:
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.alive:
+                return worker
+        worker = _DaemonWorker()
+        await worker.start()
+        metrics.inc("applescript_daemon_starts")
+        return worker
+
+    async def run(self, script: str, timeout: float, max_output: Optional[int] = None) -> ScriptResult:
+        async with self._slots:
+            worker = await self._acquire()
+            healthy = False
+            try:
+                result = await worker.run(script, timeout)
+                healthy = True
+                return result
+            except asyncio.TimeoutError:
+                return ScriptResult(-1, "", f"AppleScript timed out after {timeout:g}s")
+            except (ConnectionError, ValueError, BrokenPipeError) as e:
+                logging.error(f"AppleScript daemon failed ({e}), running script in a fresh osascript")
+                return await self._fallback.run(script, timeout, max_output)
+            finally:
+                # A timed-out, cancelled or broken interpreter may still be busy: replace it
+                if healthy:
+                    self._idle.append(worker)
+                else:
+                    worker.kill()
+
+    async def close(self):
+        for worker in self._idle:
+            worker.kill()
+        self._idle.clear()
+
+
+# ---------------------------------------------------------------------------------------------
+# Fake backend
+# ---------------------------------------------------------------------------------------------
+Responder = Union[str, ScriptResult, Callable[[str], Union[str, ScriptResult]]]
+
+
+@dataclass
+class FakeBackend:
+    """Answers scripts from (regex, response) rules; unmatched scripts succeed with no output."""
+    rules: list[tuple[re.Pattern, Responder]] = field(default_factory=list)
+    calls: list[str] = field(default_factory=list)
+    delay: float = 0.0
+
+    def add(self, pattern: str, response: Responder):
+        self.rules.append((re.compile(pattern, re.S), response))
+
+    async def run(self, script: str, timeout: float, max_output: Optional[int] = None) -> ScriptResult:
+        self.calls.append(script)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        for pattern, response in self.rules:
+            if pattern.search(script):
+                if callable(response):
+                    response = response(script)
+                return response if isinstance(response, ScriptResult) else ScriptResult(0, response)
+        return ScriptResult(0, "")
+
+    async def close(self):
+        pass
+
+
+# ---------------------------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------------------------
+_backend = None
+
+
+def _default_backend():
+    name = os.getenv("JARVIS_APPLESCRIPT_BACKEND") or ("daemon" if sys.platform == "darwin" else "spawn")
+    return {"daemon": DaemonBackend, "spawn": SpawnBackend, "fake": FakeBackend}[name]()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = _default_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """Swap the executor (e.g. a FakeBackend in tests). Returns the previous one."""
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
+
+
+async def run_applescript(
+    script: str, timeout: float = APPLESCRIPT_TIMEOUT, max_output: Optional[int] = None
+) -> ScriptResult:
+    """
+    Run an AppleScript and return its result; never raises for script errors.
+    max_output raises the output cap (process.PROCESS_MAX_OUTPUT) for scripts
+    that return bulk data; check result.truncated for those.
+    """
+    with metrics.span("applescript"):
+        result = await get_backend().run(script, timeout, max_output)
+    if not result.ok:
+        metrics.inc("applescript_errors")
+    return result
@@ -0,0 +1,212 @@
+"""
+Micro-benchmarks for the execution paths tools depend on.
+
+    python -m core.bench applescript [-n 30]
+    python -m core.bench close_apps [-n 30]
+    python -m core.bench loop_stall [-n 5]
+    python -m core.bench http [-n 50] [--handshake-ms 30]
+"""
+import argparse
+import asyncio
+import statistics
+import subprocess
+import time
+
+from core import applescript, http_client, metrics, process
+
+
+def _report(label: str, samples_ms: list[float]):
+    samples_ms = sorted(samples_ms)
+    p95 = samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))]
+    print(
+        f"{label:<28} n={len(samples_ms):<4} mean={statistics.mean(samples_ms):8.1f} ms  "
+        f"p50={statistics.median(samples_ms):8.1f} ms  p95={p95:8.1f} ms"
+    )
+
+
+async def _time_calls(run, script: str, n: int) -> list[float]:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        result = await run(script, applescript.APPLESCRIPT_TIMEOUT)
+        samples.append((time.perf_counter() - start) * 1000)
+        if not result.ok:
+            raise RuntimeError(f"benchmark script failed: {result.stderr}")
+    return samples
+
+
+async def bench_applescript(n: int):
+    script = 'return "ok"'
+    spawn = applescript.SpawnBackend()
+    daemon = applescript.DaemonBackend(workers=1)
+    try:
+        # First daemon call pays the interpreter start; report it separately
+        cold = await _time_calls(daemon.run, script, 1)
+        _report("daemon (first call)", cold)
+        _report("spawn (osascript per call)", await _time_calls(spawn.run, script, n))
+        _report("daemon (resident)", await _time_calls(daemon.run, script, n))
+    finally:
+        await daemon.close()
+
+
+async def bench_close_apps(n: int):
+    """
+    close_app("all") with n apps: the old one-osascript-per-app loop vs the
+    batched script. Uses a harmless `get name` against Finder instead of `quit`
+    so nothing is actually closed; the Apple Event round trips are the same.
+    """
+    from commands.media import quit_apps_script
+
+    apps = ["Finder"] * n
+    spawn = applescript.SpawnBackend()
+    daemon = applescript.DaemonBackend(workers=1)
+    try:
+        await daemon.run('return "warm"', applescript.APPLESCRIPT_TIMEOUT)
+
+        start = time.perf_counter()
+        for app in apps:
+            await spawn.run(f'tell application "{app}" to get name', applescript.APPLESCRIPT_TIMEOUT)
+        _report(f"serial loop ({n} apps)", [(time.perf_counter() - start) * 1000])
+
+        script = quit_apps_script(apps, command="get name")
+        _report(f"batched, spawn ({n} apps)", await _time_calls(spawn.run, script, 1))
+        _report(f"batched, daemon ({n} apps)", await _time_calls(daemon.run, script, 1))
+    finally:
+        await daemon.close()
+
+
+async def _measure_stall(label: str, work):
+    """Run `work` while the event-loop monitor is active and report how long the loop was blocked."""
+    monitor = asyncio.create_task(metrics.watch_event_loop(interval=0.01))
+    await asyncio.sleep(0.05)
+    blocked_before = metrics.get_counter("event_loop_stall_ms")
+    start = time.perf_counter()
+    await work()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    await asyncio.sleep(0.05)  # let the monitor observe the last stall
+    monitor.cancel()
+    blocked_ms = metrics.get_counter("event_loop_stall_ms") - blocked_before
+    print(f"{label:<28} wall={elapsed_ms:8.1f} ms  loop blocked={blocked_ms:8.1f} ms")
+
+
+async def bench_loop_stall(n: int):
+    """n child processes of 200 ms each: blocking subprocess.run vs core.process.run."""
+    async def blocking():
+        for _ in range(n):
+            subprocess.run(["sleep", "0.2"])
+
+    async def non_blocking():
+        for _ in range(n):
+            await process.run("sleep", "0.2")
+
+    await _measure_stall("subprocess.run (before)", blocking)
+    await _measure_stall("process.run (after)", non_blocking)
+
+
+async def _stub_server(handshake_ms: float) -> asyncio.AbstractServer:
+    """
+    Local keep-alive HTTP/1.1 server answering every request with a small JSON
+    body. Each new connection is delayed by handshake_ms to stand in for the
+    DNS + TCP + TLS setup a real API costs.
+    """
+    body = b'{"status": "OK"}'
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await asyncio.sleep(handshake_ms / 1000)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                if not head:
+                    break
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: keep-alive\r\n\r\n" + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def bench_http(n: int, handshake_ms: float):
+    """Per-call latency of the old per-call clients vs the shared pooled client."""
+    server = await _stub_server(handshake_ms)
+    port = server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/json"
+
+    async def timed(label: str, call):
+        samples = []
+        for _ in range(n):
+            start = time.perf_counter()
+            await call()
+            samples.append((time.perf_counter() - start) * 1000)
+        _report(label, samples)
+
+    try:
+        import requests
+
+        async def requests_get():
+            await asyncio.to_thread(lambda: requests.get(url, timeout=5).json())
+        await timed("requests.get per call", requests_get)
+    except ImportError:
+        print("requests not installed, skipped")
+
+    import httpx
+
+    async def httpx_per_call():
+        async with httpx.AsyncClient() as client:
+            (await client.get(url)).json()
+    await timed("httpx client per call", httpx_per_call)
+
+    try:
+        import aiohttp
+
+        async def aiohttp_per_call():
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url) as resp:
+                    await resp.json()
+        await timed("aiohttp session per call", aiohttp_per_call)
+    except ImportError:
+        print("aiohttp not installed, skipped")
+
+    async def shared():
+        await http_client.get_json(url)
+    await timed("shared pooled client", shared)
+
+    await http_client.close()
+    server.close()
+    await server.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="bench", required=True)
+    p = sub.add_parser("applescript", help="osascript per call vs resident interpreter")
+    p.add_argument("-n", type=int, default=30)
+
+    p = sub.add_parser("close_apps", help='close_app("all"): serial loop vs one batched script')
+    p.add_argument("-n", type=int, default=30)
+
+    p = sub.add_parser("loop_stall", help="event-loop blocking: subprocess.run vs core.process.run")
+    p.add_argument("-n", type=int, default=5)
+
+    p = sub.add_parser("http", help="per-call HTTP clients vs the shared pooled client, against a local stub")
+    p.add_argument("-n", type=int, default=50)
+    p.add_argument("--handshake-ms", type=float, default=30, help="simulated connection setup cost")
+
+    args = parser.parse_args()
+    if args.bench == "applescript":
+        asyncio.run(bench_applescript(args.n))
+    elif args.bench == "close_apps":
+        asyncio.run(bench_close_apps(args.n))
+    elif args.bench == "loop_stall":
+        asyncio.run(bench_loop_stall(args.n))
+    elif args.bench == "http":
+        asyncio.run(bench_http(args.n, args.handshake_ms))
+
+
+if __name__ == "__main__":
+    main()
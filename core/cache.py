@@ -0,0 +1,136 @@
+"""
+Small async caches for API responses.
+
+TTLCache keeps values in memory with two horizons: younger than `ttl` they are
+served as-is; up to `stale_ttl` they are still served immediately while one
+background fetch refreshes them (stale-while-revalidate); older than that the
+caller waits for a fetch. Concurrent misses for the same key share one fetch,
+and failed fetches are not cached. `ttl_for` lets the value pick its own TTL
+(e.g. shorter for routes in heavy traffic). Hit rates are exported per cache
+as the cache_hit_rate gauge.
+
+PersistentCache is a JSON file under ~/.jarvis for values that never change
+(e.g. geocoding a city name).
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from core import metrics
+from core.paths import atomic_write_json, data_path
+
+Fetch = Callable[[], Awaitable[Any]]
+
+
+class TTLCache:
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        stale_ttl: Optional[float] = None,
+        max_entries: int = 256,
+        ttl_for: Optional[Callable[[Any], float]] = None,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl or 0.0
+        self.max_entries = max_entries
+        self.ttl_for = ttl_for
+        self._entries: dict[Hashable, tuple[float, float, Any]] = {}  # key -> (stored at, ttl, value)
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._hits = self._lookups = 0
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > max(self.stale_ttl, entry[1]):
+            return None
+        return entry[2]
+
+    def set(self, key: Hashable, value: Any):
+        ttl = self.ttl_for(value) if self.ttl_for else self.ttl
+        self._entries[key] = (time.monotonic(), ttl, value)
+        if len(self._entries) > self.max_entries:
+            oldest = min(self._entries, key=lambda k: self._entries[k][0])
+            del self._entries[oldest]
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    async def _fetch(self, key: Hashable, fetch: Fetch) -> Any:
+        """
+        One fetch per key at a time; everyone asking meanwhile awaits the same
+        result. The fetch runs in its own task so a cancelled caller doesn't
+        cancel it for the others.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._store(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    async def _store(self, key: Hashable, fetch: Fetch) -> Any:
+        value = await fetch()
+        self.set(key, value)
+        return value
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # retrieved here too, in case every caller went away
+
+    async def _revalidate(self, key: Hashable, fetch: Fetch):
+        try:
+            await self._fetch(key, fetch)
+        except Exception as e:
+            logging.warning(f"Cache {self.name}: background refresh of {key!r} failed: {e}")
+
+    def _record(self, outcome: str):
+        self._lookups += 1
+        self._hits += outcome != "misses"
+        metrics.inc(f"cache_{outcome}", cache=self.name)
+        metrics.set_gauge("cache_hit_rate", self._hits / self._lookups, cache=self.name)
+
+    async def get(self, key: Hashable, fetch: Fetch) -> Any:
+        entry = self._entries.get(key)
+        age = None if entry is None else time.monotonic() - entry[0]
+
+        if age is not None and age <= entry[1]:
+            self._record("hits")
+            return entry[2]
+        if age is not None and age <= self.stale_ttl:
+            self._record("stale_hits")
+            if key not in self._inflight:
+                asyncio.create_task(self._revalidate(key, fetch))
+            return entry[2]
+
+        # Joining a fetch that is already running costs no extra request: counted with the hits
+        self._record("coalesced" if key in self._inflight else "misses")
+        return await self._fetch(key, fetch)
+
+
+class PersistentCache:
+    def __init__(self, name: str, path: Optional[str] = None):
+        self.name = name
+        self.path = path or data_path(f"{name}.json")
+        self._data: Optional[dict] = None
+
+    def _load(self) -> dict:
+        if self._data is None:
+            try:
+                with open(self.path, "r") as f:
+                    self._data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._data = {}
+        return self._data
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._load().get(key)
+        metrics.inc("cache_hits" if value is not None else "cache_misses", cache=self.name)
+        return value
+
+    def set(self, key: str, value: Any):
+        self._load()[key] = value
+        atomic_write_json(self.path, self._data)
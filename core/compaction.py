@@ -0,0 +1,153 @@
+"""
+Rolling chat-context compaction.
+
+Once the context passes COMPACTION_TOKEN_THRESHOLD, everything but the most
+recent turns is folded into a single summary message: old messages are
+shortened, old tool calls/outputs are reduced to one line each, and pinned
+items (the memory message) are kept as they are. Recent turns stay verbatim,
+except tool outputs over RECENT_TOOL_OUTPUT_MAX_CHARS, which are truncated.
+
+Compaction aims for COMPACTION_TARGET_RATIO of the threshold, keeping fewer
+recent turns (down to COMPACTION_MIN_RECENT) when it has to, so the context
+doesn't sit just over the threshold and compact again on every new item.
+"""
+import asyncio
+import logging
+import os
+from typing import Callable, Iterable
+
+from livekit.agents import ChatContext, ChatMessage
+
+from core import metrics
+from core.memory import estimate_tokens
+
+COMPACTION_TOKEN_THRESHOLD = int(os.getenv("JARVIS_COMPACTION_TOKENS", "6000"))
+COMPACTION_KEEP_RECENT = int(os.getenv("JARVIS_COMPACTION_KEEP_RECENT", "12"))
+COMPACTION_MIN_RECENT = 4
+COMPACTION_TARGET_RATIO = float(os.getenv("JARVIS_COMPACTION_TARGET_RATIO", "0.7"))
+
+MESSAGE_MAX_CHARS = 200
+TOOL_OUTPUT_MAX_CHARS = 120
+RECENT_TOOL_OUTPUT_MAX_CHARS = 2000
+SUMMARY_MAX_CHARS = 4000
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+
+def _item_text(item) -> str:
+    item_type = getattr(item, "type", "message")
+    if item_type == "message":
+        return item.text_content or ""
+    if item_type == "function_call":
+        return f"{item.name}({item.arguments})"
+    if item_type == "function_call_output":
+        return str(item.output)
+    return ""
+
+
+def context_tokens(items: Iterable) -> int:
+    return sum(estimate_tokens(_item_text(item)) for item in items)
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _summary_lines(items) -> list[str]:
+    lines = []
+    for item in items:
+        item_type = getattr(item, "type", "message")
+        text = _item_text(item)
+        if item_type == "message":
+            if text.startswith(SUMMARY_HEADER):
+                # Previous summary: keep its lines as they are
+                lines.extend(l for l in text[len(SUMMARY_HEADER):].splitlines() if l.strip())
+            elif text.strip("\u200b \n"):
+                lines.append(f"- {item.role}: {_shorten(text, MESSAGE_MAX_CHARS)}")
+        elif item_type == "function_call_output":
+            lines.append(f"- tool {item.name} returned: {_shorten(text, TOOL_OUTPUT_MAX_CHARS)}")
+        # function_call items are implied by their output line
+    return lines
+
+
+def _trim_tool_output(item):
+    """A recent tool output over RECENT_TOOL_OUTPUT_MAX_CHARS, cut down (the item itself otherwise)."""
+    if getattr(item, "type", "message") != "function_call_output":
+        return item
+    output = str(item.output)
+    if len(output) <= RECENT_TOOL_OUTPUT_MAX_CHARS:
+        return item
+    return item.model_copy(update={"output": output[:RECENT_TOOL_OUTPUT_MAX_CHARS] + " … (truncated)"})
+
+
+def _split_point(items: list, keep: int) -> int:
+    split = max(len(items) - keep, 0)
+    # Don't separate a tool output from the call that produced it
+    while split > 0 and getattr(items[split], "type", "message") == "function_call_output":
+        split -= 1
+    return split
+
+
+def _compact_at(items: list, pinned_ids: set, split: int) -> list | None:
+    pinned = [item for item in items[:split] if item.id in pinned_ids]
+    old = [item for item in items[:split] if item.id not in pinned_ids]
+    recent = [_trim_tool_output(item) for item in items[split:]]
+    if not old and all(a is b for a, b in zip(recent, items[split:])):
+        return None
+
+    head = pinned
+    if old:
+        summary = "\n".join(_summary_lines(old))
+        if len(summary) > SUMMARY_MAX_CHARS:
+            summary = summary[-SUMMARY_MAX_CHARS:].split("\n", 1)[-1]
+        head = pinned + [ChatMessage(role="assistant", content=[f"{SUMMARY_HEADER}\n{summary}"])]
+    return head + recent
+
+
+def compact_items(items: list, pinned_ids: set) -> list | None:
+    """Return the compacted item list, or None if the context is under the threshold."""
+    if context_tokens(items) <= COMPACTION_TOKEN_THRESHOLD:
+        return None
+
+    # Keep as many recent turns as fit under the target, but no fewer than COMPACTION_MIN_RECENT
+    target = COMPACTION_TOKEN_THRESHOLD * COMPACTION_TARGET_RATIO
+    compacted = None
+    for keep in range(COMPACTION_KEEP_RECENT, COMPACTION_MIN_RECENT - 1, -1):
+        candidate = _compact_at(items, pinned_ids, _split_point(items, keep))
+        if candidate is not None:
+            compacted = candidate
+            if context_tokens(candidate) <= target:
+                break
+    return compacted
+
+
+class ContextCompactor:
+    def __init__(self, agent, pinned_ids: Callable[[], set]):
+        self.agent = agent
+        self.pinned_ids = pinned_ids
+        self._task: asyncio.Task | None = None
+
+    def schedule(self):
+        """Check the context size soon; at most one compaction runs at a time."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._compact())
+
+    async def _compact(self):
+        items = list(self.agent.chat_ctx.items)
+        compacted = compact_items(items, self.pinned_ids())
+        if compacted is None:
+            return
+
+        before, after = context_tokens(items), context_tokens(compacted)
+        try:
+            await self.agent.update_chat_ctx(ChatContext(items=compacted))
+        except Exception as e:
+            logging.error(f"Chat context compaction failed: {e}")
+            return
+
+        metrics.inc("context_compactions")
+        metrics.set_gauge("context_tokens", after)
+        logging.info(
+            f"Compacted chat context: {len(items)} items / ~{before} tokens -> "
+            f"{len(compacted)} items / ~{after} tokens"
+        )
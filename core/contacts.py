@@ -0,0 +1,401 @@
+"""
+In-memory index of the macOS Contacts address book.
+
+Looking a contact up used to run a `whose name contains` AppleScript per call
+(two in series for an email with CC). The index is loaded once -- from the
+on-disk copy in ~/.jarvis/contacts.json, or one bulk AppleScript dump -- and
+then refreshed incrementally in the background (only people modified since the
+last sync are fetched, deletions are detected from the id list).
+
+Lookup order: exact name, whole word of a name ("Mom", "Katherine"), name
+substring, phonetic key (Soundex) for misheard names -- only when the spelling is
+close too -- then fuzzy similarity.
+Contacts groups ("Family") are indexed too so messages can fan out to them.
+
+Set JARVIS_CONTACTS_FIXTURE to a .json or .vcf export to run without Contacts.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from core import metrics, phonetics
+from core.applescript import run_applescript
+from core.paths import atomic_write_json, data_path
+
+CONTACTS_FIXTURE = os.getenv("JARVIS_CONTACTS_FIXTURE")
+CONTACTS_REFRESH_SECONDS = float(os.getenv("JARVIS_CONTACTS_REFRESH", "600"))
+CONTACTS_FUZZY_THRESHOLD = 0.8
+# A Soundex match alone is too loose ("Maggie", "Mack" and "Mix" all sound like "Mike");
+# the spelling has to be at least this close as well
+CONTACTS_PHONETIC_MIN_SIMILARITY = 0.65
+DUMP_TIMEOUT = 120
+DUMP_MAX_OUTPUT = 64 * 1024 * 1024  # a full dump of a large address book runs past process.PROCESS_MAX_OUTPUT
+
+# ASCII separators that can't appear in contact fields
+_FS, _GS, _RS, _US = "\x1c", "\x1d", "\x1e", "\x1f"
+
+
+@dataclass
+class Contact:
+    id: str
+    name: str
+    phones: list[tuple[str, str]] = field(default_factory=list)  # (label, value)
+    emails: list[tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def phone(self) -> Optional[str]:
+        """Mobile number if there is one, otherwise the first number."""
+        for label, value in self.phones:
+            if "mobile" in label or "cell" in label or "iphone" in label:
+                return value
+        return self.phones[0][1] if self.phones else None
+
+    @property
+    def email(self) -> Optional[str]:
+        return self.emails[0][1] if self.emails else None
+
+
+def _clean_label(label: str) -> str:
+    # Contacts stores built-in labels as "_$!<Mobile>!$_"
+    label = (label or "").strip()
+    if label.startswith("_$!<") and label.endswith(">!$_"):
+        label = label[4:-4]
+    return "" if label == "missing value" else label.lower()
+
+
+# ---------------------------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------------------------
+def _dump_script(modified_within: Optional[float]) -> str:
+    """Bulk-fetch people (all, or modified in the last N seconds), every id for deletions, and groups."""
+    selector = "every person"
+    if modified_within is not None:
+        selector = f"(every person whose modification date > ((current date) - {int(modified_within)}))"
+    return f'''
+    set FS to character id 28
+    set GS to character id 29
+    set RS to character id 30
+    set US to character id 31
+    tell application "Contacts"
+        set allIds to id of every person
+        set theIds to id of {selector}
+        set theNames to name of {selector}
+        set phoneLabels to label of phones of {selector}
+        set phoneValues to value of phones of {selector}
+        set emailLabels to label of emails of {selector}
+        set emailValues to value of emails of {selector}
+        set groupNames to name of every group
+        set groupMembers to id of people of every group
+    end tell
+    set AppleScript's text item delimiters to US
+    set out to (allIds as text) & FS
+    set AppleScript's text item delimiters to ""
+    repeat with i from 1 to count of theIds
+        set phoneText to ""
+        repeat with j from 1 to count of item i of phoneValues
+            set phoneText to phoneText & (item j of item i of phoneLabels as text) & "=" & (item j of item i of phoneValues) & GS
+        end repeat
+        set emailText to ""
+        repeat with j from 1 to count of item i of emailValues
+            set emailText to emailText & (item j of item i of emailLabels as text) & "=" & (item j of item i of emailValues) & GS
+        end repeat
+        set out to out & (item i of theIds) & US & (item i of theNames) & US & phoneText & US & emailText & RS
+    end repeat
+    set out to out & FS
+    set AppleScript's text item delimiters to GS
+    repeat with i from 1 to count of groupNames
+        set out to out & (item i of groupNames) & US & (item i of groupMembers as text) & RS
+    end repeat
+    set AppleScript's text item delimiters to ""
+    return out
+    '''
+
+
+def _parse_entries(text: str) -> list[tuple[str, str]]:
+    entries = []
+    for entry in text.split(_GS):
+        if entry:
+            label, _, value = entry.partition("=")
+            entries.append((_clean_label(label), value.strip()))
+    return entries
+
+
+def parse_dump(output: str) -> tuple[set[str], list[Contact], dict[str, list[str]]]:
+    """Parse _dump_script output into (every id in the address book, fetched contacts, groups)."""
+    all_ids, _, rest = output.partition(_FS)
+    records, _, group_records = rest.partition(_FS)
+    contacts = []
+    for record in records.split(_RS):
+        fields = record.split(_US)
+        if len(fields) != 4 or not fields[1].strip():
+            continue
+        contact_id, name, phones, emails = fields
+        contacts.append(Contact(contact_id, name.strip(), _parse_entries(phones), _parse_entries(emails)))
+
+    groups = {}
+    for record in group_records.split(_RS):
+        name, _, members = record.partition(_US)
+        if name.strip():
+            groups[name.strip()] = [m for m in members.split(_GS) if m]
+    return {i for i in all_ids.split(_US) if i}, contacts, groups
+
+
+def _vcard_value_label(key: str) -> str:
+    params = key.upper().split(";")[1:]
+    types = [p.split("=", 1)[-1] for p in params]
+    return ",".join(t.lower() for t in types if t and t.upper() not in ("PREF", "VOICE", "INTERNET"))
+
+
+def parse_vcards(text: str) -> tuple[list[Contact], dict[str, list[str]]]:
+    """Contacts and groups (Apple exports groups as KIND:group cards listing member UIDs)."""
+    contacts, groups, current, members, is_group = [], {}, None, [], False
+    for line in text.replace("\r\n ", "").splitlines():
+        key, _, value = line.partition(":")
+        prop = key.split(";")[0].split(".")[-1].upper()  # "item1.TEL;type=CELL" -> "TEL"
+        if prop == "BEGIN":
+            current, members, is_group = Contact(id="", name=""), [], False
+        elif current is None:
+            continue
+        elif prop == "END":
+            if is_group and current.name:
+                groups[current.name] = members
+            elif current.name:
+                current.id = current.id or f"vcard-{len(contacts)}"
+                contacts.append(current)
+            current = None
+        elif prop in ("KIND", "X-ADDRESSBOOKSERVER-KIND"):
+            is_group = value.strip().lower() == "group"
+        elif prop in ("MEMBER", "X-ADDRESSBOOKSERVER-MEMBER"):
+            members.append(value.strip().removeprefix("urn:uuid:"))
+        elif prop == "UID":
+            current.id = value.strip()
+        elif prop == "FN":
+            current.name = value.strip()
+        elif prop == "TEL":
+            current.phones.append((_vcard_value_label(key), value.strip()))
+        elif prop == "EMAIL":
+            current.emails.append((_vcard_value_label(key), value.strip()))
+    return contacts, groups
+
+
+def _contact_from_json(i: int, data: dict) -> Contact:
+    def entries(values) -> list[tuple[str, str]]:
+        return [
+            (_clean_label(v.get("label", "")), v["value"]) if isinstance(v, dict) else ("", v)
+            for v in values or []
+        ]
+    return Contact(str(data.get("id", f"json-{i}")), data["name"], entries(data.get("phones")), entries(data.get("emails")))
+
+
+def load_fixture(path: str) -> tuple[list[Contact], dict[str, list[str]]]:
+    """
+    Contacts and groups from a .vcf export, or JSON: a list of contacts or
+    {"contacts": [...], "groups": {"Family": ["Mom", "Dad"]}} (members by id or name).
+    """
+    with open(os.path.expanduser(path), "r") as f:
+        text = f.read()
+    if path.lower().endswith((".vcf", ".vcard")):
+        return parse_vcards(text)
+    data = json.loads(text)
+    if isinstance(data, list):
+        data = {"contacts": data}
+    contacts = [_contact_from_json(i, c) for i, c in enumerate(data.get("contacts", []))]
+    ids_by_name = {phonetics.normalize(c.name): c.id for c in contacts}
+    groups = {
+        name: [ids_by_name.get(phonetics.normalize(m), m) for m in members]
+        for name, members in data.get("groups", {}).items()
+    }
+    return contacts, groups
+
+
+# ---------------------------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------------------------
+class ContactIndex:
+    def __init__(self, path: Optional[str] = None, fixture: Optional[str] = CONTACTS_FIXTURE):
+        self.path = path or data_path("contacts.json")
+        self.fixture = fixture
+        self.contacts: dict[str, Contact] = {}
+        self.groups: dict[str, list[str]] = {}  # group name -> contact ids
+        self.synced_at: Optional[float] = None
+        self._by_name: dict[str, str] = {}
+        self._by_word: dict[str, list[str]] = {}
+        self._by_sound: dict[str, list[str]] = {}
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    # -- indexing -----------------------------------------------------------------------------
+    def _rebuild(self):
+        by_name, by_word, by_sound = {}, {}, {}
+        for contact in self.contacts.values():
+            name = phonetics.normalize(contact.name)
+            by_name.setdefault(name, contact.id)
+            by_sound.setdefault(phonetics.phonetic_key(name), []).append(contact.id)
+            for word in set(name.split()):
+                by_word.setdefault(word, []).append(contact.id)
+                by_sound.setdefault(phonetics.soundex(word), []).append(contact.id)
+        self._by_name, self._by_word, self._by_sound = by_name, by_word, by_sound
+        metrics.set_gauge("contacts_indexed", len(self.contacts))
+
+    def replace(self, contacts: list[Contact], groups: dict[str, list[str]]):
+        self.contacts = {c.id: c for c in contacts}
+        self.groups = groups
+        self._rebuild()
+
+    # -- lookup -------------------------------------------------------------------------------
+    def _first(self, ids: Optional[list[str]]) -> Optional[Contact]:
+        return self.contacts[ids[0]] if ids else None
+
+    def match(self, name: str) -> tuple[Optional[Contact], str]:
+        """Return (contact, how it matched); the contact is None when nothing is close enough."""
+        query = phonetics.normalize(name)
+        if not any(c.isalpha() for c in query):  # empty, or a raw phone number
+            return None, "none"
+
+        if query in self._by_name:
+            return self.contacts[self._by_name[query]], "exact"
+        words = query.split()
+        if len(words) == 1 and query in self._by_word:
+            return self._first(self._by_word[query]), "word"
+        for indexed_name, contact_id in self._by_name.items():
+            if query in indexed_name:
+                return self.contacts[contact_id], "contains"
+
+        best, best_score = None, CONTACTS_PHONETIC_MIN_SIMILARITY
+        for contact_id in self._by_sound.get(phonetics.phonetic_key(query), []):
+            indexed_name = phonetics.normalize(self.contacts[contact_id].name)
+            candidates = [indexed_name] + (indexed_name.split() if len(words) == 1 else [])
+            score = max(phonetics.similarity(query, c) for c in candidates)
+            if score >= best_score:
+                best, best_score = self.contacts[contact_id], score
+        if best:
+            return best, "phonetic"
+
+        best, best_score = None, CONTACTS_FUZZY_THRESHOLD
+        for indexed_name, contact_id in self._by_name.items():
+            candidates = [indexed_name] + (indexed_name.split() if len(words) == 1 else [])
+            score = max(phonetics.similarity(query, c) for c in candidates)
+            if score >= best_score:
+                best, best_score = self.contacts[contact_id], score
+        return (best, "fuzzy") if best else (None, "none")
+
+    def lookup(self, name: str) -> Optional[Contact]:
+        start = time.perf_counter()
+        contact, kind = self.match(name)
+        metrics.observe("contacts_lookup_ms", (time.perf_counter() - start) * 1000)
+        metrics.inc("contacts_lookups", kind=kind)
+        return contact
+
+    def group_members(self, name: str) -> Optional[list[Contact]]:
+        """Members of the group best matching `name`, or None if there's no such group."""
+        query = phonetics.normalize(name)
+        if query.startswith("the "):
+            query = query[4:]
+        best, best_score = None, CONTACTS_FUZZY_THRESHOLD
+        for group in self.groups:
+            normalized = phonetics.normalize(group)
+            score = 1.0 if normalized == query else phonetics.similarity(query, normalized)
+            if score >= best_score:
+                best, best_score = group, score
+        if best is None:
+            return None
+        return [self.contacts[i] for i in self.groups[best] if i in self.contacts]
+
+    # -- persistence and refresh --------------------------------------------------------------
+    def _load_disk(self) -> bool:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            contacts = [
+                Contact(c["id"], c["name"], [tuple(p) for p in c["phones"]], [tuple(e) for e in c["emails"]])
+                for c in data["contacts"]
+            ]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            return False
+        self.replace(contacts, data.get("groups", {}))
+        self.synced_at = data.get("synced_at")
+        return True
+
+    def _save_disk(self):
+        atomic_write_json(self.path, {
+            "synced_at": self.synced_at,
+            "contacts": [asdict(c) for c in self.contacts.values()],
+            "groups": self.groups,
+        })
+
+    async def refresh(self):
+        """Pull changes from Contacts: everything on the first sync, only modified people after that."""
+        async with self._lock:
+            if self.fixture:
+                self.replace(*load_fixture(self.fixture))
+                self.synced_at = time.time()
+                return
+
+            started = time.time()
+            # Overlap the window a little so edits made during the last dump aren't missed
+            window = started - self.synced_at + 60 if self.synced_at and self.contacts else None
+            result = await run_applescript(_dump_script(window), timeout=DUMP_TIMEOUT, max_output=DUMP_MAX_OUTPUT)
+            if not result.ok:
+                logging.error(f"Contacts refresh failed: {result.stderr}")
+                return
+            if result.truncated:
+                logging.error(f"Contacts refresh failed: dump truncated at {DUMP_MAX_OUTPUT} bytes")
+                return
+
+            all_ids, changed, groups = parse_dump(result.stdout)
+            if window is None:
+                contacts = {c.id: c for c in changed}
+            else:
+                contacts = {i: c for i, c in self.contacts.items() if i in all_ids}
+                contacts.update({c.id: c for c in changed})
+            self.contacts = contacts
+            self.groups = groups
+            self._rebuild()
+            self.synced_at = started
+            await asyncio.to_thread(self._save_disk)
+            metrics.observe("contacts_refresh_ms", (time.time() - started) * 1000)
+            logging.info(f"Contacts index refreshed: {len(changed)} updated, {len(self.contacts)} total")
+
+    async def ensure_loaded(self):
+        """Load the index on first use; later calls schedule a background refresh when stale."""
+        if self.synced_at is None and not self.fixture:
+            await asyncio.to_thread(self._load_disk)
+        if self.synced_at is None:
+            await self.refresh()
+        elif time.time() - self.synced_at > CONTACTS_REFRESH_SECONDS and (
+            self._refresh_task is None or self._refresh_task.done()
+        ):
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+
+_index: Optional[ContactIndex] = None
+
+
+def get_index() -> ContactIndex:
+    global _index
+    if _index is None:
+        _index = ContactIndex()
+    return _index
+
+
+async def find_contact(name: str) -> Optional[Contact]:
+    index = get_index()
+    await index.ensure_loaded()
+    return index.lookup(name)
+
+
+async def find_contacts(names: list[str]) -> dict[str, Optional[Contact]]:
+    """Resolve several names against one loaded index (one load/refresh check for the batch)."""
+    index = get_index()
+    await index.ensure_loaded()
+    return {name: index.lookup(name) for name in names}
+
+
+async def find_group(name: str) -> Optional[list[Contact]]:
+    index = get_index()
+    await index.ensure_loaded()
+    return index.group_members(name)
@@ -1,8 +1,9 @@
 from commands.utilities import get_time, get_weather, get_daily_forecast
-from commands.calendar import get_reminders, get_next_calendar_event, get_eta_to_event
+from commands.calendar import get_reminders, get_upcoming_events
 from datetime import datetime
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from datetime import timedelta
+from core import eta_planner, tts
 
 scheduler = AsyncIOScheduler()                
 async def morning_routine(session=None):
@@ -21,7 +22,7 @@ async def morning_routine(session=None):
 
     # ✅ Speak via LiveKit if session is active
     if session:
-        await session.say(message)
+        await tts.say(session, message)
     else:
         print(f"[Morning Routine] {message}")  # Fallback for debugging
 
@@ -35,7 +36,7 @@ async def notify_reminder(reminder, session=None):
 
     message = f"Sir, I believe you asked me to remind you to {title} at {formatted_time}."
     if session:
-        await session.say(message)
+        await tts.say(session, message)
     else:
         print(f"[Reminder] {message}")
 
@@ -63,42 +64,62 @@ async def schedule_reminders(session=None):
             kwargs={"reminder": reminder, "session": session}
         )
 
+# Events already told to leave for, so a shifting ETA doesn't repeat the announcement
+_leave_announced: set[tuple] = set()
+CHECK_EVENTS_MINUTES = 5
+
+
 async def check_events(session=None):
     """
-    Checks for upcoming events, announces them 1 hour before, and gives ETA if location exists.
+    Checks the day's upcoming events: announces each one 1 hour before (with the
+    drive time when it has a location) and says when it's time to leave. Travel
+    times come from batched, cached Distance Matrix lookups, and only for events
+    close enough that it could be time to leave before the next check.
     """
-    event = await get_next_calendar_event()
-    if not event:
+    events = await get_upcoming_events()
+    if not events:
         return  # No events today
 
     now = datetime.now()
-    start_time = event["start_time"]
-
-    if not start_time:
-        return
-
-    time_diff = start_time - now
-
-    # ✅ Notify only if within 1 hour before start
-    if timedelta(minutes=55) < time_diff <= timedelta(hours=1):
-        title = event["title"]
-        formatted_time = start_time.strftime("%I:%M %p")
-
-        if event["location"]:
-            eta_info = await get_eta_to_event(event["location"])
-            if "error" not in eta_info:
-                message = (
-                    f"Sir, you have '{title}' at {formatted_time} in {event['location']}. "
-                    f"It is {eta_info['distance']} away, approximately {eta_info['duration']} by car."
+    _leave_announced.difference_update({key for key in _leave_announced if key[1] < now})
+    messages = []
+    horizon = eta_planner.planning_horizon(CHECK_EVENTS_MINUTES)
+    for plan in await eta_planner.plan(events, horizon=horizon):
+        time_diff = plan.start_time - now
+        title = plan.title
+        formatted_time = plan.start_time.strftime("%I:%M %p")
+
+        # ✅ Notify only if within 1 hour before start
+        if timedelta(minutes=55) < time_diff <= timedelta(hours=1):
+            if plan.location and plan.duration:
+                messages.append(
+                    f"Sir, you have '{title}' at {formatted_time} in {plan.location}. "
+                    f"It is {plan.distance} away, approximately {plan.duration} by car; "
+                    f"I'd leave by {plan.leave_by.strftime('%I:%M %p')}."
                 )
+            elif plan.location:
+                messages.append(f"Sir, you have '{title}' at {formatted_time} in {plan.location}.")
             else:
-                message = f"Sir, you have '{title}' at {formatted_time} in {event['location']}."
-        else:
-            message = f"Sir, you have '{title}' at {formatted_time}."
-
+                messages.append(f"Sir, you have '{title}' at {formatted_time}.")
+
+        # Time to leave: the leave-by time falls before the next check
+        key = (title, plan.start_time.replace(second=0, microsecond=0))
+        if (
+            plan.leave_by
+            and key not in _leave_announced
+            and plan.leave_by <= now + timedelta(minutes=CHECK_EVENTS_MINUTES)
+            and plan.start_time > now
+        ):
+            _leave_announced.add(key)
+            messages.append(
+                f"Sir, it's time to leave for '{title}' in {plan.location}; "
+                f"it's {plan.duration} away and starts at {formatted_time}."
+            )
+
+    for message in messages:
         # Speak or print
         if session:
-            await session.say(message)
+            await tts.say(session, message)
         else:
             print(f"[Event] {message}")
 
@@ -130,7 +151,7 @@ def start_scheduler(session):
     scheduler.add_job(
     check_events,
     "interval",
-    minutes=5,
+    minutes=CHECK_EVENTS_MINUTES,
     kwargs={"session": session}
     )
 
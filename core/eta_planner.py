@@ -0,0 +1,116 @@
+"""
+Leave-by planning for the day's calendar events.
+
+check_events used to look at the next event only and ask Distance Matrix for
+its ETA on every 5-minute poll. The planner takes all upcoming events with a
+location, sends their destinations from one origin in a single Distance Matrix
+request (cached by core.routes, so polls within the same traffic bucket cost
+nothing), and works out each event's leave-by time locally:
+
+    leave_by = start - travel time in traffic - LEAVE_BUFFER_MINUTES
+
+Only events that could need leaving for soon are routed: with a horizon (see
+planning_horizon) events starting later keep None fields, so a poll outside
+the hours before an event costs no request. Traffic is asked for at the
+earliest estimated departure among them (the previous leave-by for that
+location, or now) rather than at the time of the poll, in one request.
+
+Set JARVIS_ETA_ORIGIN to where the trips start from and JARVIS_MAX_TRAVEL_MINUTES
+to the longest drive you'd expect.
+"""
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from core import metrics, routes
+
+ETA_ORIGIN = os.getenv("JARVIS_ETA_ORIGIN", "Panorama City, CA")
+LEAVE_BUFFER_MINUTES = int(os.getenv("JARVIS_LEAVE_BUFFER_MINUTES", "10"))
+MAX_TRAVEL_MINUTES = int(os.getenv("JARVIS_MAX_TRAVEL_MINUTES", "120"))
+
+# Last travel time per location, to estimate when the next trip there starts
+_travel_estimates: dict[str, int] = {}
+
+
+@dataclass
+class EventPlan:
+    title: str
+    start_time: datetime
+    location: Optional[str]
+    duration: Optional[str] = None  # spoken travel time, e.g. "25 mins"
+    distance: Optional[str] = None
+    travel_seconds: Optional[int] = None
+    leave_by: Optional[datetime] = None
+
+
+def _chunks(items: list[str], size: int) -> list[list[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def planning_horizon(poll_minutes: int, buffer_minutes: int = LEAVE_BUFFER_MINUTES) -> timedelta:
+    """How far ahead an event can start and still need leaving for before the next poll."""
+    return timedelta(minutes=MAX_TRAVEL_MINUTES + buffer_minutes + poll_minutes)
+
+
+def _departure(p: EventPlan, now: datetime, buffer_minutes: int) -> datetime:
+    travel = _travel_estimates.get(p.location)
+    if travel is None:
+        return now
+    return max(now, p.start_time - timedelta(seconds=travel, minutes=buffer_minutes))
+
+
+async def travel_times(origin: str, destinations: list[str], departure: Optional[float] = None) -> dict[str, dict]:
+    """Distance Matrix element (status OK) per destination, one request per MATRIX_MAX_DESTINATIONS."""
+    elements = {}
+    for chunk in _chunks(destinations, routes.MATRIX_MAX_DESTINATIONS):
+        data = await routes.distance_matrix(origin, chunk, departure=departure)
+        for destination, element in zip(chunk, data["rows"][0]["elements"]):
+            if element.get("status") == "OK":
+                elements[destination] = element
+    return elements
+
+
+async def plan(
+    events: list[dict],
+    origin: str = ETA_ORIGIN,
+    buffer_minutes: int = LEAVE_BUFFER_MINUTES,
+    horizon: Optional[timedelta] = None,
+) -> list[EventPlan]:
+    """
+    Leave-by plan for events shaped like get_upcoming_events() returns. Events
+    without a route, already started or (with a horizon) starting later than
+    now + horizon keep None fields.
+    """
+    plans = [EventPlan(e["title"], e["start_time"], e.get("location")) for e in events if e.get("start_time")]
+    now = datetime.now()
+    routable = [
+        p for p in plans
+        if p.location and p.start_time > now and (horizon is None or p.start_time - now <= horizon)
+    ]
+    if not routable:
+        return plans
+
+    # One matrix request per poll, at the earliest estimated departure: the
+    # soonest trip is the one whose leave-by time matters next
+    departure = min(_departure(p, now, buffer_minutes) for p in routable).timestamp()
+    destinations = list(dict.fromkeys(p.location for p in routable))
+    try:
+        elements = await travel_times(origin, destinations, departure)
+    except Exception as e:
+        metrics.inc("eta_plan_errors")
+        logging.error(f"ETA planner: Distance Matrix lookup failed: {e}")
+        return plans
+
+    for p in routable:
+        element = elements.get(p.location)
+        if element is None:
+            continue
+        travel = element.get("duration_in_traffic", element["duration"])
+        p.duration = travel["text"]
+        p.distance = element["distance"]["text"]
+        p.travel_seconds = travel["value"]
+        p.leave_by = p.start_time - timedelta(seconds=p.travel_seconds, minutes=buffer_minutes)
+        _travel_estimates[p.location] = p.travel_seconds
+    return plans
@@ -0,0 +1,124 @@
+"""
+Shared async HTTP client for outbound API calls.
+
+Tools used to make HTTP calls three different ways: blocking requests.get()
+inside async tools, a new httpx.AsyncClient per search, and a new
+aiohttp.ClientSession per ETA lookup -- every call paid DNS + TCP + TLS again
+and none had a timeout. They all go through one httpx.AsyncClient now:
+
+- keep-alive pool per host (HTTP_MAX_CONNECTIONS, idle ones kept
+  HTTP_KEEPALIVE_SECONDS), HTTP/2 when the `h2` package is installed
+- default timeouts (HTTP_TIMEOUT overall per phase, HTTP_CONNECT_TIMEOUT to connect)
+- retries: connection failures are retried by the transport; idempotent
+  requests are also retried on timeouts and 429/502/503/504 with backoff
+
+The client belongs to the event loop that created it; a new loop (e.g. a
+benchmark or test run) gets its own.
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+from typing import Optional
+
+import httpx
+
+from core import metrics
+
+HTTP_TIMEOUT = float(os.getenv("JARVIS_HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("JARVIS_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_RETRIES = int(os.getenv("JARVIS_HTTP_RETRIES", "2"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("JARVIS_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_SECONDS = 60
+HTTP_BACKOFF_BASE = 0.3
+HTTP2_ENABLED = os.getenv("JARVIS_HTTP2", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _new_client() -> httpx.AsyncClient:
+    transport = httpx.AsyncHTTPTransport(
+        http2=HTTP2_ENABLED,
+        retries=HTTP_RETRIES,  # connect errors only
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+        ),
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        follow_redirects=True,
+        headers={"User-Agent": "Jarvis/1.0"},
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client, _client_loop = _new_client(), loop
+    return _client
+
+
+def _retry_after(response: Optional[httpx.Response], attempt: int) -> float:
+    if response is not None:
+        try:
+            return min(float(response.headers.get("Retry-After", "")), 10.0)
+        except ValueError:
+            pass
+    return HTTP_BACKOFF_BASE * 2 ** attempt
+
+
+async def request(method: str, url: str, *, retries: int = HTTP_RETRIES, **kwargs) -> httpx.Response:
+    """
+    Send a request on the shared client. Returns the response whatever its
+    status (callers check status_code like they did with requests); raises
+    httpx.HTTPError when no response could be had.
+    """
+    client = get_client()
+    method = method.upper()
+    if method not in IDEMPOTENT_METHODS:
+        retries = 0
+
+    with metrics.span("http"):
+        for attempt in range(retries + 1):
+            response = None
+            try:
+                response = await client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    metrics.inc("http_requests", host=response.url.host, status=str(response.status_code))
+                    return response
+                await response.aclose()
+            except (httpx.TimeoutException, httpx.NetworkError) as e:
+                # The transport already retried connecting; only retry failures mid-request
+                if attempt == retries or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)):
+                    metrics.inc("http_errors", host=httpx.URL(url).host)
+                    raise
+                logging.warning(f"HTTP {method} {url} failed ({e!r}); retrying")
+            metrics.inc("http_retries", host=httpx.URL(url).host)
+            await asyncio.sleep(_retry_after(response, attempt))
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+async def get_json(url: str, **kwargs):
+    response = await get(url, **kwargs)
+    return response.json()
+
+
+async def close():
+    global _client
+    if _client is not None:
+        try:
+            await _client.aclose()
+        except Exception as e:
+            logging.error(f"Closing HTTP client failed: {e}")
+        _client = None
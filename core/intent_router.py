@@ -0,0 +1,170 @@
+"""
+Deterministic fast path for trivial commands.
+
+"What time is it", "turn off the bedroom lamp", "pause music"... need no
+reasoning, so when the whole (normalized) transcript matches one of the
+patterns below the tool is called directly and its result is spoken, skipping
+the realtime-model turn. Anything that doesn't match exactly goes to the LLM.
+
+The tool modules behind the routes (commands.utilities pulls in kasa) are
+imported in a thread by preload(), never on the event loop mid-turn.
+"""
+import asyncio
+import inspect
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from core import metrics, tool_registry, wake_word
+
+_FILLERS = re.compile(
+    r"\b(?:please|sir|for me|right now|now|real quick|"
+    r"(?:can|could|would|will) you|tell me|do you know)\b"
+)
+
+
+@dataclass
+class Route:
+    tool: str
+    patterns: list[str]
+    args: dict = field(default_factory=dict)
+    # Optional check on the captured arguments; return False to fall back to the LLM
+    accept: Optional[Callable[[dict], bool]] = None
+
+    def __post_init__(self):
+        self.compiled = [re.compile(p) for p in self.patterns]
+
+    def match(self, text: str) -> Optional[dict]:
+        for pattern in self.compiled:
+            m = pattern.fullmatch(text)
+            if m:
+                args = {**self.args, **{k: v for k, v in m.groupdict().items() if v}}
+                if self.accept is None or self.accept(args):
+                    return args
+        return None
+
+
+def _known_lamp_target(args: dict) -> bool:
+    utilities = tool_registry.load_module("commands.utilities")
+    target = args["lamp_or_room"]
+    return target in utilities.ROOMS or target in utilities.LAMP_IPS
+
+
+_LAMP_TARGET = r"(?:the )?(?P<lamp_or_room>[a-z ]+?)(?: lamps?| lights?)?"
+
+ROUTES = [
+    Route("get_time", [
+        r"what time is it",
+        r"what(?:s| is) the (?:current )?time",
+        r"(?:the )?(?:current )?time",
+    ]),
+    Route("get_date", [
+        r"what(?:s| is) (?:the|todays) date",
+        r"what(?:s| is) the date today",
+        r"what day is (?:it|today)",
+        r"(?:todays )?date",
+    ]),
+    Route("turn_on_lamp", [
+        rf"(?:turn|switch) on {_LAMP_TARGET}",
+        rf"(?:turn|switch) {_LAMP_TARGET} on",
+    ], accept=_known_lamp_target),
+    Route("turn_off_lamp", [
+        rf"(?:turn|switch) off {_LAMP_TARGET}",
+        rf"(?:turn|switch) {_LAMP_TARGET} off",
+    ], accept=_known_lamp_target),
+    Route("play_music", [r"(?:pause|stop) (?:the )?(?:music|song)", r"pause"], args={"action": "pause"}),
+    Route("play_music", [r"(?:resume|unpause) (?:the )?(?:music|song)", r"resume", r"play (?:the )?music"], args={"action": "play"}),
+    Route("play_music", [r"(?:next|skip(?: this)?) (?:song|track)", r"skip"], args={"action": "next"}),
+    Route("play_music", [r"(?:previous|last) (?:song|track)"], args={"action": "previous"}),
+]
+
+
+_ROUTE_MODULES = sorted({tool_registry.module_for(r.tool) for r in ROUTES})
+_preload_task: Optional[asyncio.Task] = None
+
+
+def _import_route_modules():
+    for module in _ROUTE_MODULES:
+        tool_registry.load_module(module)
+
+
+def preload() -> asyncio.Task:
+    """Import the fast-path tool modules in a thread; started at session start, awaited by route()."""
+    global _preload_task
+    failed = _preload_task is not None and _preload_task.done() and (
+        _preload_task.cancelled() or _preload_task.exception() is not None
+    )
+    if _preload_task is None or failed:  # retried on the next turn after a failed import
+        _preload_task = asyncio.create_task(asyncio.to_thread(_import_route_modules))
+    return _preload_task
+
+
+def normalize(text: str) -> str:
+    # Same wake-word matcher as the gate, so whatever it lets through is stripped here
+    text = wake_word.strip(text)
+    text = _FILLERS.sub(" ", text)
+    return " ".join(text.split())
+
+
+def match(text: str) -> Optional[tuple[str, dict]]:
+    """Return (tool name, arguments) when the transcript confidently matches a route."""
+    normalized = normalize(text)
+    if not normalized:
+        return None
+    for route in ROUTES:
+        args = route.match(normalized)
+        if args is not None:
+            return route.tool, args
+    return None
+
+
+def _update_hit_rate():
+    hits = metrics.get_counter("router_hits")
+    total = hits + metrics.get_counter("router_misses")
+    metrics.set_gauge("router_hit_rate", hits / total if total else 0.0)
+
+
+async def route(text: str) -> Optional[str]:
+    """
+    Run the fast path for a transcript. Returns the text to speak, or None if the
+    request should go to the LLM.
+    """
+    start = time.perf_counter()
+    try:
+        await asyncio.shield(preload())
+    except Exception as e:
+        logging.error(f"Fast-path tools failed to load, using the LLM: {e}")
+        return None
+
+    matched = match(text or "")
+    if matched is None:
+        metrics.inc("router_misses")
+        _update_hit_rate()
+        return None
+
+    name, args = matched
+    tool = tool_registry.get_tool(name)
+    if "context" in inspect.signature(tool).parameters:
+        args["context"] = None
+
+    try:
+        result = await metrics.track_tool(name, tool(**args))
+    except Exception as e:
+        logging.error(f"Fast-path {name} failed, falling back to the LLM: {e}")
+        metrics.inc("router_errors")
+        return None
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    metrics.inc("router_hits")
+    metrics.observe("router_latency_ms", elapsed_ms)
+    _update_hit_rate()
+
+    # Compare against a typical realtime-model turn to estimate the time saved
+    llm_turn = metrics.get_histogram("llm_turn_ms")
+    if llm_turn and llm_turn.count:
+        metrics.inc("router_saved_ms", max(llm_turn.quantile(0.5) - elapsed_ms, 0.0))
+
+    logging.info(f"Fast path handled '{text}' with {name}({args}) in {elapsed_ms:.1f} ms")
+    return result if isinstance(result, str) else str(result)
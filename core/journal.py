@@ -0,0 +1,164 @@
+"""
+Write-behind conversation journal.
+
+Every user/assistant turn is appended to a local JSONL file as it happens. A
+background flusher sends batched, deduplicated chunks to Mem0 once enough turns
+are pending or the flush interval elapses, and records how far it got in a
+checkpoint file. Anything left unflushed by a crash or a restart_system exit is
+replayed on the next startup.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from core.paths import atomic_write_json, data_path
+
+JOURNAL_BATCH_SIZE = int(os.getenv("JARVIS_JOURNAL_BATCH_SIZE", "10"))
+JOURNAL_FLUSH_INTERVAL = float(os.getenv("JARVIS_JOURNAL_FLUSH_INTERVAL", "60"))
+
+_active_journal: Optional["ConversationJournal"] = None
+
+
+def get_active_journal() -> Optional["ConversationJournal"]:
+    """The journal of the running session, if any (used by restart_system)."""
+    return _active_journal
+
+
+def _entry_key(entry: dict) -> str:
+    """Identity of one journaled turn: a repeated "yes" or "thanks" is a new turn with its own ts."""
+    return hashlib.sha1(f"{entry['role']}\0{entry.get('ts')}\0{entry['content']}".encode()).hexdigest()
+
+
+class ConversationJournal:
+    def __init__(self, mem0, user_id: str, path: Optional[str] = None):
+        self.mem0 = mem0
+        self.user_id = user_id
+        self.path = path or data_path("journal.jsonl")
+        self.checkpoint_path = self.path + ".offset"
+
+        self._pending: list[tuple[int, dict]] = []  # (end offset in file, entry)
+        self._sent_keys: set[str] = set()
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._file = None
+
+    # -----------------------------------------------------------------------------------------
+    # Checkpoint
+    # -----------------------------------------------------------------------------------------
+    def _read_checkpoint(self) -> int:
+        try:
+            with open(self.checkpoint_path, "r") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_checkpoint(self, offset: int):
+        atomic_write_json(self.checkpoint_path, offset)  # a bare int, as _read_checkpoint expects
+
+    def _load_unflushed(self):
+        """Queue every journal entry written after the last checkpoint."""
+        if not os.path.exists(self.path):
+            return
+        offset = self._read_checkpoint()
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a crash
+                self._pending.append((offset, entry))
+        if self._pending:
+            logging.info(f"Replaying {len(self._pending)} unflushed journal entries from a previous run")
+
+    # -----------------------------------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------------------------------
+    async def start(self):
+        global _active_journal
+        self._load_unflushed()
+        self._file = open(self.path, "ab")
+        _active_journal = self
+        self._task = asyncio.create_task(self._run())
+        if self._pending:
+            self._wakeup.set()
+
+    async def close(self):
+        global _active_journal
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+        if self._file:
+            self._file.close()
+            self._file = None
+        # Everything made it to Mem0: start the next session with an empty journal
+        if not self._pending:
+            open(self.path, "wb").close()
+            self._write_checkpoint(0)
+        if _active_journal is self:
+            _active_journal = None
+
+    # -----------------------------------------------------------------------------------------
+    # Writing
+    # -----------------------------------------------------------------------------------------
+    def append(self, role: str, content: str):
+        """Append one turn to the journal. Cheap enough to call from event handlers."""
+        content = (content or "").strip().strip("\u200b").strip()
+        if role not in ("user", "assistant") or not content or self._file is None:
+            return
+
+        entry = {"role": role, "content": content, "ts": time.time()}
+        self._file.write((json.dumps(entry) + "\n").encode())
+        self._file.flush()
+        self._pending.append((self._file.tell(), entry))
+
+        if len(self._pending) >= JOURNAL_BATCH_SIZE:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=JOURNAL_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Send pending entries to Mem0 and advance the checkpoint on success."""
+        async with self._lock:
+            if not self._pending:
+                return
+
+            batch = list(self._pending)
+            messages = []
+            batch_keys = set()
+            for _, entry in batch:
+                key = _entry_key(entry)
+                if key in self._sent_keys or key in batch_keys:
+                    continue
+                batch_keys.add(key)
+                messages.append({"role": entry["role"], "content": entry["content"]})
+
+            if messages:
+                try:
+                    await self.mem0.add(messages, user_id=self.user_id)
+                except Exception as e:
+                    logging.error(f"Failed to flush journal to Mem0, will retry: {e}")
+                    return
+
+            self._sent_keys |= batch_keys
+            del self._pending[:len(batch)]
+            self._write_checkpoint(batch[-1][0])
+            logging.info(f"Flushed {len(messages)} journal entries to Mem0 ({len(batch) - len(messages)} duplicates skipped)")
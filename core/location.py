@@ -0,0 +1,151 @@
+"""
+Cached current location (city and coordinates).
+
+get_weather, get_daily_forecast and get_directions used to call ip-api.com
+on every invocation (blocking the event loop) just to learn the city. The location is now
+resolved once, kept for LOCATION_TTL_SECONDS (and on disk in
+~/.jarvis/location.json across restarts), and refreshed in the background when
+it goes stale -- callers get the cached value immediately. Concurrent callers
+on a cold cache share one lookup.
+
+Set JARVIS_LOCATION="City" or "City,lat,lon" to pin the location (e.g. when a
+VPN makes IP geolocation wrong).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from core import http_client, metrics
+from core.paths import atomic_write_json, data_path
+
+LOCATION_OVERRIDE = os.getenv("JARVIS_LOCATION")
+LOCATION_TTL_SECONDS = float(os.getenv("JARVIS_LOCATION_TTL", "1800"))
+LOCATION_RETRY_SECONDS = 60  # after a failed lookup, keep serving the old value this long
+LOCATION_URL = "http://ip-api.com/json/"
+LOCATION_TIMEOUT = 5
+
+
+@dataclass
+class Location:
+    city: str
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    region: Optional[str] = None
+    country: Optional[str] = None
+
+    @property
+    def coordinates(self) -> Optional[tuple[float, float]]:
+        if self.lat is None or self.lon is None:
+            return None
+        return self.lat, self.lon
+
+
+def parse_override(value: str) -> Optional[Location]:
+    parts = [p.strip() for p in value.split(",")]
+    if not parts[0]:
+        return None
+    if len(parts) == 3:
+        try:
+            return Location(parts[0], float(parts[1]), float(parts[2]))
+        except ValueError:
+            pass
+    return Location(value.strip())
+
+
+async def _lookup() -> Location:
+    data = await http_client.get_json(LOCATION_URL, timeout=LOCATION_TIMEOUT)
+    if data.get("status") != "success":
+        raise RuntimeError(data.get("message", "lookup failed"))
+    return Location(data["city"], data.get("lat"), data.get("lon"), data.get("regionName"), data.get("country"))
+
+
+class LocationService:
+    def __init__(self, path: Optional[str] = None, ttl: float = LOCATION_TTL_SECONDS):
+        self.path = path or data_path("location.json")
+        self.ttl = ttl
+        self.location: Optional[Location] = None
+        self.resolved_at: Optional[float] = None
+        self._failed_at: Optional[float] = None
+        self._loaded_disk = False
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _load_disk(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.location = Location(**data["location"])
+            self.resolved_at = data["resolved_at"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            pass
+
+    def _save_disk(self):
+        atomic_write_json(self.path, {"resolved_at": self.resolved_at, "location": asdict(self.location)})
+
+    def _stale(self) -> bool:
+        if self.resolved_at is None:
+            return True
+        if self._failed_at is not None and time.time() - self._failed_at < LOCATION_RETRY_SECONDS:
+            return False
+        return time.time() - self.resolved_at > self.ttl
+
+    async def refresh(self) -> Optional[Location]:
+        """Look the location up now; on failure the previous value is kept."""
+        async with self._lock:
+            try:
+                location = await _lookup()
+            except Exception as e:
+                self._failed_at = time.time()
+                metrics.inc("location_errors")
+                logging.error(f"Error getting location: {e}")
+                return self.location
+            self.location, self.resolved_at, self._failed_at = location, time.time(), None
+            await asyncio.to_thread(self._save_disk)
+            logging.info(f"Location resolved: {location.city}")
+            return location
+
+    async def get(self) -> Optional[Location]:
+        """The current location; cached, stale values are returned while a background refresh runs."""
+        if LOCATION_OVERRIDE:
+            return parse_override(LOCATION_OVERRIDE)
+        if not self._loaded_disk:
+            self._loaded_disk = True
+            await asyncio.to_thread(self._load_disk)
+
+        if self.location is None:
+            metrics.inc("location_misses")
+            if self._failed_at is not None and time.time() - self._failed_at < LOCATION_RETRY_SECONDS:
+                return None
+            if self._lock.locked():  # someone else is already looking it up
+                async with self._lock:
+                    pass
+                return self.location
+            return await self.refresh()
+
+        metrics.inc("location_hits")
+        if self._stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self.refresh())
+        return self.location
+
+
+_service: Optional[LocationService] = None
+
+
+def get_service() -> LocationService:
+    global _service
+    if _service is None:
+        _service = LocationService()
+    return _service
+
+
+async def get_location() -> Optional[Location]:
+    return await get_service().get()
+
+
+async def get_current_city() -> Optional[str]:
+    location = await get_location()
+    return location.city if location else None
@@ -0,0 +1,172 @@
+"""
+Memory selection for the chat context.
+
+Instead of dumping every Mem0 memory into the first assistant message, rank the
+memories by recency and relevance and inject only what fits in a token budget.
+Everything else stays in a local pool the model can search with `recall_memory`.
+"""
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+from livekit.agents import function_tool
+
+MEMORY_TOKEN_BUDGET = int(os.getenv("JARVIS_MEMORY_TOKEN_BUDGET", "800"))
+MEMORY_TOP_K = int(os.getenv("JARVIS_MEMORY_TOP_K", "25"))
+MEMORY_HALF_LIFE_DAYS = float(os.getenv("JARVIS_MEMORY_HALF_LIFE_DAYS", "30"))
+
+# Weight of relevance vs recency when a query is available
+RELEVANCE_WEIGHT = 0.7
+
+_STOPWORDS = {
+    "the", "and", "for", "are", "was", "with", "that", "this", "his", "her",
+    "has", "have", "had", "him", "you", "your", "from", "about", "what", "when",
+    "who", "does", "did", "not", "but", "they", "them", "its", "sir", "jarvis",
+}
+
+# All memories loaded this session, and the ones already in the chat context
+_memory_pool: list[dict] = []
+_injected: set[str] = set()
+
+
+# ---------------------------------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------------------------------
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def _terms(text: str) -> set[str]:
+    words = re.findall(r"[a-z0-9']+", (text or "").lower())
+    return {w for w in words if len(w) > 2 and w not in _STOPWORDS}
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        ts = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def recency_score(memory: dict, now: datetime) -> float:
+    """1.0 for a memory updated just now, halving every MEMORY_HALF_LIFE_DAYS."""
+    ts = _parse_timestamp(memory.get("updated_at"))
+    if ts is None:
+        return 0.0
+    age_days = max((now - ts).total_seconds() / 86400, 0.0)
+    return 0.5 ** (age_days / MEMORY_HALF_LIFE_DAYS)
+
+
+def relevance_score(memory: dict, query_terms: set[str]) -> float:
+    """Fraction of the query terms that appear in the memory."""
+    if not query_terms:
+        return 0.0
+    return len(query_terms & _terms(memory.get("memory", ""))) / len(query_terms)
+
+
+def rank_memories(memories: list[dict], query: Optional[str] = None, now: Optional[datetime] = None) -> list[dict]:
+    """Sort memories best-first by recency, blended with relevance when a query is given."""
+    now = now or datetime.now(timezone.utc)
+    query_terms = _terms(query) if query else set()
+
+    def score(memory):
+        recency = recency_score(memory, now)
+        if not query_terms:
+            return recency
+        return RELEVANCE_WEIGHT * relevance_score(memory, query_terms) + (1 - RELEVANCE_WEIGHT) * recency
+
+    return sorted(memories, key=score, reverse=True)
+
+
+def select_memories(
+    memories: list[dict],
+    budget_tokens: int = MEMORY_TOKEN_BUDGET,
+    top_k: int = MEMORY_TOP_K,
+    query: Optional[str] = None,
+) -> list[dict]:
+    """Greedily take the best-ranked memories until top_k or the token budget is reached."""
+    selected = []
+    used = 0
+    for memory in rank_memories(memories, query=query):
+        cost = estimate_tokens(json.dumps(memory))
+        if used + cost > budget_tokens:
+            continue
+        selected.append(memory)
+        used += cost
+        if len(selected) >= top_k:
+            break
+    return selected
+
+
+# ---------------------------------------------------------------------------------------------
+# Chat context injection
+# ---------------------------------------------------------------------------------------------
+def _normalize(results: list[dict]) -> list[dict]:
+    return [
+        {"memory": r["memory"], "updated_at": r.get("updated_at")}
+        for r in results
+        if r.get("memory")
+    ]
+
+
+def select_for_context(results: list[dict]) -> tuple[str, dict]:
+    """
+    Pick the memories to inject at session start.
+
+    Returns the JSON string to put in the chat context and a stats dict with the
+    token counts of the full dump vs. the injected selection.
+    """
+    memories = _normalize(results)
+    selected = select_memories(memories)
+
+    _memory_pool[:] = memories
+    _injected.clear()
+    _injected.update(m["memory"] for m in selected)
+
+    memory_str = json.dumps(selected)
+    full_tokens = estimate_tokens(json.dumps(memories))
+    injected_tokens = estimate_tokens(memory_str)
+    stats = {
+        "total": len(memories),
+        "selected": len(selected),
+        "full_tokens": full_tokens,
+        "injected_tokens": injected_tokens,
+        "saved_tokens": full_tokens - injected_tokens,
+    }
+    logging.info(
+        f"Injected {stats['selected']}/{stats['total']} memories: "
+        f"{injected_tokens} tokens instead of {full_tokens} (saved {stats['saved_tokens']})"
+    )
+    return memory_str, stats
+
+
+@function_tool()
+async def recall_memory(query: str, max_results: int = 5) -> str:
+    """
+    Search the long-term memory about the user for anything related to the query.
+    Use this when the user refers to something from a past conversation that is not
+    already in your context.
+
+    Args:
+        query: What to look for (e.g. "job interview", "sister's birthday")
+        max_results: Maximum number of memories to return
+    """
+    candidates = [m for m in _memory_pool if m["memory"] not in _injected]
+    query_terms = _terms(query)
+    matches = [
+        m for m in rank_memories(candidates, query=query)
+        if relevance_score(m, query_terms) > 0
+    ][:max_results]
+
+    if not matches:
+        return "No related memories found, sir."
+
+    _injected.update(m["memory"] for m in matches)
+    return json.dumps(matches)
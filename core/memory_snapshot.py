@@ -0,0 +1,69 @@
+"""
+Local snapshot of the Mem0 memories (stale-while-revalidate).
+
+The session starts from the snapshot on disk instead of waiting on
+mem0.get_all(); a background refresh fetches the fresh memories, rewrites the
+snapshot and reports whether anything changed so the live chat context can be
+updated.
+"""
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from core import metrics
+from core.paths import atomic_write_json, data_path
+
+
+class MemorySnapshot:
+    def __init__(self, user_id: str, path: Optional[str] = None):
+        self.user_id = user_id
+        self.path = path or data_path(f"memory_snapshot_{user_id}.json")
+        self.memories: Optional[list] = None
+        self.fetched_at: Optional[float] = None
+
+    def load(self) -> Optional[list]:
+        """Return the snapshotted memories, or None on a miss."""
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.memories = data["memories"]
+            self.fetched_at = data["fetched_at"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            metrics.inc("memory_snapshot_miss")
+            return None
+
+        age = time.time() - self.fetched_at
+        metrics.inc("memory_snapshot_hit")
+        metrics.set_gauge("memory_snapshot_age_seconds", age)
+        logging.info(f"Loaded {len(self.memories)} memories from snapshot ({age:.0f}s old)")
+        return self.memories
+
+    def save(self, memories: list):
+        self.memories = memories
+        self.fetched_at = time.time()
+        atomic_write_json(self.path, {"fetched_at": self.fetched_at, "memories": memories})
+        metrics.set_gauge("memory_snapshot_age_seconds", 0)
+
+    async def fetch(self, mem0) -> list:
+        """Fetch the memories from Mem0 and update the snapshot."""
+        start = time.perf_counter()
+        results = await mem0.get_all(user_id=self.user_id) or []
+        metrics.set_gauge("memory_fetch_ms", (time.perf_counter() - start) * 1000)
+        self.save(results)
+        return results
+
+    async def revalidate(self, mem0, on_change: Callable[[list], Awaitable[None]]):
+        """Refresh from Mem0 in the background and call on_change if the memories differ."""
+        previous = self.memories
+        try:
+            results = await self.fetch(mem0)
+        except Exception as e:
+            metrics.inc("memory_snapshot_refresh_error")
+            logging.error(f"Failed to refresh memory snapshot: {e}")
+            return
+
+        if results != previous:
+            metrics.inc("memory_snapshot_stale")
+            logging.info("Memory snapshot was stale, merging fresh memories into the chat context")
+            await on_change(results)
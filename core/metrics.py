@@ -0,0 +1,260 @@
+"""
+In-process metrics: counters, gauges and latency histograms.
+
+Every function_tool call goes through track_tool() (see core.tool_registry),
+which records latency, error rate and output size per tool. Code running inside
+a tool can wrap its subprocess/HTTP work in span() to break the latency down.
+
+A background task also measures event-loop lag: anything blocking the loop
+(e.g. a synchronous subprocess.run in an async tool) shows up as
+event_loop_lag_ms and event_loop_stall_ms.
+
+Export: the metrics are written to ~/.jarvis/metrics.json every
+JARVIS_METRICS_INTERVAL seconds, and served in Prometheus text format on
+http://127.0.0.1:$JARVIS_METRICS_PORT/metrics when that variable is set.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Optional
+
+from core.paths import atomic_write_json, data_path
+
+METRICS_PORT = os.getenv("JARVIS_METRICS_PORT")
+METRICS_INTERVAL = float(os.getenv("JARVIS_METRICS_INTERVAL", "30"))
+LOOP_MONITOR_INTERVAL = 0.05  # seconds between event-loop lag probes
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("JARVIS_LOOP_STALL_MS", "20"))
+
+# Samples kept per histogram for the percentiles
+HISTOGRAM_WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+_counters: dict[tuple, float] = defaultdict(float)
+_gauges: dict[tuple, float] = {}
+_histograms: dict[tuple, "Histogram"] = {}
+
+_current_tool: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_tool", default=None)
+_exporters_started = False
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted(labels.items())))
+
+
+class Histogram:
+    def __init__(self):
+        self.samples: deque[float] = deque(maxlen=HISTOGRAM_WINDOW)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def summary(self) -> dict:
+        out = {f"p{int(q * 100)}": self.quantile(q) for q in QUANTILES}
+        out.update(count=self.count, sum=self.total)
+        return out
+
+
+# ---------------------------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------------------------
+def inc(name: str, value: float = 1.0, **labels):
+    _counters[_key(name, labels)] += value
+
+
+def set_gauge(name: str, value: float, **labels):
+    _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels):
+    key = _key(name, labels)
+    hist = _histograms.get(key)
+    if hist is None:
+        hist = _histograms[key] = Histogram()
+    hist.observe(value)
+
+
+def get_counter(name: str, **labels) -> float:
+    return _counters.get(_key(name, labels), 0.0)
+
+
+def get_gauge(name: str, **labels) -> float | None:
+    return _gauges.get(_key(name, labels))
+
+
+def get_histogram(name: str, **labels) -> Optional[Histogram]:
+    return _histograms.get(_key(name, labels))
+
+
+# ---------------------------------------------------------------------------------------------
+# Tool instrumentation
+# ---------------------------------------------------------------------------------------------
+def _output_size(result) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, str):
+        return len(result)
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return len(str(result))
+
+
+def _looks_like_error(result) -> bool:
+    """Tools report most failures in their return value rather than by raising."""
+    if isinstance(result, dict):
+        return result.get("success") is False or "error" in result
+    if isinstance(result, str):
+        return result.lstrip().startswith(("❌", "Error", "Failed", "An error occurred", "Exception occurred"))
+    return False
+
+
+async def track_tool(name: str, call):
+    """Await a tool call, recording its latency, errors and output size."""
+    token = _current_tool.set(name)
+    start = time.perf_counter()
+    failed = True
+    try:
+        result = await call
+        failed = _looks_like_error(result)
+        observe("tool_output_chars", _output_size(result), tool=name)
+        return result
+    finally:
+        _current_tool.reset(token)
+        observe("tool_latency_ms", (time.perf_counter() - start) * 1000, tool=name)
+        inc("tool_calls_total", tool=name)
+        if failed:
+            inc("tool_errors_total", tool=name)
+
+
+@contextmanager
+def span(kind: str):
+    """Time a sub-step (e.g. 'subprocess', 'http') of the current tool call."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("tool_span_ms", (time.perf_counter() - start) * 1000, tool=_current_tool.get() or "none", kind=kind)
+
+
+# ---------------------------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------------------------
+def _labels_dict(labels: tuple) -> dict:
+    return dict(labels)
+
+
+def snapshot() -> dict:
+    """Current values of every metric, JSON-serializable."""
+    return {
+        "counters": [{"name": n, "labels": _labels_dict(l), "value": v} for (n, l), v in _counters.items()],
+        "gauges": [{"name": n, "labels": _labels_dict(l), "value": v} for (n, l), v in _gauges.items()],
+        "histograms": [{"name": n, "labels": _labels_dict(l), **h.summary()} for (n, l), h in _histograms.items()],
+        "tools": tool_report(),
+    }
+
+
+def tool_report() -> dict:
+    """Per-tool p50/p95/p99 latency, error rate and average output size."""
+    report = {}
+    for (name, labels), hist in _histograms.items():
+        if name != "tool_latency_ms":
+            continue
+        tool = dict(labels)["tool"]
+        calls = get_counter("tool_calls_total", tool=tool)
+        output = get_histogram("tool_output_chars", tool=tool)
+        report[tool] = {
+            **hist.summary(),
+            "error_rate": get_counter("tool_errors_total", tool=tool) / calls if calls else 0.0,
+            "avg_output_chars": output.total / output.count if output and output.count else 0.0,
+        }
+    return report
+
+
+def _prom_labels(labels: tuple, extra: Optional[dict] = None) -> str:
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def prometheus_text() -> str:
+    lines = []
+    for (name, labels), value in sorted(_counters.items()):
+        lines.append(f"jarvis_{name}{_prom_labels(labels)} {value}")
+    for (name, labels), value in sorted(_gauges.items()):
+        lines.append(f"jarvis_{name}{_prom_labels(labels)} {value}")
+    for (name, labels), hist in sorted(_histograms.items()):
+        for q in QUANTILES:
+            lines.append(f"jarvis_{name}{_prom_labels(labels, {'quantile': q})} {hist.quantile(q)}")
+        lines.append(f"jarvis_{name}_count{_prom_labels(labels)} {hist.count}")
+        lines.append(f"jarvis_{name}_sum{_prom_labels(labels)} {hist.total}")
+    return "\n".join(lines) + "\n"
+
+
+async def _handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        if request_line.split(b" ")[1:2] == [b"/metrics"]:
+            body, status = prometheus_text().encode(), "200 OK"
+        else:
+            body, status = b"not found\n", "404 Not Found"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def _write_json_periodically(path: str):
+    while True:
+        await asyncio.sleep(METRICS_INTERVAL)
+        try:
+            atomic_write_json(path, snapshot(), indent=2)
+        except Exception as e:
+            logging.error(f"Failed to write metrics file: {e}")
+
+
+async def watch_event_loop(interval: float = LOOP_MONITOR_INTERVAL):
+    """Sleep in a loop and record how late each wakeup is; lateness = time the loop was blocked."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag_ms = max(loop.time() - expected, 0.0) * 1000
+        observe("event_loop_lag_ms", lag_ms)
+        if lag_ms > LOOP_STALL_THRESHOLD_MS:
+            inc("event_loop_stalls")
+            inc("event_loop_stall_ms", lag_ms)
+
+
+async def start_exporters():
+    """Start the JSON writer and (if configured) the Prometheus endpoint, once per process."""
+    global _exporters_started
+    if _exporters_started:
+        return
+    _exporters_started = True
+
+    asyncio.create_task(_write_json_periodically(data_path("metrics.json")))
+    asyncio.create_task(watch_event_loop())
+    if METRICS_PORT:
+        await asyncio.start_server(_handle_http, "127.0.0.1", int(METRICS_PORT))
+        logging.info(f"Serving Prometheus metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
@@ -0,0 +1,370 @@
+"""
+Local index of the Apple Music library.
+
+play_music used to hand names straight to Music.app (`play track "..."`,
+`whose artist is "..."`): a linear scan of the library per request that fails
+on any near-miss from speech recognition. The index keeps tracks (name,
+artist, album) and playlists keyed by persistent ID, resolves spoken names
+with exact / phonetic / substring / fuzzy matching, and play_music then issues
+one `whose persistent ID is` command.
+
+Sources, in order:
+- JARVIS_MUSIC_LIBRARY: an exported library .xml (File > Library > Export
+  Library...) or a JSON file {"tracks": [...], "playlists": [...]}; re-read
+  only when the file changes.
+- Music.app itself: one bulk AppleScript dump, then incremental refreshes of
+  the tracks modified since the last sync.
+The index is persisted to ~/.jarvis/music_library.json between runs and is
+built in the background (warmed at session start); until it is ready, or after
+a failed dump, play_music falls back to Music.app's own name search.
+"""
+import asyncio
+import json
+import logging
+import os
+import plistlib
+import random
+import time
+from dataclasses import asdict, dataclass
+from typing import Generic, Optional, TypeVar
+
+from core import metrics, phonetics
+from core.applescript import run_applescript
+from core.paths import atomic_write_json, data_path
+
+MUSIC_LIBRARY_FILE = os.getenv("JARVIS_MUSIC_LIBRARY")
+MUSIC_REFRESH_SECONDS = float(os.getenv("JARVIS_MUSIC_REFRESH", "900"))
+MUSIC_FUZZY_THRESHOLD = 0.75
+# Soundex is coarse ("hello" and "hell" share a key): phonetic hits must also look alike
+MUSIC_PHONETIC_MIN_SIMILARITY = 0.6
+DUMP_TIMEOUT = 180
+DUMP_MAX_OUTPUT = 64 * 1024 * 1024  # a full dump of a large library runs well past process.PROCESS_MAX_OUTPUT
+MUSIC_RETRY_SECONDS = 60  # first retry after a failed dump; doubles per failure up to MUSIC_REFRESH_SECONDS
+
+_FS, _RS, _US = "\x1c", "\x1e", "\x1f"
+
+T = TypeVar("T")
+
+
+@dataclass
+class Track:
+    id: str  # persistent ID
+    name: str
+    artist: str = ""
+    album: str = ""
+
+
+@dataclass
+class Playlist:
+    id: str
+    name: str
+
+
+class NameIndex(Generic[T]):
+    """Spoken-name lookup: exact, phonetic key, substring, then fuzzy similarity."""
+
+    def __init__(self):
+        self._exact: dict[str, list[T]] = {}
+        self._sound: dict[str, list[str]] = {}  # phonetic key -> normalized names
+
+    def add(self, name: str, value: T):
+        normalized = phonetics.normalize(name)
+        if not normalized:
+            return
+        if normalized not in self._exact:
+            self._sound.setdefault(phonetics.phonetic_key(normalized), []).append(normalized)
+        self._exact.setdefault(normalized, []).append(value)
+
+    def match(self, query: str) -> tuple[list[T], str]:
+        query = phonetics.normalize(query)
+        if not query:
+            return [], "none"
+        if query in self._exact:
+            return self._exact[query], "exact"
+        scored = [(phonetics.similarity(query, name), name) for name in self._sound.get(phonetics.phonetic_key(query), [])]
+        scored = [(score, name) for score, name in scored if score >= MUSIC_PHONETIC_MIN_SIMILARITY]
+        if scored:
+            return self._exact[max(scored)[1]], "phonetic"
+        contains = [v for name, values in self._exact.items() if query in name for v in values]
+        if contains:
+            return contains, "contains"
+
+        best, best_score = [], MUSIC_FUZZY_THRESHOLD
+        for name, values in self._exact.items():
+            score = phonetics.similarity(query, name)
+            if score > best_score:
+                best, best_score = values, score
+        return (best, "fuzzy") if best else ([], "none")
+
+
+# ---------------------------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------------------------
+def parse_library_xml(data: bytes) -> tuple[list[Track], list[Playlist]]:
+    library = plistlib.loads(data)
+    tracks = [
+        Track(t["Persistent ID"], t.get("Name", ""), t.get("Artist", ""), t.get("Album", ""))
+        for t in library.get("Tracks", {}).values()
+        if "Persistent ID" in t and t.get("Name")
+    ]
+    playlists = [
+        Playlist(p["Playlist Persistent ID"], p["Name"])
+        for p in library.get("Playlists", [])
+        # Skip the whole-library "playlist" and the built-in smart ones (Music, Movies...)
+        if "Playlist Persistent ID" in p and p.get("Name")
+        and not p.get("Master") and "Distinguished Kind" not in p
+    ]
+    return tracks, playlists
+
+
+def load_library_file(path: str) -> tuple[list[Track], list[Playlist]]:
+    with open(os.path.expanduser(path), "rb") as f:
+        data = f.read()
+    if path.lower().endswith(".xml"):
+        return parse_library_xml(data)
+    library = json.loads(data)
+    tracks = [
+        Track(str(t.get("id", f"json-{i}")), t["name"], t.get("artist", ""), t.get("album", ""))
+        for i, t in enumerate(library.get("tracks", []))
+    ]
+    playlists = [
+        Playlist(str(p.get("id", f"json-playlist-{i}")), p["name"])
+        for i, p in enumerate(library.get("playlists", []))
+    ]
+    return tracks, playlists
+
+
+def _dump_script(modified_within: Optional[float]) -> str:
+    """Bulk-fetch tracks (all, or modified in the last N seconds), every track id, and user playlists."""
+    selector = "every track of library playlist 1"
+    if modified_within is not None:
+        selector = f"(every track of library playlist 1 whose modification date > ((current date) - {int(modified_within)}))"
+    return f'''
+    set FS to character id 28
+    set RS to character id 30
+    set US to character id 31
+    tell application "Music"
+        set allIds to persistent ID of every track of library playlist 1
+        set theIds to persistent ID of {selector}
+        set theNames to name of {selector}
+        set theArtists to artist of {selector}
+        set theAlbums to album of {selector}
+        set playlistIds to persistent ID of every user playlist
+        set playlistNames to name of every user playlist
+    end tell
+    -- Records are collected in lists (appended through references) and joined once:
+    -- growing one string per track is quadratic on large libraries
+    set trackLines to {{}}
+    set trackLinesRef to a reference to trackLines
+    set idsRef to a reference to theIds
+    set namesRef to a reference to theNames
+    set artistsRef to a reference to theArtists
+    set albumsRef to a reference to theAlbums
+    repeat with i from 1 to count of theIds
+        copy ((item i of idsRef) & US & (item i of namesRef) & US & (item i of artistsRef) & US & (item i of albumsRef)) to end of trackLinesRef
+    end repeat
+    set playlistLines to {{}}
+    repeat with i from 1 to count of playlistIds
+        copy ((item i of playlistIds) & US & (item i of playlistNames)) to end of playlistLines
+    end repeat
+    set AppleScript's text item delimiters to US
+    set idsText to allIds as text
+    set AppleScript's text item delimiters to RS
+    set out to idsText & FS & (trackLines as text) & FS & (playlistLines as text)
+    set AppleScript's text item delimiters to ""
+    return out
+    '''
+
+
+def parse_dump(output: str) -> tuple[set[str], list[Track], list[Playlist]]:
+    all_ids, _, rest = output.partition(_FS)
+    track_records, _, playlist_records = rest.partition(_FS)
+    tracks = []
+    for record in track_records.split(_RS):
+        fields = record.split(_US)
+        if len(fields) == 4 and fields[1].strip():
+            tracks.append(Track(*(f.strip() for f in fields)))
+    playlists = []
+    for record in playlist_records.split(_RS):
+        playlist_id, _, name = record.partition(_US)
+        if name.strip():
+            playlists.append(Playlist(playlist_id.strip(), name.strip()))
+    return {i for i in all_ids.split(_US) if i}, tracks, playlists
+
+
+# ---------------------------------------------------------------------------------------------
+# Library
+# ---------------------------------------------------------------------------------------------
+class MusicLibrary:
+    def __init__(self, path: Optional[str] = None, library_file: Optional[str] = MUSIC_LIBRARY_FILE):
+        self.path = path or data_path("music_library.json")
+        self.library_file = library_file
+        self.tracks: dict[str, Track] = {}
+        self.playlists: dict[str, Playlist] = {}
+        self.synced_at: Optional[float] = None
+        self._file_mtime: Optional[float] = None
+        self._songs: NameIndex[str] = NameIndex()
+        self._artists: NameIndex[str] = NameIndex()
+        self._albums: NameIndex[str] = NameIndex()
+        self._playlist_names: NameIndex[str] = NameIndex()
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._disk_checked = False
+        self._failures = 0
+        self._failed_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.synced_at is not None
+
+    def _rebuild(self):
+        songs, artists, albums, playlists = NameIndex(), NameIndex(), NameIndex(), NameIndex()
+        for track in self.tracks.values():
+            songs.add(track.name, track.id)
+            artists.add(track.artist, track.id)
+            albums.add(track.album, track.id)
+        for playlist in self.playlists.values():
+            playlists.add(playlist.name, playlist.id)
+        self._songs, self._artists, self._albums, self._playlist_names = songs, artists, albums, playlists
+        metrics.set_gauge("music_library_tracks", len(self.tracks))
+
+    def replace(self, tracks: list[Track], playlists: list[Playlist]):
+        self.tracks = {t.id: t for t in tracks}
+        self.playlists = {p.id: p for p in playlists}
+        self._rebuild()
+
+    # -- lookup -------------------------------------------------------------------------------
+    def _track_ids(self, index: NameIndex[str], query: str, kind: str) -> list[str]:
+        start = time.perf_counter()
+        ids, how = index.match(query)
+        metrics.observe("music_lookup_ms", (time.perf_counter() - start) * 1000)
+        metrics.inc("music_lookups", kind=kind, match=how)
+        return ids
+
+    def find_track(self, song: str, artist: Optional[str] = None, album: Optional[str] = None) -> Optional[Track]:
+        """Best track for a spoken song name, narrowed by artist/album when given."""
+        candidates = self._track_ids(self._songs, song, "song")
+        for index, value, kind in ((self._artists, artist, "artist"), (self._albums, album, "album")):
+            if value and candidates:
+                allowed = set(self._track_ids(index, value, kind))
+                candidates = [c for c in candidates if c in allowed] or candidates
+        return self.tracks[candidates[0]] if candidates else None
+
+    def find_artist_track(self, artist: str) -> Optional[Track]:
+        """A random track by the artist (what the old `some track ... whose artist is` did)."""
+        ids = self._track_ids(self._artists, artist, "artist")
+        return self.tracks[random.choice(ids)] if ids else None
+
+    def find_playlist(self, name: str) -> Optional[Playlist]:
+        start = time.perf_counter()
+        ids, how = self._playlist_names.match(name)
+        metrics.observe("music_lookup_ms", (time.perf_counter() - start) * 1000)
+        metrics.inc("music_lookups", kind="playlist", match=how)
+        return self.playlists[ids[0]] if ids else None
+
+    # -- persistence and refresh --------------------------------------------------------------
+    def _load_disk(self) -> bool:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            tracks = [Track(**t) for t in data["tracks"]]
+            playlists = [Playlist(**p) for p in data["playlists"]]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            return False
+        self.replace(tracks, playlists)
+        self.synced_at = data.get("synced_at")
+        return True
+
+    def _save_disk(self):
+        atomic_write_json(self.path, {
+            "synced_at": self.synced_at,
+            "tracks": [asdict(t) for t in self.tracks.values()],
+            "playlists": [asdict(p) for p in self.playlists.values()],
+        })
+
+    async def _refresh_from_file(self):
+        mtime = os.path.getmtime(os.path.expanduser(self.library_file))
+        if mtime != self._file_mtime:
+            self.replace(*await asyncio.to_thread(load_library_file, self.library_file))
+            self._file_mtime = mtime
+            logging.info(f"Music library loaded from {self.library_file}: {len(self.tracks)} tracks")
+        self.synced_at = time.time()
+        self._failures, self._failed_at = 0, None
+
+    def _refresh_failed(self, error: str):
+        self._failures += 1
+        self._failed_at = time.time()
+        metrics.inc("music_library_refresh_errors")
+        logging.error(f"Music library refresh failed (attempt {self._failures}): {error}")
+
+    def _backing_off(self) -> bool:
+        if self._failed_at is None:
+            return False
+        delay = min(MUSIC_RETRY_SECONDS * 2 ** (self._failures - 1), MUSIC_REFRESH_SECONDS)
+        return time.time() - self._failed_at < delay
+
+    async def refresh(self):
+        """Pull changes: re-read a changed export file, or fetch tracks modified since the last sync."""
+        async with self._lock:
+            if self.library_file:
+                try:
+                    await self._refresh_from_file()
+                except Exception as e:
+                    self._refresh_failed(str(e))
+                return
+
+            started = time.time()
+            window = started - self.synced_at + 60 if self.synced_at and self.tracks else None
+            try:
+                result = await run_applescript(_dump_script(window), timeout=DUMP_TIMEOUT, max_output=DUMP_MAX_OUTPUT)
+            except Exception as e:
+                self._refresh_failed(str(e))
+                return
+            if not result.ok:
+                self._refresh_failed(result.stderr)
+                return
+            if result.truncated:
+                # The cut-off tail would drop tracks and every playlist from the index
+                self._refresh_failed(f"dump truncated at {DUMP_MAX_OUTPUT} bytes")
+                return
+
+            all_ids, changed, playlists = parse_dump(result.stdout)
+            if window is None:
+                tracks = {t.id: t for t in changed}
+            else:
+                tracks = {i: t for i, t in self.tracks.items() if i in all_ids}
+                tracks.update({t.id: t for t in changed})
+            self.tracks = tracks
+            self.playlists = {p.id: p for p in playlists}
+            self._rebuild()
+            self.synced_at = started
+            self._failures, self._failed_at = 0, None
+            await asyncio.to_thread(self._save_disk)
+            metrics.observe("music_library_refresh_ms", (time.time() - started) * 1000)
+            logging.info(f"Music library refreshed: {len(changed)} updated, {len(self.tracks)} tracks")
+
+    async def ensure_loaded(self) -> bool:
+        """
+        True once the index can answer lookups. Never waits on Music.app: a cold
+        or stale index is (re)built in the background -- not again right after a
+        failed dump -- and callers fall back to Music.app's name search meanwhile.
+        """
+        if not self._disk_checked:
+            self._disk_checked = True
+            if not self.library_file:
+                await asyncio.to_thread(self._load_disk)
+
+        stale = self.synced_at is None or time.time() - self.synced_at > MUSIC_REFRESH_SECONDS
+        if stale and not self._backing_off() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self.refresh())
+        return self.ready
+
+
+_library: Optional[MusicLibrary] = None
+
+
+def get_library() -> MusicLibrary:
+    global _library
+    if _library is None:
+        _library = MusicLibrary()
+    return _library
@@ -0,0 +1,243 @@
+"""
+Durable outbox for emails and text messages.
+
+send_email / send_text_message used to hold the voice turn until delivery
+finished. They now enqueue() the message into a SQLite table and return at
+once; a background worker delivers it with retries and exponential backoff and
+announces the outcome through the notify callback (a spoken confirmation).
+
+Rows live in ~/.jarvis/outbox.db, so messages queued before a crash or a
+restart_system exit are delivered by the next process. Delivery is
+at-least-once: a message that was mid-send when the process died is retried.
+
+Messages enqueued together (one message to several people) share a batch id;
+the worker announces a batch once, with a per-recipient summary, when its last
+message has been delivered or has failed.
+
+Delivery handlers are registered per kind by the module that owns them
+(commands.communication registers "email" and "text"); the worker imports that
+module on demand when it resumes messages left by a previous run.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Awaitable, Callable, Optional
+
+from core import metrics, tool_registry
+from core.paths import data_path
+
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("JARVIS_OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("JARVIS_OUTBOX_BACKOFF_BASE", "5"))
+OUTBOX_BACKOFF_MAX = 300
+OUTBOX_CONCURRENCY = int(os.getenv("JARVIS_OUTBOX_CONCURRENCY", "3"))
+
+# Where the handler for each message kind is defined
+HANDLER_MODULES = {"email": "commands.communication", "text": "commands.communication"}
+
+Handler = Callable[[dict], Awaitable[None]]
+Notify = Callable[[str], Awaitable[None]]
+
+_handlers: dict[str, Handler] = {}
+_outbox: Optional["Outbox"] = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT,
+    batch TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class PermanentError(Exception):
+    """Raised by a handler when retrying can't help (bad address, auth failure...)."""
+
+
+def register_handler(kind: str, handler: Handler):
+    _handlers[kind] = handler
+
+
+def backoff_delay(attempts: int) -> float:
+    return min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX)
+
+
+class Outbox:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or data_path("outbox.db")
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(_SCHEMA)
+        columns = {row["name"] for row in self.db.execute("PRAGMA table_info(messages)")}
+        if "batch" not in columns:  # outbox created before batches existed
+            self.db.execute("ALTER TABLE messages ADD COLUMN batch TEXT")
+        self.db.commit()
+        self.notify: Optional[Notify] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._slots = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+
+    # -----------------------------------------------------------------------------------------
+    # Queue
+    # -----------------------------------------------------------------------------------------
+    def enqueue(self, kind: str, recipient: str, payload: dict, batch: Optional[str] = None) -> int:
+        now = time.time()
+        cursor = self.db.execute(
+            "INSERT INTO messages (kind, recipient, payload, batch, next_attempt, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, recipient, json.dumps(payload), batch, now, now, now),
+        )
+        self.db.commit()
+        metrics.inc("outbox_enqueued", kind=kind)
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def get(self, message_id: int) -> Optional[sqlite3.Row]:
+        return self.db.execute("SELECT * FROM messages WHERE id = ?", (message_id,)).fetchone()
+
+    def recent(self, limit: int = 5) -> list[sqlite3.Row]:
+        return self.db.execute("SELECT * FROM messages ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+    def _update(self, message_id: int, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        self.db.execute(f"UPDATE messages SET {assignments} WHERE id = ?", (*fields.values(), message_id))
+        self.db.commit()
+
+    def _due(self) -> list[sqlite3.Row]:
+        return self.db.execute(
+            "SELECT * FROM messages WHERE status = 'queued' AND next_attempt <= ? ORDER BY id",
+            (time.time(),),
+        ).fetchall()
+
+    def _next_due_in(self) -> Optional[float]:
+        row = self.db.execute("SELECT MIN(next_attempt) FROM messages WHERE status = 'queued'").fetchone()
+        return None if row[0] is None else max(row[0] - time.time(), 0.0)
+
+    # -----------------------------------------------------------------------------------------
+    # Worker
+    # -----------------------------------------------------------------------------------------
+    def start(self, notify: Optional[Notify] = None):
+        """Start delivering; messages interrupted mid-send by the last process are re-queued."""
+        self.notify = notify
+        resumed = self.db.execute("UPDATE messages SET status = 'queued' WHERE status = 'sending'").rowcount
+        self.db.commit()
+        pending = self.db.execute("SELECT COUNT(*) FROM messages WHERE status = 'queued'").fetchone()[0]
+        if pending:
+            logging.info(f"Outbox resuming {pending} pending message(s) ({resumed} interrupted)")
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        running: set[asyncio.Task] = set()
+        while True:
+            self._wakeup.clear()
+            for row in self._due():
+                self._update(row["id"], status="sending")
+                task = asyncio.create_task(self._deliver(row))
+                running.add(task)
+                task.add_done_callback(running.discard)
+
+            metrics.set_gauge("outbox_pending", self.db.execute(
+                "SELECT COUNT(*) FROM messages WHERE status IN ('queued', 'sending')"
+            ).fetchone()[0])
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_due_in())
+            except asyncio.TimeoutError:
+                pass
+
+    def _handler(self, kind: str) -> Handler:
+        if kind not in _handlers and kind in HANDLER_MODULES:
+            tool_registry.load_module(HANDLER_MODULES[kind])
+        return _handlers[kind]
+
+    async def _deliver(self, row: sqlite3.Row):
+        message_id, kind, recipient = row["id"], row["kind"], row["recipient"]
+        attempts = row["attempts"] + 1
+        start = time.perf_counter()
+        try:
+            async with self._slots:
+                await self._handler(kind)(json.loads(row["payload"]))
+        except Exception as e:
+            permanent = isinstance(e, PermanentError) or attempts >= OUTBOX_MAX_ATTEMPTS
+            if permanent:
+                self._update(message_id, status="failed", attempts=attempts, last_error=str(e))
+                metrics.inc("outbox_failed", kind=kind)
+                logging.error(f"Outbox: giving up on {kind} #{message_id} to {recipient}: {e}")
+                if row["batch"]:
+                    await self._announce_batch(row["batch"], kind)
+                else:
+                    await self._announce(f"Sir, I couldn't deliver the {_label(kind)} to {recipient}: {e}")
+            else:
+                delay = backoff_delay(attempts)
+                self._update(
+                    message_id, status="queued", attempts=attempts,
+                    last_error=str(e), next_attempt=time.time() + delay,
+                )
+                metrics.inc("outbox_retries", kind=kind)
+                logging.warning(f"Outbox: {kind} #{message_id} attempt {attempts} failed ({e}); retrying in {delay:.0f}s")
+            self._wakeup.set()
+            return
+
+        self._update(message_id, status="sent", attempts=attempts, last_error=None)
+        metrics.inc("outbox_sent", kind=kind)
+        metrics.observe("outbox_delivery_ms", (time.perf_counter() - start) * 1000, kind=kind)
+        if row["batch"]:
+            await self._announce_batch(row["batch"], kind)
+        else:
+            await self._announce(f"Your {_label(kind)} to {recipient} was delivered, sir.")
+
+    async def _announce_batch(self, batch: str, kind: str):
+        rows = self.db.execute("SELECT recipient, status FROM messages WHERE batch = ?", (batch,)).fetchall()
+        if any(r["status"] in ("queued", "sending") for r in rows):
+            return
+        failed = [r["recipient"] for r in rows if r["status"] == "failed"]
+        sent = len(rows) - len(failed)
+        text = f"Your {_label(kind)} was delivered to {sent} of {len(rows)} recipients"
+        await self._announce(text + (f"; I couldn't reach {', '.join(failed)}, sir." if failed else ", sir."))
+
+    async def _announce(self, text: str):
+        if self.notify is None:
+            return
+        try:
+            await self.notify(text)
+        except Exception as e:
+            logging.error(f"Outbox notification failed: {e}")
+
+
+def _label(kind: str) -> str:
+    return {"email": "email", "text": "message"}.get(kind, kind)
+
+
+def get_outbox() -> Outbox:
+    global _outbox
+    if _outbox is None:
+        _outbox = Outbox()
+    return _outbox
+
+
+def describe(row: sqlite3.Row) -> str:
+    """One spoken-friendly line about a message's state."""
+    what = f"{_label(row['kind']).capitalize()} #{row['id']} to {row['recipient']}"
+    status = row["status"]
+    if status == "sent":
+        return f"{what}: delivered."
+    if status == "failed":
+        return f"{what}: failed after {row['attempts']} attempt(s) ({row['last_error']})."
+    if status == "sending":
+        return f"{what}: being sent now."
+    if row["attempts"]:
+        retry_in = max(row["next_attempt"] - time.time(), 0)
+        return f"{what}: queued, retrying in {retry_in:.0f} seconds (last error: {row['last_error']})."
+    return f"{what}: queued."
@@ -0,0 +1,19 @@
+import json
+import os
+
+# Local state (journal, snapshots, caches) lives here
+DATA_DIR = os.path.expanduser(os.getenv("JARVIS_DATA_DIR", "~/.jarvis"))
+
+
+def data_path(*parts: str) -> str:
+    """Return a path inside DATA_DIR, creating the directory if needed."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, *parts)
+
+
+def atomic_write_json(path: str, data, **kwargs):
+    """Write data as JSON through a temp file and os.replace, so a crash never leaves a torn file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, **kwargs)
+    os.replace(tmp_path, path)
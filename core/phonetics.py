@@ -0,0 +1,47 @@
+"""
+Cheap fuzzy and phonetic string matching for speech-recognized names.
+"""
+import re
+from difflib import SequenceMatcher
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    text = re.sub(r"[^a-z0-9 ]+", " ", (text or "").lower().replace("'", "").replace("’", ""))
+    return " ".join(text.split())
+
+
+def soundex(word: str) -> str:
+    """American Soundex code of a single word ('' for words without letters)."""
+    letters = [c for c in word.lower() if c.isalpha()]
+    if not letters:
+        return ""
+
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = _SOUNDEX_CODES.get(c, "")
+        if digit and digit != previous:
+            code += digit
+        if c not in "hw":
+            previous = digit
+    return (code + "000")[:4]
+
+
+def phonetic_key(text: str) -> str:
+    """Soundex of every word, e.g. 'Katherine Smith' -> 'K365 S530'."""
+    return " ".join(soundex(w) for w in normalize(text).split())
+
+
+def similarity(a: str, b: str) -> float:
+    """Edit-based similarity between 0 and 1 of the normalized strings."""
+    return SequenceMatcher(None, normalize(a), normalize(b)).ratio()
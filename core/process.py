@@ -0,0 +1,139 @@
+"""
+Async subprocess execution for tools.
+
+Tools used to call the blocking subprocess.run() from `async def`, which froze
+the event loop (and the audio pipeline) until the child exited. run() is the
+async replacement:
+
+- timeout: the child (and anything it spawned) is killed, timed_out is set
+- output cap: at most max_output bytes of stdout/stderr are kept, the rest is
+  drained and dropped so a chatty child can't balloon memory
+- cancellation: if the awaiting task is cancelled (user interrupted the turn)
+  the child is killed before CancelledError propagates
+- concurrency: at most JARVIS_PROCESS_CONCURRENCY children run at once
+"""
+import asyncio
+import os
+import signal
+import subprocess
+from dataclasses import dataclass
+from typing import Optional
+
+from core import metrics
+
+PROCESS_TIMEOUT = float(os.getenv("JARVIS_PROCESS_TIMEOUT", "60"))
+PROCESS_MAX_OUTPUT = int(os.getenv("JARVIS_PROCESS_MAX_OUTPUT", str(1024 * 1024)))
+PROCESS_CONCURRENCY = int(os.getenv("JARVIS_PROCESS_CONCURRENCY", "4"))
+
+_slots: Optional[asyncio.Semaphore] = None
+
+
+@dataclass
+class ProcessResult:
+    args: tuple
+    returncode: int
+    stdout: str = ""
+    stderr: str = ""
+    timed_out: bool = False
+    truncated: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+def _semaphore() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(PROCESS_CONCURRENCY)
+    return _slots
+
+
+async def _read_capped(stream: asyncio.StreamReader, limit: int) -> tuple[bytes, bool]:
+    chunks, size, truncated = [], 0, False
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            break
+        if size < limit:
+            chunks.append(chunk[:limit - size])
+            truncated = truncated or size + len(chunk) > limit
+        else:
+            truncated = True
+        size += len(chunk)
+    return b"".join(chunks), truncated
+
+
+async def _communicate(proc: asyncio.subprocess.Process, max_output: int):
+    (stdout, out_cut), (stderr, err_cut), _ = await asyncio.gather(
+        _read_capped(proc.stdout, max_output),
+        _read_capped(proc.stderr, max_output),
+        proc.wait(),
+    )
+    return (stdout, out_cut), (stderr, err_cut)
+
+
+def _kill(proc: asyncio.subprocess.Process):
+    """Kill the child's whole process group (it runs in its own session)."""
+    if proc.returncode is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        proc.kill()
+
+
+async def run(
+    *args: str,
+    timeout: float = PROCESS_TIMEOUT,
+    max_output: int = PROCESS_MAX_OUTPUT,
+    cwd: Optional[str] = None,
+    input: Optional[bytes] = None,
+    check: bool = False,
+) -> ProcessResult:
+    """
+    Run a command without blocking the event loop.
+
+    With check=True a non-zero exit raises subprocess.CalledProcessError, like
+    subprocess.run(check=True); otherwise inspect the returned result.
+    """
+    async with _semaphore():
+        with metrics.span("subprocess"):
+            proc = await asyncio.create_subprocess_exec(
+                *args,
+                cwd=cwd,
+                stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+            timed_out = False
+            try:
+                if input is not None:
+                    proc.stdin.write(input)
+                    await proc.stdin.drain()
+                    proc.stdin.close()
+                (stdout, out_cut), (stderr, err_cut) = await asyncio.wait_for(_communicate(proc, max_output), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                _kill(proc)
+                await proc.wait()
+                stdout, stderr, out_cut, err_cut = b"", f"timed out after {timeout:g}s".encode(), False, False
+                metrics.inc("process_timeouts")
+            except asyncio.CancelledError:
+                _kill(proc)
+                # Reap it even though we're cancelled, or it stays behind as a zombie
+                await asyncio.shield(proc.wait())
+                raise
+
+    result = ProcessResult(
+        args=args,
+        returncode=proc.returncode,
+        stdout=stdout.decode(errors="replace").strip(),
+        stderr=stderr.decode(errors="replace").strip(),
+        timed_out=timed_out,
+        truncated=out_cut or err_cut,
+    )
+    if check and not result.ok:
+        raise subprocess.CalledProcessError(result.returncode, list(args), result.stdout, result.stderr)
+    return result
@@ -0,0 +1,115 @@
+"""
+Cached Google Directions / Distance Matrix lookups.
+
+get_directions and get_eta_to_event hit Google on every call, and check_events
+asks for the same upcoming event's ETA every 5 minutes. Responses are cached
+under (kind, origin, destination, mode, time bucket): the bucket is the
+ROUTE_BUCKET_SECONDS slot of the departure time, so a new bucket always means a
+fresh traffic estimate. Within a bucket the TTL follows the traffic:
+
+- driving in heavy traffic (duration_in_traffic well over the free-flow time)
+  or at rush hour: ROUTE_TTL_CONGESTED
+- other driving / transit: ROUTE_TTL_DEFAULT
+- walking and cycling don't depend on traffic: ROUTE_TTL_STATIC
+
+Concurrent lookups of the same route share one request (see core.cache), and
+the hit rate is exported as cache_hit_rate{cache="routes"}.
+"""
+import os
+import time
+from datetime import datetime
+
+from core import http_client
+from core.cache import TTLCache
+from core.phonetics import normalize
+
+DIRECTIONS_URL = "https://maps.googleapis.com/maps/api/directions/json"
+DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+
+ROUTE_BUCKET_SECONDS = int(os.getenv("JARVIS_ROUTE_BUCKET_SECONDS", "900"))
+ROUTE_TTL_CONGESTED = 300
+ROUTE_TTL_DEFAULT = 900
+ROUTE_TTL_STATIC = 6 * 3600
+CONGESTION_RATIO = 1.25  # duration_in_traffic / duration above which traffic counts as heavy
+RUSH_HOURS = {7, 8, 9, 16, 17, 18}
+TRAFFIC_MODES = {"driving"}
+MATRIX_MAX_DESTINATIONS = 25  # Distance Matrix limit per request
+
+
+class RouteError(Exception):
+    """Google answered without a usable route; the message is its status."""
+
+
+def _legs(data: dict) -> list[dict]:
+    """Duration-bearing parts of either response shape."""
+    if "routes" in data:
+        return [leg for route in data["routes"][:1] for leg in route["legs"]]
+    return [e for row in data.get("rows", []) for e in row["elements"] if e.get("status") == "OK"]
+
+
+def route_ttl(data: dict) -> float:
+    mode = data.get("_mode", "driving")
+    if mode in ("walking", "bicycling"):
+        return ROUTE_TTL_STATIC
+    if mode not in TRAFFIC_MODES:
+        return ROUTE_TTL_DEFAULT
+
+    now = datetime.now()
+    if now.weekday() < 5 and now.hour in RUSH_HOURS:
+        return ROUTE_TTL_CONGESTED
+    for leg in _legs(data):
+        in_traffic = leg.get("duration_in_traffic", {}).get("value")
+        free_flow = leg.get("duration", {}).get("value")
+        if in_traffic and free_flow and in_traffic / free_flow >= CONGESTION_RATIO:
+            return ROUTE_TTL_CONGESTED
+    return ROUTE_TTL_DEFAULT
+
+
+route_cache = TTLCache("routes", ttl=ROUTE_TTL_DEFAULT, max_entries=512, ttl_for=route_ttl)
+
+
+def route_key(kind: str, origin: str, destination: str | list[str], mode: str, departure: float) -> tuple:
+    destinations = normalize(destination) if isinstance(destination, str) else tuple(normalize(d) for d in destination)
+    return kind, normalize(origin), destinations, mode, int(departure // ROUTE_BUCKET_SECONDS)
+
+
+async def _fetch(url: str, params: dict, mode: str, departure: float | None = None) -> dict:
+    params = {**params, "mode": mode, "key": os.getenv("GOOGLE_MAPS_API_KEY")}
+    if mode in TRAFFIC_MODES:
+        # Asks Google for duration_in_traffic; it rejects departure times in the past
+        params["departure_time"] = int(departure) if departure and departure > time.time() else "now"
+    data = await http_client.get_json(url, params=params)
+    if data.get("status") != "OK":
+        raise RouteError(data.get("status", "UNKNOWN_ERROR"))
+    data["_mode"] = mode
+    return data
+
+
+async def directions(origin: str, destination: str, mode: str = "driving") -> dict:
+    """Google Directions response (status OK); raises RouteError otherwise."""
+    mode = mode.lower()
+    key = route_key("directions", origin, destination, mode, time.time())
+    data = await route_cache.get(key, lambda: _fetch(DIRECTIONS_URL, {"origin": origin, "destination": destination}, mode))
+    if not data.get("routes"):
+        raise RouteError("ZERO_RESULTS")
+    return data
+
+
+async def distance_matrix(
+    origin: str,
+    destination: str | list[str],
+    mode: str = "driving",
+    units: str = "imperial",
+    departure: float | None = None,
+) -> dict:
+    """
+    Google Distance Matrix response (status OK) from one origin. Several
+    destinations (at most MATRIX_MAX_DESTINATIONS) go out as one request;
+    rows[0]["elements"] follows their order. departure (epoch seconds,
+    default now) is when the trip starts, for the traffic estimate.
+    """
+    mode = mode.lower()
+    key = route_key("matrix", origin, destination, mode, departure or time.time()) + (units,)
+    destinations = destination if isinstance(destination, str) else "|".join(destination)
+    params = {"origins": origin, "destinations": destinations, "units": units}
+    return await route_cache.get(key, lambda: _fetch(DISTANCE_MATRIX_URL, params, mode, departure))
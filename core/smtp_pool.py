@@ -0,0 +1,149 @@
+"""
+Pooled SMTP connections for outgoing email.
+
+send_email used to connect, STARTTLS, log in, send and quit for every message,
+synchronously on the event loop. The pool keeps logged-in connections around
+for SMTP_IDLE_SECONDS, probes connections that sat idle with NOOP before
+reusing them, reconnects once when the server dropped us, and does all the
+blocking smtplib work in a thread.
+
+Point it at a local test server with SMTP_HOST=127.0.0.1 SMTP_PORT=8025
+SMTP_STARTTLS=0 SMTP_LOGIN=0 (e.g. `python -m aiosmtpd -n -l 127.0.0.1:8025`).
+"""
+import asyncio
+import logging
+import os
+import smtplib
+import time
+from typing import Optional
+
+from core import metrics
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_LOGIN = os.getenv("SMTP_LOGIN", "1") == "1"
+SMTP_POOL_SIZE = int(os.getenv("JARVIS_SMTP_POOL_SIZE", "2"))
+# Gmail drops connections idle for a few minutes; don't keep them longer than that
+SMTP_IDLE_SECONDS = float(os.getenv("JARVIS_SMTP_IDLE_SECONDS", "240"))
+SMTP_PROBE_AFTER_SECONDS = 15  # NOOP-check connections idle longer than this before reuse
+SMTP_TIMEOUT = 30
+
+
+class SMTPPool:
+    def __init__(
+        self,
+        user: Optional[str],
+        password: Optional[str],
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        starttls: bool = SMTP_STARTTLS,
+        login: bool = SMTP_LOGIN,
+        size: int = SMTP_POOL_SIZE,
+        idle_seconds: float = SMTP_IDLE_SECONDS,
+    ):
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.login = login
+        self.idle_seconds = idle_seconds
+        self._idle: list[tuple[smtplib.SMTP, float]] = []  # (connection, last used)
+        self._slots = asyncio.Semaphore(size)
+
+    # -- blocking helpers (run in a thread) ---------------------------------------------------
+    def _connect(self) -> smtplib.SMTP:
+        start = time.perf_counter()
+        server = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.login:
+                server.login(self.user, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        metrics.inc("smtp_connects")
+        metrics.observe("smtp_handshake_ms", (time.perf_counter() - start) * 1000)
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @staticmethod
+    def _probe(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _send(self, server: Optional[smtplib.SMTP], idle_for: float, from_addr: str, recipients: list[str], message: str) -> smtplib.SMTP:
+        if server is not None and idle_for > SMTP_PROBE_AFTER_SECONDS and not self._probe(server):
+            metrics.inc("smtp_stale")
+            self._close(server)
+            server = None
+        if server is None:
+            server = self._connect()
+        else:
+            metrics.inc("smtp_reuses")
+
+        try:
+            try:
+                server.sendmail(from_addr, recipients, message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # Dropped between the probe and the send: one fresh connection, one retry
+                self._close(server)
+                server = self._connect()
+                server.sendmail(from_addr, recipients, message)
+        except Exception:
+            self._close(server)
+            raise
+        return server
+
+    # -- async API ----------------------------------------------------------------------------
+    def _take(self) -> tuple[Optional[smtplib.SMTP], float]:
+        now = time.monotonic()
+        while self._idle:
+            server, last_used = self._idle.pop()
+            if now - last_used < self.idle_seconds:
+                return server, now - last_used
+            server.close()  # expired: the server has most likely hung up already
+        return None, 0.0
+
+    async def sendmail(self, from_addr: str, recipients: list[str], message: str):
+        """Send one message; raises smtplib exceptions like SMTP.sendmail()."""
+        async with self._slots:
+            server, idle_for = self._take()
+            start = time.perf_counter()
+            # On failure _send closes the connection it was using; only healthy ones come back
+            server = await asyncio.to_thread(self._send, server, idle_for, from_addr, recipients, message)
+            metrics.observe("smtp_send_ms", (time.perf_counter() - start) * 1000)
+            self._idle.append((server, time.monotonic()))
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for server, _ in idle:
+            await asyncio.to_thread(self._close, server)
+
+
+_pool: Optional[SMTPPool] = None
+
+
+def get_smtp_pool() -> SMTPPool:
+    global _pool
+    if _pool is None:
+        _pool = SMTPPool(os.getenv("GMAIL_USER"), os.getenv("GMAIL_APP_PASSWORD"))
+    return _pool
+
+
+async def close_pool():
+    if _pool is not None:
+        try:
+            await _pool.close()
+        except Exception as e:
+            logging.error(f"Closing SMTP connections failed: {e}")
@@ -0,0 +1,74 @@
+"""
+Startup orchestration for a job.
+
+Runs independent startup steps concurrently and records how long each phase
+took relative to the job start, so the per-job breakdown shows where the
+join-to-first-audio time goes.
+
+When started by supervisor.py, JARVIS_READY_FILE names a file to create on the
+'ready' mark; the supervisor waits for it to measure restart latency up to a
+working agent rather than up to a started process.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable
+
+from core import metrics
+
+READY_FILE = os.getenv("JARVIS_READY_FILE")
+
+
+class StartupTimer:
+    def __init__(self, job_id: str = ""):
+        self.job_id = job_id
+        self.started = time.perf_counter()
+        self.phases: dict[str, tuple[float, float]] = {}  # name -> (start ms, end ms)
+        self.marks: dict[str, float] = {}
+
+    def _elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    async def run(self, name: str, aw: Awaitable):
+        """Await one phase and record when it started and finished."""
+        start = self._elapsed_ms()
+        try:
+            return await aw
+        finally:
+            end = self._elapsed_ms()
+            self.phases[name] = (start, end)
+            metrics.set_gauge(f"startup_{name}_ms", end - start)
+
+    async def gather(self, **phases: Awaitable) -> dict:
+        """Run several phases concurrently and return their results by name."""
+        results = await asyncio.gather(*(self.run(name, aw) for name, aw in phases.items()))
+        return dict(zip(phases, results))
+
+    def mark(self, name: str):
+        """Record a point in time (e.g. 'ready', 'first_audio') once."""
+        if name in self.marks:
+            return
+        self.marks[name] = self._elapsed_ms()
+        metrics.set_gauge(f"startup_{name}_ms", self.marks[name])
+        if name == "ready":
+            _signal_ready()
+        self.log_report()
+
+    def log_report(self):
+        lines = [f"Startup breakdown for job {self.job_id or '-'}:"]
+        for name, (start, end) in sorted(self.phases.items(), key=lambda p: p[1][0]):
+            lines.append(f"  {name:<16} {start:8.1f} -> {end:8.1f} ms  ({end - start:.1f} ms)")
+        for name, at in sorted(self.marks.items(), key=lambda m: m[1]):
+            lines.append(f"  {name:<16} at {at:.1f} ms")
+        logging.info("\n".join(lines))
+
+
+def _signal_ready():
+    if not READY_FILE:
+        return
+    try:
+        with open(READY_FILE, "w") as f:
+            f.write(str(time.time()))
+    except OSError as e:
+        logging.warning(f"Could not write ready file {READY_FILE}: {e}")
@@ -0,0 +1,237 @@
+"""
+Lazy tool registry.
+
+agent.py used to import every command module up front, which pulled in
+newspaper, dateparser, git, openai, watchdog, kasa and apscheduler before the
+worker could take a job. The registry reads the tool signatures straight from
+the source files (via ast), publishes lightweight function_tool stubs with the
+same schema, and only imports the real module the first time one of its tools
+is called. Every call goes through core.metrics.track_tool().
+
+Run `python -m core.tool_registry` to print the per-module import-time report.
+"""
+import ast
+import importlib
+import inspect
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import Optional
+
+from livekit.agents import function_tool, RunContext
+
+from core import metrics
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module -> tools it exposes to the model, in the order they are registered.
+TOOL_MODULES = {
+    "commands.media": ["can_you_open_the_app", "search_web", "play_music", "close_app"],
+    "commands.utilities": [
+        "get_time", "get_date", "get_weather", "get_directions",
+        "turn_on_lamp", "turn_off_lamp",
+    ],
+    "commands.communication": ["send_email", "call_contact", "send_text_message", "message_status"],
+    "commands.system": ["power_down", "mute_microphone", "unmute_microphone", "restart_system"],
+    "commands.calendar": [
+        "create_calendar_event", "set_reminder", "delete_calendar_event", "delete_reminder",
+    ],
+    "coding.mangeprojects": [
+        "initialize_git_repo", "git_stage_file", "git_unstage_file", "git_commit",
+        "git_push", "git_undo_last_commit", "git_status", "manage_python_project",
+        "create_or_open_python", "generate_python_code",
+    ],
+    "coding.javaprojects": [
+        "manage_spring_boot_project", "create_or_open_spring_file", "generate_spring_java_code",
+    ],
+    "core.memory": ["recall_memory"],
+}
+
+# Names the annotations in the tool modules may refer to.
+_ANNOTATION_NAMESPACE = {
+    "RunContext": RunContext,
+    "Optional": Optional,
+}
+
+_tool_to_module = {
+    tool: module for module, tools in TOOL_MODULES.items() for tool in tools
+}
+_import_times: dict[str, float] = {}
+_stubs: dict = {}
+
+
+# ---------------------------------------------------------------------------------------------
+# Module loading
+# ---------------------------------------------------------------------------------------------
+def load_module(module: str):
+    """Import a tool module, recording how long the first import took."""
+    if module in sys.modules:
+        return sys.modules[module]
+
+    start = time.perf_counter()
+    mod = importlib.import_module(module)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    _import_times[module] = elapsed_ms
+    logging.info(f"Lazy-loaded {module} in {elapsed_ms:.1f} ms")
+    return mod
+
+
+def module_for(tool: str) -> str:
+    """Name of the module a tool lives in."""
+    module = _tool_to_module.get(tool)
+    if module is None:
+        raise KeyError(f"Unknown tool '{tool}'")
+    return module
+
+
+def get_tool(name: str):
+    """Return the real (imported) function_tool for a tool name."""
+    return getattr(load_module(module_for(name)), name)
+
+
+def preload():
+    """Import every tool module now (used by the warm-standby worker)."""
+    for module in TOOL_MODULES:
+        load_module(module)
+
+
+# ---------------------------------------------------------------------------------------------
+# Stub generation
+# ---------------------------------------------------------------------------------------------
+def _module_source_path(module: str) -> str:
+    return os.path.join(ROOT_DIR, *module.split(".")) + ".py"
+
+
+def _parse_tool_defs(module: str) -> dict:
+    """Return {function name: ast node} for the async functions defined in a module."""
+    with open(_module_source_path(module), "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return {
+        node.name: node
+        for node in tree.body
+        if isinstance(node, ast.AsyncFunctionDef)
+    }
+
+
+def _eval_annotation(node):
+    if node is None:
+        return inspect.Parameter.empty
+    try:
+        return eval(compile(ast.Expression(node), "<annotation>", "eval"), dict(_ANNOTATION_NAMESPACE))
+    except Exception:
+        return inspect.Parameter.empty
+
+
+def _build_signature(fn_def: ast.AsyncFunctionDef) -> inspect.Signature:
+    args = fn_def.args
+    params = []
+
+    positional = args.posonlyargs + args.args
+    defaults = [inspect.Parameter.empty] * (len(positional) - len(args.defaults)) + [
+        ast.literal_eval(d) for d in args.defaults
+    ]
+    for arg, default in zip(positional, defaults):
+        params.append(inspect.Parameter(
+            arg.arg,
+            inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            default=default,
+            annotation=_eval_annotation(arg.annotation),
+        ))
+
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        params.append(inspect.Parameter(
+            arg.arg,
+            inspect.Parameter.KEYWORD_ONLY,
+            default=inspect.Parameter.empty if default is None else ast.literal_eval(default),
+            annotation=_eval_annotation(arg.annotation),
+        ))
+
+    return inspect.Signature(params, return_annotation=_eval_annotation(fn_def.returns))
+
+
+def _make_stub(module: str, fn_def: ast.AsyncFunctionDef):
+    name = fn_def.name
+    signature = _build_signature(fn_def)
+
+    async def stub(*args, **kwargs):
+        tool = get_tool(name)
+        return await metrics.track_tool(name, tool(*args, **kwargs))
+
+    stub.__name__ = name
+    stub.__qualname__ = name
+    stub.__module__ = module
+    stub.__doc__ = ast.get_docstring(fn_def)
+    stub.__signature__ = signature
+    stub.__annotations__ = {
+        p.name: p.annotation
+        for p in signature.parameters.values()
+        if p.annotation is not inspect.Parameter.empty
+    }
+    if signature.return_annotation is not inspect.Signature.empty:
+        stub.__annotations__["return"] = signature.return_annotation
+
+    return function_tool()(stub)
+
+
+def get_tools() -> list:
+    """Return the function_tool stubs for every registered tool, building them once."""
+    if not _stubs:
+        for module, names in TOOL_MODULES.items():
+            defs = _parse_tool_defs(module)
+            for name in names:
+                if name not in defs:
+                    raise KeyError(f"Tool '{name}' not found in {module}")
+                _stubs[name] = _make_stub(module, defs[name])
+    return list(_stubs.values())
+
+
+# ---------------------------------------------------------------------------------------------
+# Import-time report
+# ---------------------------------------------------------------------------------------------
+def import_report() -> dict[str, float]:
+    """Import times (ms) of the tool modules that have been lazily loaded so far."""
+    return dict(_import_times)
+
+
+def _measure_cold_import(module: str) -> float:
+    """Import a module in a fresh interpreter and return the import time in ms."""
+    code = (
+        "import sys, time; sys.path.insert(0, sys.argv[1]); "
+        "import livekit.agents; "
+        "t = time.perf_counter(); import importlib; importlib.import_module(sys.argv[2]); "
+        "print((time.perf_counter() - t) * 1000)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code, ROOT_DIR, module],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def print_startup_report():
+    start = time.perf_counter()
+    get_tools()
+    stub_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{'module':<28}{'cold import (ms)':>18}")
+    total = 0.0
+    for module in TOOL_MODULES:
+        try:
+            ms = _measure_cold_import(module)
+        except subprocess.CalledProcessError as e:
+            print(f"{module:<28}{'failed':>18}  {e.stderr.strip().splitlines()[-1]}")
+            continue
+        total += ms
+        print(f"{module:<28}{ms:>18.1f}")
+
+    print(f"\nEager import of all tool modules: {total:.1f} ms (upper bound, shared deps counted per module)")
+    print(f"Lazy registry ({len(_stubs)} stubs):   {stub_ms:.1f} ms")
+    print(f"Saved at startup:                 {total - stub_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    print_startup_report()
@@ -0,0 +1,312 @@
+"""
+Shared TTS and synthesized-phrase cache.
+
+One Cartesia TTS instance is shared by everything in the worker. say() plays
+repeated phrases (fast-path answers, fixed announcements) from the phrase
+cache, which keeps the synthesized PCM in an LRU and on disk keyed by (voice,
+model, text) so they play without a TTS round trip. The assistant's own replies
+go through phrase_tts_node() (its tts_node), so they reach the same cache. Most text is only ever
+spoken once, so a phrase is cached the second time it is said (or the first,
+with cache=True); either way a miss streams from the TTS as usual and the
+frames are teed into the cache. Set JARVIS_FAKE_TTS=1 to use the silent
+FakeTTS instead of Cartesia.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import AsyncIterable, Callable, Optional
+
+from livekit import rtc
+from livekit.agents import tts, utils, APIConnectOptions, DEFAULT_API_CONNECT_OPTIONS
+
+from core import metrics
+from core.paths import data_path
+
+TTS_MODEL = "sonic-2"
+TTS_VOICE = "5891f60a-e5e5-4f99-836e-c2387feb4342"
+
+PHRASE_CACHE_SIZE = int(os.getenv("JARVIS_TTS_CACHE_SIZE", "128"))
+PHRASE_CACHE_DISK_ENTRIES = int(os.getenv("JARVIS_TTS_CACHE_DISK_ENTRIES", "1000"))
+# Longer text is rarely repeated verbatim, so it isn't worth caching
+PHRASE_CACHE_MAX_CHARS = 200
+# Phrases said once so far; one said again while still in here gets cached
+PHRASE_SEEN_SIZE = 1024
+
+# Length of the frames replayed from the cache
+_FRAME_MS = 50
+
+_shared_tts: Optional[tts.TTS] = None
+_phrase_cache: Optional["PhraseCache"] = None
+
+
+# ---------------------------------------------------------------------------------------------
+# Fake TTS (offline runs and tests)
+# ---------------------------------------------------------------------------------------------
+class FakeTTS(tts.TTS):
+    """Produces silence (~60 ms per word) and records what it was asked to say."""
+
+    def __init__(self, sample_rate: int = 24000):
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=sample_rate,
+            num_channels=1,
+        )
+        self.calls: list[str] = []
+
+    def synthesize(self, text: str, *, conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS) -> "FakeChunkedStream":
+        self.calls.append(text)
+        return FakeChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+
+class FakeChunkedStream(tts.ChunkedStream):
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        output_emitter.initialize(
+            request_id=utils.shortuuid(),
+            sample_rate=self._tts.sample_rate,
+            num_channels=1,
+            mime_type="audio/pcm",
+        )
+        samples = int(self._tts.sample_rate * 0.06) * max(1, len(self.input_text.split()))
+        output_emitter.push(b"\x00\x00" * samples)
+        output_emitter.flush()
+
+
+# ---------------------------------------------------------------------------------------------
+# Shared instance
+# ---------------------------------------------------------------------------------------------
+def get_shared_tts() -> tts.TTS:
+    """The worker-wide TTS instance."""
+    global _shared_tts
+    if _shared_tts is None:
+        if os.getenv("JARVIS_FAKE_TTS") == "1":
+            _shared_tts = FakeTTS()
+        else:
+            from livekit.plugins import cartesia
+            _shared_tts = cartesia.TTS(model=TTS_MODEL, voice=TTS_VOICE)
+    return _shared_tts
+
+
+# ---------------------------------------------------------------------------------------------
+# Phrase cache
+# ---------------------------------------------------------------------------------------------
+class PhraseCache:
+    def __init__(self, tts_instance: tts.TTS, voice: str, model: str, cache_dir: Optional[str] = None):
+        self.tts = tts_instance
+        self.voice = voice
+        self.model = model
+        self.cache_dir = cache_dir or data_path("tts_cache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lru: OrderedDict[str, tuple[bytes, int, int]] = OrderedDict()
+        self._seen: OrderedDict[str, None] = OrderedDict()
+        self._writes: set[asyncio.Task] = set()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.voice}|{self.model}|{text}".encode()).hexdigest()
+
+    # Disk ------------------------------------------------------------------------------------
+    def _read_disk(self, key: str) -> Optional[tuple[bytes, int, int]]:
+        base = os.path.join(self.cache_dir, key)
+        try:
+            with open(base + ".json", "r") as f:
+                meta = json.load(f)
+            with open(base + ".pcm", "rb") as f:
+                return f.read(), meta["sample_rate"], meta["num_channels"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+    def _write_disk(self, key: str, text: str, pcm: bytes, sample_rate: int, num_channels: int):
+        base = os.path.join(self.cache_dir, key)
+        with open(base + ".pcm", "wb") as f:
+            f.write(pcm)
+        with open(base + ".json", "w") as f:
+            json.dump({"text": text, "sample_rate": sample_rate, "num_channels": num_channels}, f)
+        self._prune_disk()
+
+    def _prune_disk(self):
+        metas = [os.path.join(self.cache_dir, n) for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+        if len(metas) <= PHRASE_CACHE_DISK_ENTRIES:
+            return
+        metas.sort(key=os.path.getmtime)
+        for meta in metas[:len(metas) - PHRASE_CACHE_DISK_ENTRIES]:
+            for path in (meta, meta[:-5] + ".pcm"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    # Lookup ----------------------------------------------------------------------------------
+    def _remember(self, key: str, entry: tuple[bytes, int, int]):
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > PHRASE_CACHE_SIZE:
+            self._lru.popitem(last=False)
+
+    def seen_before(self, key: str) -> bool:
+        """True the second time a key is asked about (within the last PHRASE_SEEN_SIZE phrases)."""
+        if key in self._seen:
+            del self._seen[key]
+            return True
+        self._seen[key] = None
+        while len(self._seen) > PHRASE_SEEN_SIZE:
+            self._seen.popitem(last=False)
+        return False
+
+    async def lookup(self, key: str) -> Optional[tuple[bytes, int, int]]:
+        """Cached (pcm bytes, sample rate, channels) for a key, or None."""
+        entry = self._lru.get(key)
+        if entry is not None:
+            self._lru.move_to_end(key)
+            metrics.inc("tts_cache_hit_memory")
+            return entry
+
+        entry = await asyncio.to_thread(self._read_disk, key)
+        if entry is not None:
+            metrics.inc("tts_cache_hit_disk")
+            self._remember(key, entry)
+        return entry
+
+    async def stream(self, key: str, text: str) -> AsyncIterable[rtc.AudioFrame]:
+        """Synthesize text, yielding frames as they arrive; the complete audio is cached at the end."""
+        metrics.inc("tts_cache_miss")
+        chunks = []
+        sample_rate, num_channels = self.tts.sample_rate, self.tts.num_channels
+        async with self.tts.synthesize(text) as stream:
+            async for ev in stream:
+                chunks.append(bytes(ev.frame.data.cast("B")))
+                sample_rate, num_channels = ev.frame.sample_rate, ev.frame.num_channels
+                yield ev.frame
+
+        # Only reached when playback consumed everything: interrupted audio isn't cached
+        entry = (b"".join(chunks), sample_rate, num_channels)
+        self._remember(key, entry)
+        task = asyncio.create_task(self._persist(key, text, entry))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _persist(self, key: str, text: str, entry: tuple[bytes, int, int]):
+        try:
+            await asyncio.to_thread(self._write_disk, key, text, *entry)
+        except OSError as e:
+            logging.warning(f"Could not write phrase cache entry for {text!r}: {e}")
+
+    @staticmethod
+    def frames(entry: tuple[bytes, int, int]) -> AsyncIterable[rtc.AudioFrame]:
+        async def gen():
+            pcm, sample_rate, num_channels = entry
+            step = sample_rate * num_channels * 2 * _FRAME_MS // 1000
+            for i in range(0, len(pcm), step):
+                chunk = pcm[i:i + step]
+                yield rtc.AudioFrame(
+                    data=chunk,
+                    sample_rate=sample_rate,
+                    num_channels=num_channels,
+                    samples_per_channel=len(chunk) // (2 * num_channels),
+                )
+        return gen()
+
+
+async def _prepend(first: rtc.AudioFrame, rest: AsyncIterable[rtc.AudioFrame]) -> AsyncIterable[rtc.AudioFrame]:
+    yield first
+    async for frame in rest:
+        yield frame
+
+
+def get_phrase_cache() -> PhraseCache:
+    global _phrase_cache
+    if _phrase_cache is None:
+        shared = get_shared_tts()
+        voice = "fake" if isinstance(shared, FakeTTS) else TTS_VOICE
+        _phrase_cache = PhraseCache(shared, voice=voice, model=TTS_MODEL)
+    return _phrase_cache
+
+
+async def say(session, text: str, *, cache: Optional[bool] = None, **kwargs):
+    """
+    Speak text through the session. Cached phrases play from the phrase cache;
+    a phrase worth caching (cache=True, or said for the second time) streams
+    from the TTS and is stored as it plays. Everything else, long text and
+    cache=False go straight to session.say() (streaming TTS).
+    """
+    if cache is False or len(text) > PHRASE_CACHE_MAX_CHARS:
+        return await session.say(text, **kwargs)
+
+    phrases = get_phrase_cache()
+    key = phrases._key(text)
+    try:
+        entry = await phrases.lookup(key)
+    except Exception as e:
+        logging.error(f"Phrase cache lookup failed, using streaming TTS: {e}")
+        return await session.say(text, **kwargs)
+    if entry is not None:
+        return await session.say(text, audio=phrases.frames(entry), **kwargs)
+
+    if not (cache or phrases.seen_before(key)):
+        return await session.say(text, **kwargs)
+
+    # Wait for the first frame here so a failing synthesis can still fall back to session.say()
+    audio = phrases.stream(key, text)
+    try:
+        first = await anext(audio)
+    except Exception as e:
+        logging.error(f"Phrase cache synthesis failed, using streaming TTS: {e}")
+        return await session.say(text, **kwargs)
+    return await session.say(text, audio=_prepend(first, audio), **kwargs)
+
+
+async def _replay(chunks: list[str], rest: Optional[AsyncIterable[str]] = None) -> AsyncIterable[str]:
+    for chunk in chunks:
+        yield chunk
+    if rest is not None:
+        async for chunk in rest:
+            yield chunk
+
+
+async def phrase_tts_node(
+    text: AsyncIterable[str], default: Callable[[AsyncIterable[str]], AsyncIterable[rtc.AudioFrame]]
+) -> AsyncIterable[rtc.AudioFrame]:
+    """
+    Agent.tts_node for the phrase cache. A reply of at most PHRASE_CACHE_MAX_CHARS
+    is read in full and played from the cache when the whole text matches (and
+    cached on its second occurrence, like say()); longer replies go to default
+    (the stock tts_node) as soon as they pass the limit.
+    """
+    chunks, size = [], 0
+    stream = aiter(text)
+    async for chunk in stream:
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > PHRASE_CACHE_MAX_CHARS:
+            async for frame in default(_replay(chunks, stream)):
+                yield frame
+            return
+
+    phrase = "".join(chunks).strip()
+    if phrase:
+        phrases = get_phrase_cache()
+        key = phrases._key(phrase)
+        try:
+            entry = await phrases.lookup(key)
+        except Exception as e:
+            logging.error(f"Phrase cache lookup failed, using streaming TTS: {e}")
+            entry = None
+        if entry is not None:
+            async for frame in phrases.frames(entry):
+                yield frame
+            return
+
+        if phrases.seen_before(key):
+            audio = phrases.stream(key, phrase)
+            try:
+                first = await anext(audio)
+            except Exception as e:
+                logging.error(f"Phrase cache synthesis failed, using streaming TTS: {e}")
+            else:
+                async for frame in _prepend(first, audio):
+                    yield frame
+                return
+
+    async for frame in default(_replay(chunks)):
+        yield frame
@@ -0,0 +1,81 @@
+"""
+Local wake-word gate.
+
+Only utterances that address Jarvis ("Jarvis", "Hey Jarvis", "Buddy", "J") are
+forwarded to the realtime model; everything else overheard is dropped before it
+costs a model turn. The wake word has to open or close the utterance (a name
+in the middle of a sentence is a mention, not an address). Misrecognitions like
+"Jervis" or "Jarvus" are caught with a fuzzy + Soundex comparison.
+"""
+import os
+
+from core import metrics
+from core.memory import estimate_tokens
+from core.phonetics import normalize, similarity, soundex
+
+WAKE_WORDS = ("jarvis", "buddy")
+# Single-letter wake word and how it tends to be transcribed
+SHORT_WAKE_WORDS = ("j", "jay")
+WAKE_FUZZY_THRESHOLD = float(os.getenv("JARVIS_WAKE_FUZZY_THRESHOLD", "0.75"))
+
+_WAKE_SOUNDEX = {soundex(w) for w in WAKE_WORDS}
+
+
+def _is_wake_word(word: str, allow_short: bool) -> bool:
+    if word in WAKE_WORDS or (allow_short and word in SHORT_WAKE_WORDS):
+        return True
+    if len(word) < 4:
+        return False
+    return soundex(word) in _WAKE_SOUNDEX and max(similarity(word, w) for w in WAKE_WORDS) >= WAKE_FUZZY_THRESHOLD
+
+
+def _request_span(words: list[str]) -> tuple[int, int]:
+    """
+    (start, end) of the words left once an opening wake word ("hey Jarvis, ...")
+    and a closing one ("..., Jarvis") are cut off; (0, len) if there is neither.
+    """
+    start, end = 0, len(words)
+    if not words:
+        return start, end
+
+    offset = 1 if words[0] in ("hey", "ok", "okay", "yo") else 0
+    for i in range(offset, min(offset + 2, len(words)) if offset else 1):
+        if _is_wake_word(words[i], allow_short=True):
+            start = i + 1
+            break
+    if end > start and _is_wake_word(words[-1], allow_short=False):
+        end -= 1
+    return start, end
+
+
+def is_addressed(text: str) -> bool:
+    """True if the utterance opens or closes with a wake word."""
+    words = normalize(text).split()
+    return _request_span(words) != (0, len(words))
+
+
+def strip(text: str) -> str:
+    """The request without its wake word, normalized ("Hey Jervis, what time is it?" -> "what time is it")."""
+    words = normalize(text).split()
+    start, end = _request_span(words)
+    return " ".join(words[start:end])
+
+
+def gate(text: str) -> bool:
+    """
+    Check an utterance and record the outcome; returns True to forward it to the
+    model. A turn without a transcript can't be judged and is forwarded.
+    """
+    if not (text or "").strip():
+        metrics.inc("wake_gate_untranscribed")
+        return True
+    if is_addressed(text):
+        metrics.inc("wake_gate_forwarded")
+        return True
+
+    metrics.inc("wake_gate_suppressed")
+    metrics.inc("wake_gate_suppressed_tokens", estimate_tokens(text or ""))
+    llm_turn = metrics.get_histogram("llm_turn_ms")
+    if llm_turn and llm_turn.count:
+        metrics.inc("wake_gate_saved_ms", llm_turn.quantile(0.5))
+    return False
@@ -1,20 +1,332 @@
+import importlib
+import json
+import os
+import signal
 import subprocess
+import sys
 import time
 
+try:
+    import psutil
+except ImportError:  # watchdog disabled, supervisor still works
+    psutil = None
+
 venv_path = "/Users/daniel/Documents/Projects/JARVIS/venv/bin/activate"
 agent_path = "/Users/daniel/Documents/Projects/JARVIS/agent.py"
 
-try:
-    while True:
-        proc = subprocess.run(
-            f"source {venv_path} && python3 {agent_path} console",
-            shell=True
+venv_python = os.path.join(os.path.dirname(venv_path), "python3")
+agent_dir = os.path.dirname(agent_path)
+
+RESTART_EXIT_CODE = 42  # restart_system() exits with this code
+STOP_EXIT_CODES = (0, 130, -signal.SIGINT)  # normal exit, power_down() or Ctrl+C
+
+# Keep a pre-imported agent process waiting so a restart is a pipe write, not a cold start
+WARM_STANDBY = os.getenv("JARVIS_WARM_STANDBY", "1") == "1"
+
+# Resource watchdog: restart the agent gracefully when it crosses these limits
+SAMPLE_INTERVAL = float(os.getenv("JARVIS_WATCHDOG_INTERVAL", "5"))
+MAX_RSS_MB = float(os.getenv("JARVIS_MAX_RSS_MB", "1500"))
+MAX_CPU_PERCENT = float(os.getenv("JARVIS_MAX_CPU_PERCENT", "90"))
+CPU_SUSTAINED_SAMPLES = int(os.getenv("JARVIS_CPU_SUSTAINED_SAMPLES", "6"))
+MAX_OPEN_FDS = int(os.getenv("JARVIS_MAX_OPEN_FDS", "1000"))
+GRACEFUL_TIMEOUT = 15  # seconds to flush the journal and shut down after SIGINT
+READY_TIMEOUT = 60  # seconds to wait for a new agent to report ready (core.startup)
+READY_POLL_INTERVAL = 0.01
+
+# Crash-loop backoff: crashes sooner than this after start count as a failure
+STABLE_SECONDS = 60
+BACKOFF_BASE = 2
+BACKOFF_MAX = 120
+
+sys.path.insert(0, agent_dir)
+from core.paths import data_path  # noqa: E402
+
+SUPERVISOR_LOG = data_path("supervisor.jsonl")
+SAMPLES_LOG = data_path("supervisor_samples.jsonl")
+SAMPLES_LOG_MAX_BYTES = 5 * 1024 * 1024  # then rotated to supervisor_samples.jsonl.1
+
+
+def log_event(event: str, **fields):
+    with open(SUPERVISOR_LOG, "a") as f:
+        f.write(json.dumps({"ts": time.time(), "event": event, **fields}) + "\n")
+
+
+# ---------------------------------------------------------------------------------------------
+# Standby worker (runs in the child process)
+# ---------------------------------------------------------------------------------------------
+def standby_main(go_fd: int):
+    """
+    Import the agent and every heavy module, then block until the supervisor
+    writes to go_fd. EOF means the supervisor no longer needs us.
+    """
+    # Ctrl+C in the terminal is meant for the active agent, not for us
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    os.chdir(agent_dir)
+
+    import agent
+    from core import tool_registry
+    tool_registry.preload()
+    importlib.import_module("core.context_watcher")
+
+    if not os.read(go_fd, 1):
+        sys.exit(0)
+    os.close(go_fd)
+
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    sys.argv = [agent_path, "console"]
+    agent.main()
+
+
+# ---------------------------------------------------------------------------------------------
+# Supervisor side
+# ---------------------------------------------------------------------------------------------
+_launches = 0
+
+
+def _ready_file() -> str:
+    """Per-launch path the agent creates once it's ready (see core.startup)."""
+    global _launches
+    _launches += 1
+    return data_path(f"agent-ready-{os.getpid()}-{_launches}")
+
+
+def _agent_env(ready_file: str) -> dict:
+    return {**os.environ, "JARVIS_READY_FILE": ready_file}
+
+
+class Standby:
+    def __init__(self):
+        self.ready_file = _ready_file()
+        read_fd, self.go_fd = os.pipe()
+        self.proc = subprocess.Popen(
+            [venv_python, os.path.abspath(__file__), "--standby", str(read_fd)],
+            pass_fds=(read_fd,),
+            env=_agent_env(self.ready_file),
         )
-        if proc.returncode != 42:  # normal exit, not a crash/restart request
-            print("Agent exited. Stopping supervisor.")
-            break
-        print("Agent requested restart. Restarting in 3 seconds...")
-        time.sleep(3)
-
-except KeyboardInterrupt:
-    print("\nSupervisor stopped by user.")
\ No newline at end of file
+        os.close(read_fd)
+
+    def activate(self) -> subprocess.Popen | None:
+        """Hand over to the standby; None if it has died (the caller starts cold instead)."""
+        if self.proc.poll() is not None:
+            os.close(self.go_fd)
+            return None
+        try:
+            os.write(self.go_fd, b"1")
+        except BrokenPipeError:
+            self.proc.wait()
+            return None
+        finally:
+            os.close(self.go_fd)
+        return self.proc
+
+    def discard(self):
+        os.close(self.go_fd)  # standby sees EOF and exits
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+def start_cold() -> tuple[subprocess.Popen, str]:
+    ready_file = _ready_file()
+    proc = subprocess.Popen([venv_python, agent_path, "console"], cwd=agent_dir, env=_agent_env(ready_file))
+    return proc, ready_file
+
+
+def wait_until_ready(proc: subprocess.Popen, ready_file: str) -> bool:
+    """Block until the agent creates its ready file; False if it exits or READY_TIMEOUT passes first."""
+    deadline = time.monotonic() + READY_TIMEOUT
+    try:
+        while time.monotonic() < deadline:
+            if os.path.exists(ready_file):
+                return True
+            if proc.poll() is not None:
+                return False
+            time.sleep(READY_POLL_INTERVAL)
+        return False
+    finally:
+        try:
+            os.unlink(ready_file)
+        except FileNotFoundError:
+            pass
+
+
+# ---------------------------------------------------------------------------------------------
+# Resource watchdog
+# ---------------------------------------------------------------------------------------------
+def _append_sample(sample: dict):
+    try:
+        if os.path.getsize(SAMPLES_LOG) > SAMPLES_LOG_MAX_BYTES:
+            os.replace(SAMPLES_LOG, SAMPLES_LOG + ".1")
+    except FileNotFoundError:
+        pass
+    with open(SAMPLES_LOG, "a") as f:
+        f.write(json.dumps(sample) + "\n")
+
+
+class Watchdog:
+    """Samples RSS, CPU and open fds of the agent (and its job processes)."""
+
+    def __init__(self, proc: subprocess.Popen):
+        self.pid = proc.pid
+        self.process = psutil.Process(proc.pid)
+        self.high_cpu_samples = 0
+        # psutil.Process objects by pid, kept across samples: cpu_percent() measures since the
+        # previous call on the same object (the first call on a new one always returns 0.0)
+        self._known: dict[int, psutil.Process] = {}
+
+    def _tree(self) -> list:
+        try:
+            tree = [self.process] + self.process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            self._known.clear()
+            return []
+        current = {}
+        for p in tree:
+            known = self._known.get(p.pid)
+            # Same pid and creation time (Process equality) means the same process, not a reused pid
+            current[p.pid] = known if known is not None and known == p else p
+        self._known = current  # drops processes that have exited
+        return list(current.values())
+
+    def sample(self) -> dict:
+        rss = cpu = fds = 0
+        for p in self._tree():
+            try:
+                with p.oneshot():
+                    rss += p.memory_info().rss
+                    cpu += p.cpu_percent(interval=None)
+                    fds += p.num_fds() if hasattr(p, "num_fds") else p.num_handles()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        sample = {"ts": time.time(), "pid": self.pid, "rss_mb": rss / 1024 / 1024, "cpu_percent": cpu, "open_fds": fds}
+        _append_sample(sample)
+        return sample
+
+    def breach(self, sample: dict) -> str | None:
+        """Return why the agent should be restarted, or None if it's healthy."""
+        self.high_cpu_samples = self.high_cpu_samples + 1 if sample["cpu_percent"] > MAX_CPU_PERCENT else 0
+        if sample["rss_mb"] > MAX_RSS_MB:
+            return f"rss {sample['rss_mb']:.0f} MB > {MAX_RSS_MB:.0f} MB"
+        if sample["open_fds"] > MAX_OPEN_FDS:
+            return f"{sample['open_fds']} open fds > {MAX_OPEN_FDS}"
+        if self.high_cpu_samples >= CPU_SUSTAINED_SAMPLES:
+            return f"cpu > {MAX_CPU_PERCENT:.0f}% for {self.high_cpu_samples} samples"
+        return None
+
+
+def graceful_stop(proc: subprocess.Popen):
+    """SIGINT lets the agent run its shutdown callbacks (journal flush) before we kill it."""
+    proc.send_signal(signal.SIGINT)
+    try:
+        proc.wait(timeout=GRACEFUL_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def wait_with_watchdog(proc: subprocess.Popen) -> tuple[int, str | None]:
+    """Wait for the agent to exit; returns (exit code, watchdog reason if we stopped it)."""
+    if psutil is None or proc.poll() is not None:
+        return proc.wait(), None
+
+    try:
+        watchdog = Watchdog(proc)
+    except psutil.NoSuchProcess:  # exited between poll() and here
+        return proc.wait(), None
+    while True:
+        try:
+            return proc.wait(timeout=SAMPLE_INTERVAL), None
+        except subprocess.TimeoutExpired:
+            pass
+        reason = watchdog.breach(watchdog.sample())
+        if reason:
+            print(f"Watchdog: {reason}. Restarting agent gracefully...")
+            log_event("watchdog_restart", reason=reason, pid=proc.pid)
+            graceful_stop(proc)
+            return proc.returncode, reason
+
+
+def backoff_delay(consecutive_failures: int) -> float:
+    """No delay for the first quick exit, then exponential up to BACKOFF_MAX."""
+    if consecutive_failures <= 1:
+        return 0.0
+    return min(BACKOFF_BASE * 2 ** (consecutive_failures - 2), BACKOFF_MAX)
+
+
+def main():
+    if psutil is None:
+        print("psutil not installed: resource watchdog disabled.")
+
+    # Nothing to hand over to yet: a standby would only import in parallel with the first agent
+    proc, ready_file = start_cold()
+    standby = None
+    started_at = time.monotonic()
+    consecutive_failures = 0
+
+    try:
+        if wait_until_ready(proc, ready_file):
+            log_event("start", ready_ms=(time.monotonic() - started_at) * 1000, pid=proc.pid)
+        if WARM_STANDBY:
+            standby = Standby()
+
+        while True:
+            returncode, watchdog_reason = wait_with_watchdog(proc)
+            exited_at = time.perf_counter()
+            uptime = time.monotonic() - started_at
+
+            if returncode in STOP_EXIT_CODES and not watchdog_reason:
+                print("Agent exited. Stopping supervisor.")
+                break
+
+            crashed = returncode != RESTART_EXIT_CODE and not watchdog_reason
+            if crashed:
+                print(f"Agent crashed with exit code {returncode}.")
+                log_event("crash", returncode=returncode, uptime=uptime)
+
+            # Requested and watchdog restarts are expected: only quick crashes count toward the backoff
+            consecutive_failures = consecutive_failures + 1 if crashed and uptime < STABLE_SECONDS else 0
+            delay = backoff_delay(consecutive_failures)
+            if delay:
+                print(f"Agent is restarting repeatedly; backing off {delay:.0f} seconds...")
+                log_event("backoff", delay=delay, consecutive_failures=consecutive_failures)
+                time.sleep(delay)
+
+            proc = standby.activate() if standby else None
+            if proc:
+                mode, ready_file = "standby", standby.ready_file
+            else:
+                if standby:
+                    print("Standby worker had exited; starting cold.")
+                    log_event("standby_dead", returncode=standby.proc.returncode)
+                proc, ready_file = start_cold()
+                mode = "cold"
+            standby = None
+            started_at = time.monotonic()
+
+            # Latency up to an agent that can take requests (its 'ready' mark), not just a live process
+            ready = wait_until_ready(proc, ready_file)
+            latency_ms = (time.perf_counter() - exited_at) * 1000 - delay * 1000
+            if ready:
+                print(f"Agent restarting. {mode.capitalize()} worker ready in {latency_ms:.1f} ms.")
+            else:
+                print(f"Agent restarting. {mode.capitalize()} worker did not report ready.")
+            log_event("restart", mode=mode, latency_ms=latency_ms if ready else None, ready=ready,
+                      pid=proc.pid, returncode=returncode)
+
+            # Prepare the next standby while the new agent runs
+            if WARM_STANDBY:
+                standby = Standby()
+
+    except KeyboardInterrupt:
+        print("\nSupervisor stopped by user.")
+    finally:
+        if standby:
+            standby.discard()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--standby":
+        standby_main(int(sys.argv[2]))
+    else:
+        main()